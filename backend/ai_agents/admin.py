@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import AiSummary, AiArtifact, DocumentChunk
+from .models import AiSummary, AiArtifact, DocumentChunk, SummaryCache
 
 @admin.register(AiSummary)
 class AiSummaryAdmin(admin.ModelAdmin):
@@ -11,9 +11,15 @@ class AiArtifactAdmin(admin.ModelAdmin):
     list_display = ['artifact_type', 'document', 'owner', 'created_at']
     list_filter = ['artifact_type', 'owner']
 
+@admin.register(SummaryCache)
+class SummaryCacheAdmin(admin.ModelAdmin):
+    list_display = ['file_sha256', 'prompt_version', 'model_name', 'hits', 'created_at', 'last_hit_at']
+    list_filter = ['prompt_version', 'model_name']
+    search_fields = ['file_sha256', 'cache_key']
+
 @admin.register(DocumentChunk)
 class DocumentChunkAdmin(admin.ModelAdmin):
-    list_display = ['document', 'chunk_index', 'short_content', 'created_at']
+    list_display = ['document', 'chunk_index', 'page_number', 'short_content', 'created_at']
     list_filter = ['document']
     
     def short_content(self, obj):
@@ -0,0 +1,67 @@
+"""
+Masowe indeksowanie (RAG) całego korpusu mocka: data/docs + pliki snapshotów ERP/MES.
+
+    python manage.py index_mock_corpus
+    python manage.py index_mock_corpus --streams docs --concurrency 8
+    python manage.py index_mock_corpus --all-versions --reindex
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_agents.services import index_mock_corpus
+
+
+class Command(BaseCommand):
+    help = "Tworzy Document dla wszystkich plików mocka (docs/erp/mes) i indeksuje je z ograniczoną współbieżnością."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--streams", default="docs,erp,mes",
+            help="Lista strumieni rozdzielona przecinkami (docs,erp,mes).",
+        )
+        parser.add_argument(
+            "--all-versions", action="store_true",
+            help="ERP/MES: wszystkie wersje z manifestu zamiast tylko najnowszej.",
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=4,
+            help="Ile dokumentów indeksować równocześnie (domyślnie 4).",
+        )
+        parser.add_argument(
+            "--reindex", action="store_true",
+            help="Indeksuj także dokumenty, które mają już chunki.",
+        )
+
+    def handle(self, *args, **options):
+        streams = [s.strip() for s in options["streams"].split(",") if s.strip()]
+        unknown = set(streams) - {"docs", "erp", "mes"}
+        if unknown:
+            raise CommandError(f"Nieznane strumienie: {', '.join(sorted(unknown))}")
+
+        def progress(done, total, stats):
+            self.stdout.write(
+                f"[{done}/{total}] chunks={stats['chunks']} tokens={stats['tokens']} failed={stats['failed']}"
+            )
+
+        stats = index_mock_corpus(
+            streams=streams,
+            all_versions=options["all_versions"],
+            concurrency=options["concurrency"],
+            reindex=options["reindex"],
+            progress=progress,
+        )
+
+        for err in stats["errors"]:
+            self.stderr.write(f"  doc {err['doc_id']} ({err['filename']}): {err['error']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Odkryto {stats['discovered']} plików, utworzono {stats['created']} dokumentów, "
+            f"zindeksowano {stats['indexed']}/{stats['scheduled']} (błędy: {stats['failed']}, "
+            f"w toku w Celery: {stats['skipped']})."
+        ))
+        self.stdout.write(
+            f"Czas: {stats['seconds']} s | {stats['docs_per_second']} docs/s | "
+            f"{stats['chunks_per_second']} chunks/s | {stats['tokens_per_second']} tokens/s"
+        )
+        self.stdout.write(
+            f"Tokeny embeddingów: {stats['tokens']} -> szacowany koszt {stats['estimated_cost_usd']} USD"
+        )
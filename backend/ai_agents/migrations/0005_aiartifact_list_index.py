@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_agents', '0004_documentchunk_source_offsets'),
+        ('documents', '0002_document_list_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aiartifact',
+            index=models.Index(fields=['owner', 'artifact_type', '-created_at'], name='ai_artifact_owner_type_idx'),
+        ),
+    ]
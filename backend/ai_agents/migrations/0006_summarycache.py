@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_agents', '0005_aiartifact_list_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SummaryCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cache_key', models.CharField(max_length=64, unique=True)),
+                ('file_sha256', models.CharField(db_index=True, max_length=64)),
+                ('scope', models.JSONField(blank=True, null=True)),
+                ('prompt_version', models.CharField(max_length=32)),
+                ('model_name', models.CharField(max_length=100)),
+                ('summary_text', models.TextField()),
+                ('summary_meta', models.JSONField(blank=True, default=dict)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_hit_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_agents', '0006_summarycache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentchunk',
+            name='chunker_version',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+    ]
@@ -48,23 +48,64 @@ class AiArtifact(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        # lista artefaktów użytkownika (owner + opcjonalnie artifact_type), najnowsze pierwsze
+        indexes = [
+            models.Index(fields=["owner", "artifact_type", "-created_at"], name="ai_artifact_owner_type_idx"),
+        ]
 
     def __str__(self):
         return f"{self.artifact_type} for doc {self.document_id} (user {self.owner_id})"        # type: ignore[attr-defined]
     
 
+class SummaryCache(models.Model):
+    """
+    Współdzielony (między użytkownikami) wynik streszczenia.
+    Klucz: hash pliku + scope + wersja promptu systemowego + model LLM –
+    ten sam plik streszczany tym samym promptem daje ten sam wynik dla każdego.
+    """
+    cache_key = models.CharField(max_length=64, unique=True)
+    file_sha256 = models.CharField(max_length=64, db_index=True)
+    scope = models.JSONField(null=True, blank=True)
+    prompt_version = models.CharField(max_length=32)
+    model_name = models.CharField(max_length=100)
+
+    summary_text = models.TextField()
+    summary_meta = models.JSONField(default=dict, blank=True)
+
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_hit_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"SummaryCache {self.file_sha256[:12]} ({self.model_name}, {self.prompt_version})"
+
+
 class DocumentChunk(models.Model):
     # (Wiedza RAG)
     """Przechowuje pocięte kawałki dokumentu wraz z ich wektorami."""
     document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='chunks')
     chunk_index = models.IntegerField()
     text_content = models.TextField()
+
+    # Pochodzenie fragmentu (chunking strukturalny):
+    # numer strony (tylko PDF), offsety w wyekstrahowanym tekście i ścieżka nagłówków
+    page_number = models.IntegerField(null=True, blank=True)
+    char_start = models.IntegerField(null=True, blank=True)
+    char_end = models.IntegerField(null=True, blank=True)
+    heading_path = models.JSONField(default=list, blank=True)
     
     # Wektor o wymiarze 1536 (OpenAI text-embedding-3-small)
     embedding = VectorField(dimensions=1536) 
+
+    # Wersja chunkera (services.current_chunker_version) – inna niż bieżąca = dokument do ponownego indeksowania
+    chunker_version = models.CharField(max_length=32, blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['chunk_index']
+        # (document, chunk_index) – pobieranie sąsiednich fragmentów po zakresie indeksów
+        indexes = [
+            models.Index(fields=["document", "chunk_index"], name="ai_chunk_doc_idx"),
+        ]
         # W przyszłości dodamy tu index HNSW dla wydajności
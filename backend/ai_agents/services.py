@@ -1,16 +1,64 @@
+import logging
 import os
-import pypdf    # type: ignore
+import re
+import bisect
 import json
-from openai import OpenAI
+import hashlib
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache, partial
+from typing import TYPE_CHECKING, Any
 from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
 
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from proscientia.metrics import llm_call, llm_cost_usd, stage_timer
+from proscientia.tracing import current_stage_timings
 from documents.models import Document 
-from .models import AiArtifact
+from documents.services import compute_file_sha256, create_mock_documents, discover_mock_documents, fetch_mock_document_file
+from erp_mes.services import MockErpMesClient
+from .models import AiArtifact, DocumentChunk, SummaryCache
+
+# openai, pypdf i langchain_text_splitters importujemy przy pierwszym użyciu (jak tiktoken w _get_encoding):
+# moduł ładuje się w każdym procesie (sygnały -> taski -> serwisy), także w Daphne, Beat i manage.py,
+# które tych bibliotek nie potrzebują. Pilnuje tego benchmarks/bench_startup.py.
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+logger = logging.getLogger(__name__)
+
+
+def get_openai_client() -> "OpenAI":
+    """
+    Wspólny klient OpenAI dla procesu (pula połączeń HTTP zamiast nowej przy każdym wywołaniu).
+    OPENAI_BASE_URL pozwala skierować ruch na lokalną atrapę (mock/fake_openai).
+    """
+    from openai import OpenAI
+
+    return _openai_client(
+        OpenAI,
+        settings.OPENAI_API_KEY,
+        settings.OPENAI_BASE_URL,
+        settings.OPENAI_MAX_RETRIES,
+        settings.OPENAI_TIMEOUT,
+    )
+
+
+@lru_cache(maxsize=4)
+def _openai_client(client_cls, api_key, base_url, max_retries, timeout):
+    # klasa w kluczu – podmiana OpenAI w testach/benchmarkach nie zwraca starego klienta
+    return client_cls(api_key=api_key, base_url=base_url, max_retries=max_retries, timeout=timeout)
 
 
 def extract_text(file_path):
     """Wyciąga tekst z PDF. Czyta CAŁY plik (usunięto limit 5 stron)."""
+    import pypdf    # type: ignore
+
     text = ""
     try:
         reader = pypdf.PdfReader(file_path)
@@ -23,46 +71,54 @@ def extract_text(file_path):
 
 def run_agent_summary(document_path):
     """Wysyła tekst do OpenAI."""
-    client = OpenAI(api_key=settings.OPENAI_API_KEY)
+    client = get_openai_client()
     
     # 1. Pobierz tekst
     raw_text = extract_text(document_path)
     if not raw_text:
         return "Nie udało się odczytać tekstu z pliku."
 
-    # 2. Skróć (bezpiecznik kosztowy)
-    truncated_text = raw_text[:20000]
+    # 2. Skróć (bezpiecznik kosztowy) – budżet w tokenach modelu
+    max_tokens = prompt_token_budget(settings.SUMMARY_INPUT_MAX_TOKENS, settings.OPENAI_MODEL_NAME)
+    truncated_text = truncate_to_tokens(raw_text, max_tokens, settings.OPENAI_MODEL_NAME)
 
     # 3. Zapytanie do AI
     try:
-        response = client.chat.completions.create(
-            model=settings.OPENAI_MODEL_NAME,
-            messages=[
-                {"role": "system", "content": "Jesteś inżynierem. Streszczaj dokumenty techniczne w punktach."},
-                {"role": "user", "content": f"Dokument:\n{truncated_text}"}
-            ]
-        )
+        with llm_call("chat", settings.OPENAI_MODEL_NAME) as call:
+            response = client.chat.completions.create(
+                model=settings.OPENAI_MODEL_NAME,
+                messages=[
+                    {"role": "system", "content": "Jesteś inżynierem. Streszczaj dokumenty techniczne w punktach."},
+                    {"role": "user", "content": f"Dokument:\n{truncated_text}"}
+                ]
+            )
+            call.usage = response.usage
         return response.choices[0].message.content
     except Exception as e:
         return f"Błąd OpenAI: {str(e)}"
     
 
-def _extract_text_pdf(file_path: str) -> str:
-    text = ""
+def _extract_pages_pdf(file_path: str) -> list[str]:
+    """Zwraca tekst PDF-a jako listę stron (indeks 0 = strona 1)."""
+    import pypdf    # type: ignore
+
+    pages: list[str] = []
     try:
         reader = pypdf.PdfReader(file_path)
         total_pages = len(reader.pages)
-        print(f"--- [DEBUG] Rozpoczynam czytanie PDF. Liczba stron: {total_pages} ---") # <--- SZPIEG 1
-        
-        for i, page in enumerate(reader.pages):
-            # Upewnij się, że NIE MA TU IF BREAK
-            page_text = page.extract_text() or ""
-            text += page_text + "\n"
-            print(f"--- [DEBUG] Przetworzono stronę {i+1}/{total_pages} (długość: {len(page_text)}) ---") # <--- SZPIEG 2
-            
+        logger.debug("Reading PDF %s: %d pages", file_path, total_pages)
+
+        for page in reader.pages:
+            pages.append(page.extract_text() or "")
     except Exception as e:
         print(f"[AiAgents] Błąd PDF: {e}")
-    return text
+    return pages
+
+
+def _extract_text_pdf(file_path: str) -> str:
+    # Każda strona kończy się "\n" – offsety chunków (create_structured_chunks)
+    # liczone są względem dokładnie tego tekstu.
+    return "".join(page_text + "\n" for page_text in _extract_pages_pdf(file_path))
 
 
 def _extract_text_plain(file_path: str, encoding: str = "utf-8") -> str:
@@ -124,7 +180,7 @@ def extract_text_from_document(document: Document) -> str:
     content_type = (document.content_type or "").lower()
 
     # PDF
-    if ext == ".pdf" or "pdf" in content_type:
+    if _is_pdf_document(document):
         return _extract_text_pdf(file_path)
 
     # TXT
@@ -145,64 +201,68 @@ def extract_text_from_document(document: Document) -> str:
     return _extract_text_generic(file_path)
 
 
-def chunk_text(text: str, max_chars: int = 2000) -> list[str]:
-    """
-    Prosty chunking po znakach. W przyszłości możemy podmienić na
-    'inteligentny' chunking po zdaniach/sekcjach.
-    """
-    if not text:
-        return []
-
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = start + max_chars
-        chunks.append(text[start:end])
-        start = end
-    return chunks
+def _is_pdf_document(document: Document) -> bool:
+    ext = os.path.splitext(document.file.path)[1].lower()
+    content_type = (document.content_type or "").lower()
+    return ext == ".pdf" or "pdf" in content_type
 
 
-def rerank_chunks(chunks: list[str], metadata: dict | None = None) -> list[str]:
+def extract_pages_from_document(document: Document) -> tuple[list[str], bool]:
     """
-    Placeholder pod przyszły re-rank (np. na podstawie DocSearch).
-    Na razie zwracamy wprost, ale interfejs już jest gotowy.
+    Jak extract_text_from_document, ale z zachowaniem podziału na strony.
+    Zwraca (strony, paginated):
+      - PDF -> lista tekstów kolejnych stron, paginated=True,
+      - pozostałe formaty -> jednoelementowa lista z całym tekstem, paginated=False.
     """
-    return chunks
+    if not document.file:
+        return [], False
+
+    if _is_pdf_document(document):
+        return _extract_pages_pdf(document.file.path), True
+
+    text = extract_text_from_document(document)
+    return ([text] if text else []), False
 
 
 def prepare_text_for_summary(
     document: Document,
     scope: dict | None = None,
-    max_chars: int = 20000,
+    max_tokens: int | None = None,
+    model: str | None = None,
 ) -> tuple[str, dict]:
     """
     Buduje tekst wejściowy do streszczenia:
     - ekstrakcja z pliku,
-    - prosty chunking,
-    - opcjonalny re-rank (na razie placeholder),
-    - przycięcie do max_chars.
+    - przycięcie do budżetu tokenów modelu (domyślnie SUMMARY_INPUT_MAX_TOKENS, nie więcej niż
+      pozwala okno modelu po odjęciu promptu systemowego i rezerwy na odpowiedź).
     Zwraca (tekst, metadata).
     """
-    raw_text = extract_text_from_document(document)
+    model = model or settings.OPENAI_MODEL_NAME
+    max_tokens = prompt_token_budget(
+        settings.SUMMARY_INPUT_MAX_TOKENS if max_tokens is None else max_tokens,
+        model,
+        [SUMMARY_SYSTEM_PROMPT],
+    )
+    with stage_timer("summary", "extract"):
+        raw_text = extract_text_from_document(document)
     if not raw_text:
         return "", {
             "scope": scope,
-            "chunks": 0,
             "original_length": 0,
             "truncated_length": 0,
         }
 
-    chunks = chunk_text(raw_text, max_chars=2000)
-    chunks = rerank_chunks(chunks, metadata={"scope": scope})
-
-    merged = "".join(chunks)
-    truncated = merged[:max_chars]
+    with stage_timer("summary", "truncate"):
+        truncated, original_tokens, input_tokens = fit_to_tokens(raw_text, max_tokens, model)
 
     meta = {
         "scope": scope,
-        "chunks": len(chunks),
         "original_length": len(raw_text),
         "truncated_length": len(truncated),
+        "original_tokens": original_tokens,
+        "input_tokens": input_tokens,
+        "max_tokens": max_tokens,
+        "model": model,
     }
     return truncated, meta
 
@@ -211,14 +271,18 @@ def run_agent_summary_from_text(
     text: str,
     scope: dict | None = None,
     system_prompt: str | None = None,
+    max_input_tokens: int | None = None,
 ) -> tuple[str, dict]:
     """
     Ogólny helper: streszczenie z dowolnego tekstu.
     Używany przez:
       - run_agent_summary_for_document
       - raport ERP/MES (quick report)
+    Tekst dłuższy niż budżet (max_input_tokens, a zawsze okno modelu) jest przycinany do tokenów.
+    meta["usage"] – tokeny i koszt z odpowiedzi API.
     """
-    client = OpenAI(api_key=settings.OPENAI_API_KEY)
+    client = get_openai_client()
+    model = settings.OPENAI_MODEL_NAME
 
     if not text:
         return "Brak danych wejściowych do streszczenia.", {
@@ -231,22 +295,30 @@ def run_agent_summary_from_text(
         "w zwięzłych punktach, zrozumiałych dla inżyniera produkcji."
     )
     system_msg = system_prompt or default_system
+    prefix = f"Zakres: {scope}. Dane wejściowe:\n"
+    budget = prompt_token_budget(
+        context_window(model) if max_input_tokens is None else max_input_tokens,
+        model,
+        [system_msg, prefix],
+    )
+    input_text, _, input_tokens = fit_to_tokens(text, budget, model)
 
     try:
-        response = client.chat.completions.create(
-            model=settings.OPENAI_MODEL_NAME,
-            messages=[
-                {"role": "system", "content": system_msg},
-                {
-                    "role": "user",
-                    "content": f"Zakres: {scope}. Dane wejściowe:\n{text}",
-                },
-            ],
-        )
+        with llm_call("chat", model) as call:
+            response = client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_msg},
+                    {"role": "user", "content": prefix + input_text},
+                ],
+            )
+            call.usage = response.usage
         summary_text = response.choices[0].message.content or ""
         meta = {
             "scope": scope,
             "original_length": len(text),
+            "input_tokens": input_tokens,
+            "usage": llm_usage_meta(model, response.usage),
         }
         return summary_text, meta
     except Exception as e:
@@ -254,40 +326,182 @@ def run_agent_summary_from_text(
         return error_msg, {
             "scope": scope,
             "original_length": len(text),
+            "input_tokens": input_tokens,
             "error": str(e),
         }
 
 
+# Prompt systemowy streszczeń dokumentów. Każda zmiana treści (albo sposobu
+# przygotowania tekstu) wymaga podbicia wersji – inaczej cache zwróci stare wyniki.
+SUMMARY_SYSTEM_PROMPT = (
+    "Jesteś inżynierem. Streszczaj dokumenty techniczne "
+    "w punktach, zrozumiale dla inżyniera produkcji."
+)
+SUMMARY_PROMPT_VERSION = "v2"
+
+
 def run_agent_summary_for_document(
     document: Document,
     scope: dict | None = None,
+    use_cache: bool = True,
 ) -> tuple[str, dict]:
     """
     Docelowa funkcja agenta streszczeń:
     - pracuje na obiekcie Document,
-    - korzysta z prepare_text_for_summary (chunking, scope placeholder),
+    - najpierw sprawdza współdzielony SummaryCache (ten sam plik/scope/prompt/model),
+    - korzysta z prepare_text_for_summary (ekstrakcja + budżet tokenów, scope placeholder),
     - zwraca (summary_text, summary_metadata).
     """
+    if use_cache:
+        with stage_timer("summary", "cache_lookup"):
+            cached = get_cached_summary(document, scope)
+        if cached is not None:
+            return cached
+
     prepared_text, prep_meta = prepare_text_for_summary(document, scope=scope)
     if not prepared_text:
         msg = "Nie udało się odczytać tekstu z pliku."
         return msg, {"preparation": prep_meta}
 
-    system_prompt = (
-        "Jesteś inżynierem. Streszczaj dokumenty techniczne "
-        "w punktach, zrozumiale dla inżyniera produkcji."
-    )
-
-    summary_text, llm_meta = run_agent_summary_from_text(
-        prepared_text,
-        scope=scope,
-        system_prompt=system_prompt,
-    )
+    with stage_timer("summary", "llm"):
+        summary_text, llm_meta = run_agent_summary_from_text(
+            prepared_text,
+            scope=scope,
+            system_prompt=SUMMARY_SYSTEM_PROMPT,
+        )
 
-    return summary_text, {
+    meta = {
         "preparation": prep_meta,
         "llm": llm_meta,
     }
+    # błędów LLM nie cache'ujemy – kolejne żądanie spróbuje ponownie
+    if use_cache and "error" not in llm_meta:
+        store_cached_summary(document, scope, summary_text, meta)
+    return summary_text, meta
+
+
+# CACHE STRESZCZEŃ (współdzielony między użytkownikami)
+
+def document_file_sha256(document: Document) -> str | None:
+    """
+    SHA-256 pliku dokumentu, None gdy brak pliku.
+    Zwykle zapisany w Document.file_sha256 przy zapisie pliku; dla starszych rekordów liczymy go raz
+    i utrwalamy, więc kolejne żądania (widok, task, zapis cache) nie czytają pliku ponownie.
+    """
+    if not document.file:
+        return None
+    if document.file_sha256:
+        return document.file_sha256
+    with document.file.open("rb"):
+        file_sha256 = compute_file_sha256(document.file)
+    Document.objects.filter(pk=document.pk).update(file_sha256=file_sha256)
+    document.file_sha256 = file_sha256
+    return file_sha256
+
+
+def summary_cache_key(file_sha256: str, scope: dict | None) -> str:
+    raw = json.dumps(
+        {
+            "file": file_sha256,
+            "scope": scope,
+            "prompt": SUMMARY_PROMPT_VERSION,
+            "model": settings.OPENAI_MODEL_NAME,
+            "input_tokens": settings.SUMMARY_INPUT_MAX_TOKENS,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def get_cached_summary(document: Document, scope: dict | None = None) -> tuple[str, dict] | None:
+    """
+    Zwraca (summary_text, meta) z SummaryCache albo None.
+    meta["cache"] opisuje trafienie (klucz, kiedy wygenerowano).
+    """
+    file_sha256 = document_file_sha256(document)
+    if file_sha256 is None:
+        return None
+    key = summary_cache_key(file_sha256, scope)
+
+    entry = SummaryCache.objects.filter(cache_key=key).first()
+    if entry is None:
+        return None
+    SummaryCache.objects.filter(pk=entry.pk).update(hits=F("hits") + 1, last_hit_at=timezone.now())
+
+    meta = dict(entry.summary_meta)
+    meta["cache"] = {
+        "hit": True,
+        "key": key,
+        "created_at": entry.created_at.isoformat(),
+        "prompt_version": entry.prompt_version,
+        "model": entry.model_name,
+    }
+    return entry.summary_text, meta
+
+
+def store_cached_summary(document: Document, scope: dict | None, summary_text: str, meta: dict) -> None:
+    file_sha256 = document_file_sha256(document)
+    if file_sha256 is None:
+        return
+    SummaryCache.objects.update_or_create(
+        cache_key=summary_cache_key(file_sha256, scope),
+        defaults={
+            "file_sha256": file_sha256,
+            "scope": scope,
+            "prompt_version": SUMMARY_PROMPT_VERSION,
+            "model_name": settings.OPENAI_MODEL_NAME,
+            "summary_text": summary_text,
+            "summary_meta": meta,
+        },
+    )
+
+
+def save_summary_artifact(document: Document, owner, summary_text: str, summary_meta: dict, scope=None) -> AiArtifact:
+    """Zapisuje streszczenie jako plik .txt w AiArtifact użytkownika."""
+    title = document.title or document.mock_filename or f"Document {document.id}"          # type: ignore
+    artifact = AiArtifact(
+        artifact_type=AiArtifact.TYPE_SUMMARY,
+        document=document,
+        owner=owner,
+        title=f"Streszczenie: {title}",
+        metadata={
+            "scope": scope,
+            "summary_meta": summary_meta,
+            "usage": artifact_token_usage(summary_meta),
+            "source": document.source,
+            "mock_stream": getattr(document, "mock_stream", None),
+            "mock_version_date": (
+                document.mock_version_date.isoformat() if getattr(document, "mock_version_date", None) else None      # type: ignore
+            ),
+        },
+    )
+    artifact.file.save(build_summary_filename(document, owner), ContentFile(summary_text or ""), save=True)
+    return artifact
+
+
+def artifact_token_usage(meta: dict) -> dict:
+    """
+    Tokeny i koszt faktycznie zużyte na dany artefakt (z meta["llm"]["usage"]). Błąd API, trafienie
+    SummaryCache i kopia dla użytkownika podpiętego pod to samo zadanie – zero, choć meta
+    z cache niesie usage oryginału.
+    """
+    usage = (meta.get("llm") or {}).get("usage")
+    if usage is None or "cache" in meta or "shared_from_task" in meta:
+        return llm_usage_meta((usage or {}).get("model") or settings.OPENAI_MODEL_NAME, None)
+    return usage
+
+
+def attach_stage_timings(artifact: AiArtifact) -> None:
+    """
+    Dopisuje do metadata["timings"] czasy etapów bieżącego taska (kolejka, ekstrakcja, LLM, zapis)
+    i trace_id – wolne streszczenie da się rozłożyć na składniki bez szukania w logach.
+    """
+    timings = current_stage_timings()
+    if timings is None:
+        return
+    artifact.metadata["timings"] = timings.as_dict()
+    artifact.save(update_fields=["metadata"])
 
 
 
@@ -296,7 +510,7 @@ def run_agent_summary_for_document(
 def count_user_summaries_for_document(user, document) -> int:
     """
     Liczba streszczeń (AiArtifact typu 'summary') dla danego dokumentu i użytkownika.
-    Limit: max 3 na doc per user.
+    Używane tylko do zainicjowania licznika QuotaCounter (limit streszczeń per dokument).
     """
     if user.is_anonymous:
         return 0
@@ -318,29 +532,724 @@ def build_summary_filename(document, user) -> str:
 
 # RAG / EMBEDDINGS UTILS (DODANE)
 
-def create_smart_chunks(text, chunk_size=1000, chunk_overlap=200):
+# Zapisywana w DocumentChunk.chunker_version razem z rozmiarem chunka i overlapem – zmiana algorytmu
+# (podbij CHUNKER_VERSION) albo RAG_CHUNK_TOKENS / RAG_CHUNK_OVERLAP_TOKENS unieważnia istniejące chunki.
+CHUNKER_VERSION = "2"
+
+
+def current_chunker_version() -> str:
+    return f"{CHUNKER_VERSION}:{settings.RAG_CHUNK_TOKENS}/{settings.RAG_CHUNK_OVERLAP_TOKENS}"
+
+
+def _chunk_splitter(chunk_size: int | None, chunk_overlap: int | None):
     """
-    Używa LangChain do mądrego dzielenia tekstu (nie ucina zdań w połowie).
-    Zastępuje prosty chunk_text Piotra w zastosowaniach RAG.
+    Splitter LangChain mierzący długość w tokenach modelu embeddingów (count_tokens), nie w znakach –
+    polski tekst techniczny i JSON mają bardzo różną liczbę znaków na token.
+    add_start_index – create_documents podaje offset fragmentu w metadata["start_index"].
     """
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        separators=["\n\n", "\n", ". ", " ", ""]
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size or settings.RAG_CHUNK_TOKENS,
+        chunk_overlap=settings.RAG_CHUNK_OVERLAP_TOKENS if chunk_overlap is None else chunk_overlap,
+        separators=["\n\n", "\n", ". ", " ", ""],
+        length_function=partial(count_tokens, model=EMBEDDING_MODEL),
+        add_start_index=True,
     )
-    return splitter.split_text(text)
+
+
+def create_smart_chunks(text, chunk_size=None, chunk_overlap=None):
+    """
+    Używa LangChain do mądrego dzielenia tekstu (nie ucina zdań w połowie).
+    Zastąpił dawny prosty chunking po znakach (chunk_text) w zastosowaniach RAG.
+    chunk_size / chunk_overlap w tokenach (domyślnie RAG_CHUNK_TOKENS / RAG_CHUNK_OVERLAP_TOKENS).
+    """
+    return _chunk_splitter(chunk_size, chunk_overlap).split_text(text)
+
+# Nagłówki rozpoznawane przy chunkingu strukturalnym:
+#   "# Tytuł" / "## Podrozdział" (markdown),
+#   "3.2.1 Calibration procedure" (numeracja sekcji),
+#   "ELECTRICAL SAFETY TEST" (krótka linia wersalikami, min. 2 słowa).
+_MD_HEADING_RE = re.compile(r"^(#{1,6})\s+(\S.{0,118})$")
+_NUMBERED_HEADING_RE = re.compile(r"^(\d{1,2}(?:\.\d{1,2}){0,4})\.?\s+([A-ZĄĆĘŁŃÓŚŹŻ][^.!?]{1,100})$")
+_CAPS_HEADING_RE = re.compile(r"^[A-ZĄĆĘŁŃÓŚŹŻ0-9][A-ZĄĆĘŁŃÓŚŹŻ0-9 &/\-]{2,80}$")
+
+
+def _detect_heading(line: str) -> tuple[int, str] | None:
+    """Zwraca (poziom, tytuł) jeśli linia wygląda na nagłówek, w przeciwnym razie None."""
+    line = line.strip()
+    if not line or len(line) > 120:
+        return None
+
+    m = _MD_HEADING_RE.match(line)
+    if m:
+        return len(m.group(1)), m.group(2).strip()
+
+    m = _NUMBERED_HEADING_RE.match(line)
+    if m:
+        return m.group(1).count(".") + 1, line
+
+    if _CAPS_HEADING_RE.match(line) and len(line.split()) >= 2 and any(c.isalpha() for c in line):
+        return 1, line
+
+    return None
+
+
+def _collect_headings(pages: list[str], paginated: bool) -> list[tuple[int, list[str]]]:
+    """
+    Przechodzi po wszystkich stronach i buduje listę zdarzeń
+    (offset_początku_nagłówka, ścieżka_nagłówków) w kolejności występowania.
+    """
+    events: list[tuple[int, list[str]]] = []
+    stack: list[tuple[int, str]] = []
+    page_offset = 0
+
+    for page_text in pages:
+        line_offset = page_offset
+        for line in page_text.splitlines(keepends=True):
+            heading = _detect_heading(line)
+            if heading:
+                level, title = heading
+                while stack and stack[-1][0] >= level:
+                    stack.pop()
+                stack.append((level, title))
+                events.append((line_offset, [t for _, t in stack]))
+            line_offset += len(line)
+        page_offset += len(page_text) + (1 if paginated else 0)
+
+    return events
+
+
+def create_structured_chunks(
+    pages: list[str],
+    paginated: bool = True,
+    chunk_size: int | None = None,
+    chunk_overlap: int | None = None,
+) -> list[dict]:
+    """
+    Chunking świadomy struktury dokumentu (strony + sekcje).
+
+    Każda strona dzielona jest osobno (chunk nigdy nie przechodzi przez granicę
+    strony), a każdy chunk dostaje:
+      - text         – treść fragmentu,
+      - page_number  – numer strony (1..N) lub None dla formatów bez stron,
+      - char_start / char_end – offsety w tekście z extract_text_from_document,
+      - heading_path – ścieżka nagłówków obowiązująca na początku fragmentu,
+                       np. ["4 TEST PROCEDURE", "4.2 Leakage test"].
+    chunk_size / chunk_overlap w tokenach (domyślnie RAG_CHUNK_TOKENS / RAG_CHUNK_OVERLAP_TOKENS).
+    """
+    splitter = _chunk_splitter(chunk_size, chunk_overlap)
+
+    headings = _collect_headings(pages, paginated)
+    heading_offsets = [offset for offset, _ in headings]
+
+    chunks: list[dict] = []
+    page_offset = 0
+    for page_no, page_text in enumerate(pages, start=1):
+        if page_text.strip():
+            prev_start = -1
+            for doc in splitter.create_documents([page_text]):
+                text = doc.page_content
+                # start_index LangChain liczy od (koniec poprzedniego - chunk_overlap), a overlap mamy w tokenach,
+                # nie w znakach – przy powtarzalnym tekście (wiersze tabel) trafia w późniejsze wystąpienie albo -1.
+                # Traktujemy go jako górną granicę: bierzemy najwcześniejsze wystąpienie za początkiem poprzedniego
+                # fragmentu, nie dalej niż start_index (bez granicy, gdy LangChain nie znalazł fragmentu).
+                hint = doc.metadata["start_index"]
+                local_start = page_text.find(text, prev_start + 1, hint + len(text)) if hint > prev_start else -1
+                if local_start < 0:
+                    local_start = page_text.find(text, prev_start + 1)
+                prev_start = local_start
+                start = page_offset + local_start
+                pos = bisect.bisect_right(heading_offsets, start) - 1
+                chunks.append({
+                    "text": text,
+                    "page_number": page_no if paginated else None,
+                    "char_start": start,
+                    "char_end": start + len(text),
+                    "heading_path": headings[pos][1] if pos >= 0 else [],
+                })
+        page_offset += len(page_text) + (1 if paginated else 0)
+
+    return chunks
+
+
+def get_neighbour_chunks(document: Document, chunk_indexes, radius: int = 1):
+    """
+    Zwraca QuerySet chunków sąsiadujących z podanymi indeksami
+    (zakres chunk_index ± radius), bez ponownego wyszukiwania wektorowego.
+    """
+    wanted: set[int] = set()
+    for idx in chunk_indexes:
+        wanted.update(range(max(idx - radius, 0), idx + radius + 1))
+    return DocumentChunk.objects.filter(document=document, chunk_index__in=sorted(wanted))
+
+
+def format_chunk_citation(chunk) -> dict:
+    """Cytowanie chunka dla frontendu – strona, sekcja i offsety bez ponownego parsowania pliku."""
+    return {
+        "chunk_index": chunk.chunk_index,
+        "page_number": chunk.page_number,
+        "heading_path": chunk.heading_path or [],
+        "char_start": chunk.char_start,
+        "char_end": chunk.char_end,
+        "preview": chunk.text_content[:200] + "...",
+    }
+
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
 
 def get_embedding(text):
     """Zamienia tekst na wektor liczbowy (1536 liczb) używając OpenAI."""
-    client = OpenAI(api_key=settings.OPENAI_API_KEY)
+    client = get_openai_client()
     text = text.replace("\n", " ")
     
     try:
-        response = client.embeddings.create(
-            input=[text],
-            model="text-embedding-3-small"
-        )
+        with llm_call("embedding", EMBEDDING_MODEL) as call:
+            response = client.embeddings.create(
+                input=[text],
+                model=EMBEDDING_MODEL
+            )
+            call.usage = response.usage
         return response.data[0].embedding
     except Exception as e:
         print(f"Błąd Embedding OpenAI: {e}")
-        return []
\ No newline at end of file
+        return []
+
+def get_embeddings(texts: list[str]) -> list[list[float]]:
+    """
+    Wektory dla wielu tekstów jednym wywołaniem API (batch).
+    Błąd API (po ponowieniach klienta) leci dalej – batch w chordzie kończy się wyjątkiem,
+    odpala errback i etap zapisu się nie wykonuje, więc dotychczasowy indeks zostaje.
+    """
+    if not texts:
+        return []
+    client = get_openai_client()
+    with llm_call("embedding", EMBEDDING_MODEL) as call:
+        response = client.embeddings.create(
+            input=[t.replace("\n", " ") for t in texts],
+            model=EMBEDDING_MODEL
+        )
+        call.usage = response.usage
+    by_index = {item.index: item.embedding for item in response.data}
+    if len(by_index) != len(texts):
+        raise ValueError(f"Embedding API zwróciło {len(by_index)} wektorów dla {len(texts)} tekstów")
+    return [by_index[i] for i in range(len(texts))]
+
+def store_document_chunks(doc_id: int, chunks: list[dict], vectors: list[list[float]]) -> int | None:
+    """
+    Atomowa podmiana chunków dokumentu (stare znikają dopiero razem z zapisem nowych).
+    Gdy brakuje choć jednego wektora – ValueError, a stare chunki zostają nietknięte.
+    Zwraca liczbę zapisanych chunków albo None, gdy dokument już nie istnieje.
+    """
+    missing = len(chunks) - sum(1 for v in vectors[:len(chunks)] if v)
+    if missing:
+        raise ValueError(f"Brak wektorów dla {missing}/{len(chunks)} fragmentów – zostawiam dotychczasowy indeks")
+    version = current_chunker_version()
+    rows = [
+        DocumentChunk(
+            document_id=doc_id,
+            chunk_index=i,
+            text_content=chunk["text"],
+            page_number=chunk["page_number"],
+            char_start=chunk["char_start"],
+            char_end=chunk["char_end"],
+            heading_path=chunk["heading_path"],
+            embedding=vector,
+            chunker_version=version,
+        )
+        for i, (chunk, vector) in enumerate(zip(chunks, vectors))
+    ]
+    with transaction.atomic():
+        if not Document.objects.select_for_update().filter(id=doc_id).exists():
+            return None
+        DocumentChunk.objects.filter(document_id=doc_id).delete()
+        DocumentChunk.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def index_document(document: Document, batch_size: int | None = None) -> dict:
+    """
+    Synchroniczne indeksowanie jednego dokumentu (ekstrakcja -> chunking -> embedding batchami -> zapis).
+    Odpowiednik pipeline'u Celery dla komend masowych. Zwraca statystyki: chunks, stored, tokens.
+    """
+    batch_size = batch_size or settings.RAG_EMBED_BATCH_SIZE
+    with stage_timer("indexing", "extract"):
+        pages, paginated = extract_pages_from_document(document)
+    with stage_timer("indexing", "chunk"):
+        chunks = create_structured_chunks(pages, paginated=paginated) if any(p.strip() for p in pages) else []
+    if not chunks:
+        return {"chunks": 0, "stored": 0, "tokens": 0}
+
+    texts = [c["text"] for c in chunks]
+    vectors: list[list[float]] = []
+    with stage_timer("indexing", "embed"):
+        for i in range(0, len(texts), batch_size):
+            vectors.extend(get_embeddings(texts[i:i + batch_size]))
+
+    with stage_timer("indexing", "store"):
+        stored = store_document_chunks(document.id, chunks, vectors)                 # type: ignore[attr-defined]
+    return {
+        "chunks": len(chunks),
+        "stored": stored or 0,
+        "tokens": sum(count_tokens(t, EMBEDDING_MODEL) for t in texts),
+    }
+
+def select_mock_corpus_documents(
+    client: MockErpMesClient,
+    streams=("docs", "erp", "mes"),
+    all_versions: bool = False,
+    reindex: bool = False,
+) -> tuple[list[dict], list[Document], list[Document]]:
+    """
+    Odkrycie plików mocka + bulk_create brakujących Document.
+    Zwraca (specs, created, docs_to_index) – bez dokumentów, które mają już chunki bieżącej wersji chunkera
+    (chyba że reindex=True); chunki ze starszej wersji są indeksowane ponownie.
+    """
+    specs = discover_mock_documents(client, streams=streams, all_versions=all_versions)
+    created, existing = create_mock_documents(specs)
+
+    docs = created + existing
+    if not reindex:
+        indexed_ids = set(
+            DocumentChunk.objects.filter(document__in=docs, chunker_version=current_chunker_version())
+            .values_list("document_id", flat=True).distinct()
+        )
+        docs = [d for d in docs if d.id not in indexed_ids]                             # type: ignore[attr-defined]
+    return specs, created, docs
+
+
+def index_mock_corpus(
+    streams=("docs", "erp", "mes"),
+    all_versions: bool = False,
+    concurrency: int = 4,
+    reindex: bool = False,
+    progress=None,
+) -> dict:
+    """
+    Masowe indeksowanie korpusu mocka (synchronicznie, komenda index_mock_corpus i benchmarki):
+      1. odkrycie plików (docs-list + listingi snapshotów ERP/MES),
+      2. bulk_create brakujących Document,
+      3. pobranie plików i indeksowanie w puli `concurrency` wątków.
+    Dokumenty z aktualnymi chunkami są pomijane (chyba że reindex=True). Każdy dokument zajmuje
+    klucz single-flight pipeline'u Celery – dokument indeksowany właśnie przez workera jest pomijany (skipped).
+    progress(done, total, stats) – opcjonalny callback po każdym dokumencie.
+    Zwraca statystyki przebiegu (przepustowość i szacowany koszt embeddingów).
+    """
+    client = MockErpMesClient()
+    specs, created, docs = select_mock_corpus_documents(client, streams, all_versions, reindex)
+
+    def work(doc):
+        key = job_dedup_key("index", doc.id)
+        token = str(uuid.uuid4())
+        if not claim_single_flight(key, token)[1]:
+            return None
+        try:
+            if not doc.file:
+                fetch_mock_document_file(doc, client)
+            return index_document(doc)
+        finally:
+            finish_single_flight(key, token)
+            connection.close()
+
+    stats = {"discovered": len(specs), "created": len(created), "scheduled": len(docs),
+             "indexed": 0, "skipped": 0, "failed": 0, "chunks": 0, "tokens": 0, "errors": []}
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {pool.submit(work, d): d for d in docs}
+        for done, future in enumerate(as_completed(futures), start=1):
+            doc = futures[future]
+            try:
+                result = future.result()
+                if result is None:
+                    stats["skipped"] += 1
+                else:
+                    stats["indexed"] += 1
+                    stats["chunks"] += result["stored"]
+                    stats["tokens"] += result["tokens"]
+            except Exception as e:
+                stats["failed"] += 1
+                stats["errors"].append({"doc_id": doc.id, "filename": doc.mock_filename, "error": str(e)})
+            if progress:
+                progress(done, len(docs), stats)
+
+    elapsed = time.perf_counter() - started
+    stats["seconds"] = round(elapsed, 2)
+    stats["docs_per_second"] = round(stats["indexed"] / elapsed, 2) if elapsed else 0.0
+    stats["chunks_per_second"] = round(stats["chunks"] / elapsed, 2) if elapsed else 0.0
+    stats["tokens_per_second"] = round(stats["tokens"] / elapsed, 1) if elapsed else 0.0
+    stats["estimated_cost_usd"] = round(stats["tokens"] / 1_000_000 * settings.EMBEDDING_PRICE_PER_1M_TOKENS, 4)
+    return stats
+
+# RAG – BUDOWANIE KONTEKSTU (merge / dedup / sąsiedzi / budżet tokenów)
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str | None = None):
+    """
+    Encoder tiktoken (cache per model). Gdy model jest nieznany – o200k_base.
+    Gdy tiktoken nie może pobrać plików BPE (brak sieci) – None i liczymy szacunkowo.
+    """
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model or settings.OPENAI_MODEL_NAME)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning("Brak tokenizera tiktoken, liczę tokeny szacunkowo: %s", e)
+        return None
+
+
+def count_tokens(text: str, model: str | None = None) -> int:
+    enc = _get_encoding(model)
+    if enc is None:
+        return (len(text) + 3) // 4
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str | None = None) -> str:
+    """Przycina tekst do max_tokens (na granicy tokenów, nie znaków)."""
+    return fit_to_tokens(text, max_tokens, model)[0]
+
+
+def fit_to_tokens(text: str, max_tokens: int, model: str | None = None) -> tuple[str, int, int]:
+    """
+    Jak truncate_to_tokens, ale z jedną tokenizacją całego tekstu zwraca też liczniki:
+    (tekst, tokeny oryginału, tokeny po przycięciu).
+    """
+    enc = _get_encoding(model)
+    if enc is None:
+        total = (len(text) + 3) // 4
+        if total <= max_tokens:
+            return text, total, total
+        kept = text[: max(0, max_tokens) * 4]
+        return kept, total, (len(kept) + 3) // 4
+    tokens = enc.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text, len(tokens), len(tokens)
+    kept_tokens = tokens[: max(0, max_tokens)]
+    return enc.decode(kept_tokens), len(tokens), len(kept_tokens)
+
+
+# BUDŻET TOKENÓW PROMPTU
+#
+# Budżety danych wejściowych (streszczenie, raport, kontekst RAG) są w tokenach tokenizera modelu:
+# cel z ustawień, ale nigdy więcej niż okno kontekstu minus stałe części promptu i rezerwa na odpowiedź.
+
+# narzut formatu chat na jedną wiadomość (rola, znaczniki początku/końca)
+CHAT_MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def context_window(model: str | None = None) -> int:
+    model = model or settings.OPENAI_MODEL_NAME
+    return settings.OPENAI_CONTEXT_WINDOWS.get(model, settings.OPENAI_DEFAULT_CONTEXT_WINDOW)
+
+
+def prompt_token_budget(
+    target: int,
+    model: str | None = None,
+    fixed_parts: list[str] | tuple[str, ...] = (),
+    reserve: int | None = None,
+) -> int:
+    """
+    Ile tokenów danych zmieścić w prompcie: `target`, ale nie więcej niż okno modelu
+    minus fixed_parts (prompt systemowy, pytanie, nagłówki) i rezerwa na odpowiedź.
+    """
+    reserve = settings.OPENAI_RESPONSE_RESERVE_TOKENS if reserve is None else reserve
+    fixed = sum(count_tokens(part, model) + CHAT_MESSAGE_OVERHEAD_TOKENS for part in fixed_parts)
+    return max(0, min(target, context_window(model) - reserve - fixed))
+
+
+def fit_sections_to_tokens(
+    sections: list[str],
+    max_tokens: int,
+    model: str | None = None,
+    separator: str = "\n",
+) -> tuple[list[str], dict]:
+    """
+    Dzieli budżet tokenów między sekcje (np. snapshoty ERP i MES) po równo: sekcje mniejsze
+    od swojego udziału wchodzą w całości, a niewykorzystana część przechodzi na większe,
+    które są przycinane od końca. Kolejność sekcji zostaje zachowana.
+    Zwraca (sekcje, metadata).
+    """
+    sizes = [count_tokens(section, model) for section in sections]
+    available = max(0, max_tokens - count_tokens(separator, model) * max(0, len(sections) - 1))
+
+    allowed = [0] * len(sections)
+    pending = sorted(range(len(sections)), key=lambda i: sizes[i])
+    while pending:
+        share = available // len(pending)
+        i = pending.pop(0)
+        allowed[i] = min(sizes[i], share)
+        available -= allowed[i]
+
+    fitted = [
+        section if allowed[i] >= sizes[i] else truncate_to_tokens(section, allowed[i], model)
+        for i, section in enumerate(sections)
+    ]
+    meta = {
+        "max_tokens": max_tokens,
+        "original_tokens": sum(sizes),
+        "input_tokens": count_tokens(separator.join(fitted), model),
+        "truncated_sections": [i for i in range(len(sections)) if allowed[i] < sizes[i]],
+    }
+    return fitted, meta
+
+
+def llm_usage_meta(model: str, usage: Any) -> dict:
+    """Zużycie tokenów z odpowiedzi API (response.usage) + koszt wg OPENAI_PRICING – do metadanych artefaktu."""
+    prompt = getattr(usage, "prompt_tokens", 0) or 0
+    completion = getattr(usage, "completion_tokens", 0) or 0
+    return {
+        "model": model,
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "total_tokens": prompt + completion,
+        "cost_usd": round(llm_cost_usd(model, prompt, completion), 6),
+    }
+
+
+def _merge_overlapping_text(left: str, right: str, max_overlap: int = 1000) -> str:
+    """Skleja dwa teksty usuwając najdłuższy wspólny sufiks/prefiks (overlap chunkera)."""
+    for k in range(min(len(left), len(right), max_overlap), 0, -1):
+        if left.endswith(right[:k]):
+            return left + right[k:]
+    return left + "\n" + right
+
+
+def _chunks_to_spans(chunks: list, ranks: dict[int, int]) -> list[dict]:
+    """
+    Łączy chunki nachodzące na siebie lub sąsiadujące w ciągłe fragmenty (spany).
+    Chunki z offsetami (create_structured_chunks) łączymy po char_start/char_end,
+    starsze chunki bez offsetów – po kolejnych chunk_index.
+    """
+    spans: list[dict] = []
+    for chunk in sorted(chunks, key=lambda c: c.chunk_index):
+        rank = ranks.get(chunk.chunk_index, len(ranks) + 1)
+        prev = spans[-1] if spans else None
+
+        if prev is not None:
+            if chunk.char_start is not None and prev["char_end"] is not None:
+                # +1: separator "\n" między stronami PDF
+                mergeable = chunk.char_start <= prev["char_end"] + 1
+            else:
+                mergeable = chunk.chunk_index == prev["last_index"] + 1
+
+            if mergeable:
+                if chunk.char_start is not None and prev["char_end"] is not None:
+                    overlap = prev["char_end"] - chunk.char_start
+                    if overlap >= 0:
+                        prev["text"] += chunk.text_content[overlap:]
+                    else:
+                        prev["text"] += "\n" + chunk.text_content
+                    prev["char_end"] = max(prev["char_end"], chunk.char_end or prev["char_end"])
+                else:
+                    prev["text"] = _merge_overlapping_text(prev["text"], chunk.text_content)
+                prev["last_index"] = chunk.chunk_index
+                prev["chunk_indexes"].append(chunk.chunk_index)
+                prev["rank"] = min(prev["rank"], rank)
+                if chunk.page_number and chunk.page_number not in prev["pages"]:
+                    prev["pages"].append(chunk.page_number)
+                continue
+
+        spans.append({
+            "text": chunk.text_content,
+            "char_start": chunk.char_start,
+            "char_end": chunk.char_end,
+            "first_index": chunk.chunk_index,
+            "last_index": chunk.chunk_index,
+            "chunk_indexes": [chunk.chunk_index],
+            "pages": [chunk.page_number] if chunk.page_number else [],
+            "heading_path": chunk.heading_path or [],
+            "rank": rank,
+        })
+    return spans
+
+
+def _span_header(span: dict) -> str:
+    parts = []
+    if span["pages"]:
+        pages = span["pages"]
+        parts.append(f"str. {pages[0]}" if len(pages) == 1 else f"str. {pages[0]}-{pages[-1]}")
+    if span["heading_path"]:
+        parts.append(" > ".join(span["heading_path"]))
+    return f"[{' | '.join(parts)}]\n" if parts else ""
+
+
+def build_rag_context(
+    document: Document,
+    hits: list,
+    max_tokens: int | None = None,
+    neighbour_radius: int | None = None,
+    model: str | None = None,
+    separator: str = "\n\n---\n\n",
+) -> tuple[str, dict]:
+    """
+    Buduje kontekst dla agenta QA z trafień wyszukiwania wektorowego:
+      1. (opcjonalnie) dokłada sąsiednie chunki trafień (chunk_index ± radius),
+      2. skleja nachodzące/sąsiadujące chunki w spany i usuwa zdublowany overlap,
+      3. pakuje spany wg trafności (ranking hits) do budżetu tokenów,
+      4. zwraca kontekst w kolejności występowania w dokumencie.
+    hits – DocumentChunk posortowane od najlepszego dopasowania.
+    Zwraca (context_text, metadata).
+    """
+    max_tokens = max_tokens if max_tokens is not None else settings.RAG_CONTEXT_MAX_TOKENS
+    radius = neighbour_radius if neighbour_radius is not None else settings.RAG_NEIGHBOUR_RADIUS
+
+    ranks = {c.chunk_index: i for i, c in enumerate(hits)}
+    chunks = {c.chunk_index: c for c in hits}
+    if radius > 0 and hits:
+        for c in get_neighbour_chunks(document, list(ranks), radius=radius):
+            chunks.setdefault(c.chunk_index, c)
+
+    spans = _chunks_to_spans(list(chunks.values()), ranks)
+
+    sep_tokens = count_tokens(separator, model)
+    used = 0
+    selected: list[dict] = []
+    for span in sorted(spans, key=lambda s: s["rank"]):
+        header = _span_header(span)
+        cost = count_tokens(header + span["text"], model) + (sep_tokens if selected else 0)
+        remaining = max_tokens - used
+        if cost <= remaining:
+            span["rendered"] = header + span["text"]
+        elif remaining - sep_tokens > 50:
+            # ostatni span przycinamy do pozostałego budżetu
+            span["rendered"] = truncate_to_tokens(
+                header + span["text"], remaining - (sep_tokens if selected else 0), model
+            )
+            cost = remaining
+        else:
+            continue
+        used += cost
+        selected.append(span)
+
+    selected.sort(key=lambda s: s["first_index"])
+    context_text = separator.join(s["rendered"] for s in selected)
+
+    # Tokenizacja sklejonego tekstu może minimalnie różnić się od sumy części –
+    # pilnujemy twardego limitu na całości.
+    total_tokens = count_tokens(context_text, model)
+    if total_tokens > max_tokens:
+        context_text = truncate_to_tokens(context_text, max_tokens, model)
+        total_tokens = count_tokens(context_text, model)
+
+    meta = {
+        "hits": len(hits),
+        "chunks_used": sum(len(s["chunk_indexes"]) for s in selected),
+        "spans": len(selected),
+        "context_tokens": total_tokens,
+        "max_tokens": max_tokens,
+        "neighbour_radius": radius,
+        "chunk_indexes": [s["chunk_indexes"] for s in selected],
+    }
+    return context_text, meta
+
+
+# DEDUPLIKACJA ZADAŃ (single-flight)
+#
+# Klucz (task, doc_id, hash parametrów) -> id zadania Celery w toku.
+# cache.add to SET NX w Redisie, więc tylko pierwsze żądanie uruchamia task;
+# kolejne dostają ten sam task_id i czekają na te same powiadomienia WebSocket.
+
+def job_dedup_key(task_name: str, doc_id: int, params: dict | None = None) -> str:
+    raw = json.dumps(params or {}, sort_keys=True, default=str)
+    digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+    return f"job:{task_name}:{doc_id}:{digest}"
+
+
+# Stan single-flight pod kluczem: [task_id, waiter_id, waiter_id, ...] – właściciel i podpięci użytkownicy
+# w jednej strukturze, zmieniane atomowo (Redis: lista + skrypty Lua, cache w pamięci: blokada procesu).
+_SF_CLAIM_LUA = """
+if redis.call('exists', KEYS[1]) == 0 then
+  redis.call('rpush', KEYS[1], ARGV[1])
+  redis.call('expire', KEYS[1], ARGV[2])
+  return {1, ARGV[1]}
+end
+if ARGV[3] ~= '' then
+  redis.call('rpush', KEYS[1], ARGV[3])
+end
+return {0, redis.call('lindex', KEYS[1], 0)}
+"""
+_SF_RELEASE_LUA = """
+if redis.call('lindex', KEYS[1], 0) ~= ARGV[1] then
+  return false
+end
+local waiters = redis.call('lrange', KEYS[1], 1, -1)
+redis.call('del', KEYS[1])
+return waiters
+"""
+_sf_local_lock = threading.Lock()
+
+
+def _single_flight_redis():
+    """Surowy klient Redis spod cache Django (RedisCache) albo None (LocMemCache – jeden proces)."""
+    get_client = getattr(getattr(cache, "_cache", None), "get_client", None)
+    return get_client(write=True) if get_client else None
+
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def claim_single_flight(key: str, task_id: str, ttl: int | None = None, waiter_id: int | None = None) -> tuple[str, bool]:
+    """
+    Atomowo: zajmuje klucz dla `task_id` albo – gdy zadanie jest w toku – dopisuje `waiter_id`
+    do jego listy oczekujących. Zwraca (task_id właściciela, claimed).
+    Użytkownik jest więc zawsze właścicielem albo zarejestrowanym oczekującym.
+    """
+    ttl = ttl if ttl is not None else settings.JOB_DEDUP_TTL
+    client = _single_flight_redis()
+    if client is not None:
+        claimed, owner = client.eval(
+            _SF_CLAIM_LUA, 1, cache.make_key(key), task_id, ttl, "" if waiter_id is None else waiter_id
+        )
+        return _decode(owner), bool(claimed)
+    with _sf_local_lock:
+        state = cache.get(key)
+        if not state:
+            cache.set(key, [task_id], timeout=ttl)
+            return task_id, True
+        if waiter_id is not None:
+            state.append(waiter_id)
+            cache.set(key, state, timeout=ttl)
+        return state[0], False
+
+
+def start_single_flight(task, key: str, args=(), kwargs=None, ttl: int | None = None,
+                        waiter_id: int | None = None) -> tuple[str, bool]:
+    """
+    Uruchamia `task` tylko jeśli pod kluczem `key` nie ma zadania w toku.
+    Zwraca (task_id, deduplicated) – deduplicated=True gdy podpięto się pod istniejący task
+    (z `waiter_id` – w tym samym kroku rejestrowany jako oczekujący, patrz claim_single_flight).
+    Task musi na końcu zawołać finish_single_flight(key, task_id).
+    """
+    task_id, claimed = claim_single_flight(key, str(uuid.uuid4()), ttl, waiter_id)
+    if not claimed:
+        return task_id, True
+    try:
+        task.apply_async(args=args, kwargs=kwargs or {}, task_id=task_id)
+    except Exception:
+        finish_single_flight(key, task_id)
+        raise
+    return task_id, False
+
+
+def finish_single_flight(key: str, task_id: str | None) -> list[int]:
+    """
+    Zwalnia klucz (tylko jeśli należy do tego zadania) i zwraca listę użytkowników,
+    którzy podpięli się pod zadanie – po jednym wpisie na każde podpięte żądanie.
+    Odczyt listy i zwolnienie klucza to jeden krok – nikt nie dopisze się do zakończonego zadania.
+    """
+    if task_id is None:
+        return []
+    client = _single_flight_redis()
+    if client is not None:
+        waiters = client.eval(_SF_RELEASE_LUA, 1, cache.make_key(key), task_id)
+        return [int(_decode(w)) for w in waiters or []]
+    with _sf_local_lock:
+        state = cache.get(key)
+        if not state or state[0] != task_id:
+            return []
+        cache.delete(key)
+        return [int(w) for w in state[1:]]
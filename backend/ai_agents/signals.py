@@ -1,7 +1,10 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from documents.models import Document
-from .tasks import process_document_indexing_task
+from users.models import QuotaCounter
+from users.services import add_quota_usage, release_quota
+from .models import AiArtifact
+from .tasks import schedule_document_indexing
 
 @receiver(post_save, sender=Document)
 def auto_index_new_document(sender, instance, created, **kwargs):
@@ -11,6 +14,48 @@ def auto_index_new_document(sender, instance, created, **kwargs):
     """
     if created:
         # created=True oznacza, że to nowy wpis (INSERT), a nie edycja (UPDATE).
-        # Uruchamiamy task w Celery
-        print(f"[Signal] Nowy dokument ID={instance.id} wykryty. Uruchamiam indeksowanie...")
-        process_document_indexing_task.delay(instance.id)
\ No newline at end of file
+        # Dokumenty z mocka nie mają jeszcze pliku – zindeksuje je fetch_and_store_file_task
+        # po pobraniu pliku. Pozostałe: task dopiero po COMMIT (harmonogram batchuje).
+        if not instance.file:
+            return
+        print(f"[Signal] Nowy dokument ID={instance.id} wykryty. Planuję indeksowanie...")
+        schedule_document_indexing([instance.id])
+
+
+# Limity (QuotaCounter) – każda ścieżka usunięcia/dezaktywacji zwalnia jednostkę, nie tylko widoki API
+# (admin, shell, kaskady). queryset.update() omija sygnały – to łapie try_consume_quota(reconcile=True).
+
+@receiver(pre_save, sender=Document)
+def remember_upload_active_state(sender, instance, update_fields=None, **kwargs):
+    instance._quota_was_active = None
+    if instance.pk is None or instance.source != Document.SOURCE_USER_UPLOAD or not instance.uploaded_by_id:
+        return
+    if update_fields is not None and "is_active" not in update_fields:
+        return
+    instance._quota_was_active = (
+        Document.objects.filter(pk=instance.pk).values_list("is_active", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Document)
+def sync_upload_quota_on_deactivation(sender, instance, created, **kwargs):
+    was_active = getattr(instance, "_quota_was_active", None)
+    if created or was_active is None or was_active == instance.is_active:
+        return
+    if instance.is_active:
+        add_quota_usage(instance.uploaded_by_id, QuotaCounter.KIND_UPLOAD)
+    else:
+        release_quota(instance.uploaded_by_id, QuotaCounter.KIND_UPLOAD)
+
+
+@receiver(post_delete, sender=Document)
+def release_upload_quota(sender, instance, **kwargs):
+    # nieaktywny dokument zwolnił limit już przy dezaktywacji
+    if instance.source == Document.SOURCE_USER_UPLOAD and instance.uploaded_by_id and instance.is_active:
+        release_quota(instance.uploaded_by_id, QuotaCounter.KIND_UPLOAD)
+
+
+@receiver(post_delete, sender=AiArtifact)
+def release_summary_quota(sender, instance, **kwargs):
+    if instance.artifact_type == AiArtifact.TYPE_SUMMARY and instance.document_id and instance.owner_id:
+        release_quota(instance.owner_id, QuotaCounter.KIND_SUMMARY, instance.document_id)
@@ -1,13 +1,30 @@
-from celery import shared_task
+import json
+
+from celery import chord, group, shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from django.core.exceptions import ObjectDoesNotExist
 from django.contrib.auth import get_user_model
 from django.core.files.base import ContentFile
 
 from documents.models import Document
 from erp_mes.models import ErpMesSnapshot
-from erp_mes.services import MockErpMesClient
+from erp_mes.services import (
+    MockErpMesClient,
+    load_snapshot_records,
+    diff_snapshot_records,
+    snapshot_aggregates,
+    summarize_snapshot_diff,
+    render_snapshot_diff,
+    compute_and_store_snapshot_kpis,
+    render_snapshot_kpis,
+)
+from users.models import QuotaCounter
+from users.services import release_quota
+from proscientia.metrics import CHANNEL_PUBLISH_SECONDS, stage_timer
 from .models import AiArtifact, AiSummary, DocumentChunk
-from .services import run_agent_summary_for_document, build_summary_filename, run_agent_summary_from_text, extract_text_from_document, create_smart_chunks, get_embedding
+from .services import artifact_token_usage, attach_stage_timings, fit_sections_to_tokens, prompt_token_budget, run_agent_summary_for_document, run_agent_summary_from_text, extract_pages_from_document, create_structured_chunks, get_embeddings, store_document_chunks, select_mock_corpus_documents, start_single_flight, job_dedup_key, finish_single_flight, save_summary_artifact
 
 # Importy do WebSockets (asynchroniczność w synchronicznym tasku)
 from channels.layers import get_channel_layer                       # type: ignore
@@ -17,21 +34,38 @@ from asgiref.sync import async_to_sync
 def generate_summary_task(self, doc_id, user_id, scope=None):
     channel_layer = get_channel_layer()
     User = get_user_model()
-
-    def send_update(status, data=None):
-        async_to_sync(channel_layer.group_send)(                                    # type: ignore
-            "global_notifications",  # na razie globalnie, później user_<id>
-            {
-                "type": "task_update",
-                "message": {
-                    "task_id": self.request.id,
-                    "doc_id": doc_id,
-                    "user_id": user_id,
-                    "status": status,
-                    "payload": data or {},
+    dedup_key = job_dedup_key("summary", doc_id, {"scope": scope})
+
+    def send_update(status, data=None, recipient_id=None):
+        with CHANNEL_PUBLISH_SECONDS.labels("global_notifications").time():
+            async_to_sync(channel_layer.group_send)(                                # type: ignore
+                "global_notifications",  # na razie globalnie, później user_<id>
+                {
+                    "type": "task_update",
+                    "message": {
+                        "task_id": self.request.id,
+                        "doc_id": doc_id,
+                        "user_id": recipient_id or user_id,
+                        "status": status,
+                        "payload": data or {},
+                    },
                 },
-            },
-        )
+            )
+
+    def fail(error):
+        # streszczenie nie powstało – oddajemy jednostki zużyte w TriggerSummaryView
+        # (także użytkownikom podpiętym pod to zadanie)
+        for uid in [user_id, *finish_single_flight(dedup_key, self.request.id)]:
+            release_quota(uid, QuotaCounter.KIND_SUMMARY, doc_id)
+            send_update("error", {"error": error}, recipient_id=uid)
+
+    def artifact_payload(artifact, summary_text):
+        return {
+            "artifact_id": artifact.id,                         # type: ignore
+            "file_url": artifact.file.url,
+            "title": artifact.title,
+            "summary_preview": (summary_text or "")[:500],
+        }
 
     try:
         send_update("started")
@@ -40,42 +74,26 @@ def generate_summary_task(self, doc_id, user_id, scope=None):
         try:
             user = User.objects.get(id=user_id)
         except User.DoesNotExist:
-            send_update("error", {"error": "Użytkownik nie istnieje."})
+            fail("Użytkownik nie istnieje.")
             return "User does not exist"
 
         try:
             doc = Document.objects.get(id=doc_id)
         except Document.DoesNotExist:
-            send_update("error", {"error": "Dokument nie istnieje."})
+            fail("Dokument nie istnieje.")
             return "Document does not exist"
 
         if not doc.file:
-            send_update("error", {"error": "Brak pliku powiązanego z dokumentem."})
+            fail("Brak pliku powiązanego z dokumentem.")
             return "No file"
 
         # 2. Praca agenta – nowa funkcja z obsługą scope/chunkingu
         summary_text, summary_meta = run_agent_summary_for_document(doc, scope=scope)
 
-        # 3. Zapis streszczenia jako plik .txt w AiArtifact
-        filename = build_summary_filename(doc, user)
-        title = doc.title or doc.mock_filename or f"Document {doc.id}"                      # type: ignore
-
-        artifact = AiArtifact(
-            artifact_type=AiArtifact.TYPE_SUMMARY,
-            document=doc,
-            owner=user,
-            title=f"Streszczenie: {title}",
-            metadata={
-                "scope": scope,
-                "summary_meta": summary_meta,
-                "source": doc.source,
-                "mock_stream": getattr(doc, "mock_stream", None),
-                "mock_version_date": (
-                    doc.mock_version_date.isoformat() if getattr(doc, "mock_version_date", None) else None      # type: ignore
-                ),
-            },
-        )
-        artifact.file.save(filename, ContentFile(summary_text or ""), save=True)
+        # 3. Zapis streszczenia jako plik .txt w AiArtifact (+ czasy etapów do metadanych)
+        with stage_timer("summary", "save"):
+            artifact = save_summary_artifact(doc, user, summary_text, summary_meta, scope)
+        attach_stage_timings(artifact)
 
         # (opcjonalnie: można nadal uzupełniać AiSummary, ale nie jest to już wymagane)
         # AiSummary.objects.update_or_create(
@@ -84,20 +102,27 @@ def generate_summary_task(self, doc_id, user_id, scope=None):
         # )
 
         # 4. Sukces – wyślij info o artefakcie do frontendu
-        send_update(
-            "completed",
-            {
-                "artifact_id": artifact.id,                         # type: ignore 
-                "file_url": artifact.file.url,
-                "title": artifact.title,
-                "summary_preview": (summary_text or "")[:500],
-            },
-        )
+        send_update("completed", artifact_payload(artifact, summary_text))
+
+        # 5. Użytkownicy podpięci pod to samo zadanie (deduplikacja) dostają własną kopię;
+        #    powtórne żądanie tego samego użytkownika nie tworzy drugiego artefaktu,
+        #    więc oddajemy zużytą przez nie jednostkę limitu
+        served = {user_id}
+        for waiter_id in finish_single_flight(dedup_key, self.request.id):
+            waiter = None if waiter_id in served else User.objects.filter(id=waiter_id).first()
+            if waiter is None:
+                release_quota(waiter_id, QuotaCounter.KIND_SUMMARY, doc_id)
+                continue
+            served.add(waiter_id)
+            copy = save_summary_artifact(
+                doc, waiter, summary_text, {**summary_meta, "shared_from_task": self.request.id}, scope
+            )
+            send_update("completed", artifact_payload(copy, summary_text), recipient_id=waiter_id)
 
         return "Success"
 
     except Exception as e:
-        send_update("error", {"error": str(e)})
+        fail(str(e))
         raise e
     
     
@@ -106,26 +131,28 @@ def generate_erp_mes_latest_report_task(self, user_id, scope=None):
     """
     Tworzy szybki raport z najnowszych snapshotów ERP i MES:
     - znajduje snapshoty is_latest=True
-    - pobiera wszystkie pliki JSON z tych snapshotów z mock API
+    - pobiera wszystkie pliki JSON z tych snapshotów i z poprzednich wersji
+    - liczy diff rekordów (po kluczach ID) + agregaty i tylko to wysyła do LLM
     - generuje streszczenie (raport) i zapisuje jako AiArtifact (txt)
     """
     channel_layer = get_channel_layer()
     User = get_user_model()
 
     def send_update(status, data=None):
-        async_to_sync(channel_layer.group_send)(                # type: ignore
-            "global_notifications",
-            {
-                "type": "task_update",
-                "message": {
-                    "task_id": self.request.id,
-                    "doc_id": None,
-                    "user_id": user_id,
-                    "status": status,
-                    "payload": data or {},
+        with CHANNEL_PUBLISH_SECONDS.labels("global_notifications").time():
+            async_to_sync(channel_layer.group_send)(                # type: ignore
+                "global_notifications",
+                {
+                    "type": "task_update",
+                    "message": {
+                        "task_id": self.request.id,
+                        "doc_id": None,
+                        "user_id": user_id,
+                        "status": status,
+                        "payload": data or {},
+                    },
                 },
-            },
-        )
+            )
 
     try:
         send_update("started")
@@ -149,34 +176,49 @@ def generate_erp_mes_latest_report_task(self, user_id, scope=None):
 
         client = MockErpMesClient()
 
-        # 2. Zbuduj tekst wejściowy z zawartości plików JSON
+        # 2. Zbuduj tekst wejściowy: diff względem poprzedniego snapshotu + agregaty.
+        #    Zamiast ucinać każdy plik do 2000 znaków, wysyłamy tylko zmiany
+        #    (dodane / usunięte / zmienione rekordy) i liczniki całego zbioru.
+        #    Jedna sekcja na snapshot – budżet tokenów dzielony jest między nie po równo.
         sections: list[str] = []
-        for snap in snapshots:
-            date_str = snap.version_date.isoformat()
-            header = f"\n=== SNAPSHOT {snap.get_stream_display()} {date_str} ===\n"             # type: ignore
-            sections.append(header)
-
-            for file_info in (snap.files or []):
-                name = file_info.get("name", "")
-                if not name.endswith(".json"):
-                    continue
-
-                try:
-                    content_bytes = client.get_file_bytes(
-                        stream=snap.stream,
-                        name=name,
-                        date=date_str,
-                    )
-                    text = content_bytes.decode("utf-8", errors="ignore")
-                except Exception as e:
-                    text = f"<<Błąd pobierania pliku {name}: {e}>>"
-
-                # przytnij, żeby nie zalać modelu
-                text = text[:2000]
-                sections.append(f"\n--- PLIK: {name} ---\n{text}\n")
-
-        full_text = "\n".join(sections).strip()
-        if not full_text:
+        diff_info: list[dict] = []
+        with stage_timer("erp_mes_report", "collect"):
+            for snap in snapshots:
+                date_str = snap.version_date.isoformat()
+                previous = snap.get_previous()
+
+                new_records = load_snapshot_records(client, snap.stream, date_str, snap.files)
+                old_records = (
+                    load_snapshot_records(client, snap.stream, previous.version_date.isoformat(), previous.files)
+                    if previous else {}
+                )
+                diff = diff_snapshot_records(old_records, new_records)
+
+                prev_str = previous.version_date.isoformat() if previous else "brak"
+                parts = [
+                    f"\n=== SNAPSHOT {snap.get_stream_display()} {date_str} "             # type: ignore
+                    f"(poprzedni: {prev_str}) ===\n",
+                    "AGREGATY:\n"
+                    + json.dumps(snapshot_aggregates(new_records), ensure_ascii=False, separators=(",", ":")),
+                ]
+                if snap.stream == ErpMesSnapshot.STREAM_MES:
+                    # KPI liczone raz po syncu – jeśli jeszcze ich nie ma, liczymy teraz
+                    if not snap.kpis.exists():                                              # type: ignore[attr-defined]
+                        compute_and_store_snapshot_kpis(snap, client=client)
+                    parts.append("KPI (linia / produkt / zmiana / przyczyna przestoju):\n"
+                                 + render_snapshot_kpis(snap.kpis.all()))                    # type: ignore[attr-defined]
+                # diff na końcu sekcji – przy przycinaniu do budżetu odpada pierwszy
+                parts.append("ZMIANY WZGLĘDEM POPRZEDNIEGO SNAPSHOTU:\n" + render_snapshot_diff(diff))
+                sections.append("\n".join(parts))
+
+                diff_info.append({
+                    "stream": snap.stream,
+                    "version_date": date_str,
+                    "compared_to": previous.version_date.isoformat() if previous else None,
+                    "datasets": summarize_snapshot_diff(diff),
+                })
+
+        if not "\n".join(sections).strip():
             send_update("error", {"error": "Brak danych z plików JSON ERP/MES."})
             return "No JSON data"
 
@@ -184,16 +226,27 @@ def generate_erp_mes_latest_report_task(self, user_id, scope=None):
         system_prompt = (
             "Jesteś inżynierem produkcji. Na podstawie danych ERP i MES "
             "z najnowszych snapshotów stwórz krótki raport w punktach. "
+            "Dostajesz agregaty całego snapshotu oraz listę zmian (dodane, usunięte "
+            "i zmienione rekordy) względem poprzedniego snapshotu. "
             "Skup się na najważniejszych informacjach: liczbie/rodzajach zleceń, "
-            "stanach produkcji, potencjalnych problemach lub alertach. "
+            "stanach produkcji, co się zmieniło od poprzedniej wersji, "
+            "potencjalnych problemach lub alertach. "
             "Nie przepisuj danych 1:1 – podsumuj je."
         )
 
-        summary_text, llm_meta = run_agent_summary_from_text(
-            full_text,
-            scope=scope,
-            system_prompt=system_prompt,
+        max_tokens = prompt_token_budget(
+            settings.REPORT_INPUT_MAX_TOKENS, settings.OPENAI_MODEL_NAME, [system_prompt]
         )
+        sections, input_meta = fit_sections_to_tokens(sections, max_tokens, settings.OPENAI_MODEL_NAME)
+        full_text = "\n".join(sections).strip()
+
+        with stage_timer("erp_mes_report", "llm"):
+            summary_text, llm_meta = run_agent_summary_from_text(
+                full_text,
+                scope=scope,
+                system_prompt=system_prompt,
+                max_input_tokens=max_tokens,
+            )
 
         # 4. Zapis jako AiArtifact (bez konkretnego Document)
         snap_info = [
@@ -207,23 +260,28 @@ def generate_erp_mes_latest_report_task(self, user_id, scope=None):
         ]
 
         title = "Raport ERP/MES – najnowsze snapshoty"
-        artifact = AiArtifact(
-            artifact_type=AiArtifact.TYPE_SUMMARY,
-            document=None,
-            owner=user,
-            title=title,
-            metadata={
-                "scope": scope,
-                "llm": llm_meta,
-                "report_type": "erp_mes_latest",
-                "snapshots": snap_info,
-            },
-        )
-        artifact.file.save(
-            "report_erp_mes_latest.txt",
-            ContentFile(summary_text or ""),
-            save=True,
-        )
+        with stage_timer("erp_mes_report", "save"):
+            artifact = AiArtifact(
+                artifact_type=AiArtifact.TYPE_SUMMARY,
+                document=None,
+                owner=user,
+                title=title,
+                metadata={
+                    "scope": scope,
+                    "llm": llm_meta,
+                    "input": input_meta,
+                    "usage": artifact_token_usage({"llm": llm_meta}),
+                    "report_type": "erp_mes_latest",
+                    "snapshots": snap_info,
+                    "diff": diff_info,
+                },
+            )
+            artifact.file.save(
+                "report_erp_mes_latest.txt",
+                ContentFile(summary_text or ""),
+                save=True,
+            )
+        attach_stage_timings(artifact)
 
         send_update(
             "completed",
@@ -242,22 +300,16 @@ def generate_erp_mes_latest_report_task(self, user_id, scope=None):
         raise e
 
 
-@shared_task(bind=True)
-def process_document_indexing_task(self, doc_id):
-    """
-    Task RAG: Pobiera plik, tnie go na kawałki i zapisuje wektory w bazie.
-    Uruchamiany po wgraniu pliku lub ręcznie.
-    """
-    channel_layer = get_channel_layer()
-    
-    def send_update(status, message=None, progress=0):
-        # Używamy tego samego formatu powiadomień co Piotr
-        async_to_sync(channel_layer.group_send)(
+def send_indexing_update(task_id, doc_id, status, message=None, progress=0):
+    """Powiadomienie WebSocket o postępie indeksowania (wspólne dla etapów pipeline'u)."""
+    # Używamy tego samego formatu powiadomień co Piotr
+    with CHANNEL_PUBLISH_SECONDS.labels("global_notifications").time():
+        async_to_sync(get_channel_layer().group_send)(                                  # type: ignore
             "global_notifications",
             {
                 "type": "task_update",
                 "message": {
-                    "task_id": self.request.id,
+                    "task_id": task_id,
                     "doc_id": doc_id,
                     "type": "indexing", # Tagujemy jako indeksowanie
                     "status": status,
@@ -267,6 +319,50 @@ def process_document_indexing_task(self, doc_id):
             }
         )
 
+
+def _indexing_progress_key(task_id):
+    return f"index-progress:{task_id}"
+
+
+def _indexing_chunks_key(task_id):
+    return f"index-chunks:{task_id}"
+
+
+def _load_indexing_chunks(doc_id, root_task_id):
+    """
+    Chunki zapisane przez process_document_indexing_task (nie jadą w wiadomości brokera).
+    Gdy wpis wygasł albo cache nie jest współdzielony – chunking jest deterministyczny, tniemy ponownie.
+    """
+    chunks = cache.get(_indexing_chunks_key(root_task_id))
+    if chunks is not None:
+        return chunks
+    doc = Document.objects.filter(id=doc_id).first()
+    if doc is None or not doc.file:
+        return None
+    pages, paginated = extract_pages_from_document(doc)
+    return create_structured_chunks(pages, paginated=paginated)
+
+
+@shared_task(bind=True)
+def process_document_indexing_task(self, doc_id):
+    """
+    Task RAG: Pobiera plik, tnie go na kawałki i zapisuje wektory w bazie.
+    Uruchamiany po wgraniu pliku lub ręcznie.
+
+    Pipeline (Celery canvas):
+      1. ten task (kolejka cpu): ekstrakcja + chunking,
+      2. chord: embed_chunks_batch_task × N równolegle (kolejka llm, batch RAG_EMBED_BATCH_SIZE),
+      3. store_document_chunks_task (kolejka cpu): atomowa podmiana chunków dokumentu.
+    Batche dostają tylko swoje teksty; pełne chunki (tekst + metadane) etap 3 bierze z krótkotrwałego
+    wpisu w cache, a nie z wiadomości brokera.
+    Powiadomienia wszystkich etapów idą z task_id tego taska (id zwrócone klientowi).
+    """
+    task_id = self.request.id
+    pipeline_started = False
+
+    def send_update(status, message=None, progress=0):
+        send_indexing_update(task_id, doc_id, status, message, progress)
+
     try:
         send_update("started", "Rozpoczynam indeksowanie (RAG)...", 0)
         
@@ -280,48 +376,187 @@ def process_document_indexing_task(self, doc_id):
             send_update("error", "Brak pliku fizycznego")
             return "No file"
 
-        # 1. Ekstrakcja (używamy funkcji Piotra, która obsługuje PDF/JSON/TXT)
+        # 1. Ekstrakcja z podziałem na strony (PDF) – reszta formatów jako jedna "strona"
         send_update("processing", "Czytanie treści...", 10)
-        raw_text = extract_text_from_document(doc)
+        with stage_timer("indexing", "extract"):
+            pages, paginated = extract_pages_from_document(doc)
         
-        if not raw_text:
+        if not any(p.strip() for p in pages):
             send_update("error", "Pusty plik lub błąd odczytu")
             return "Empty text"
 
-        # 2. Chunking (używamy Twojej nowej funkcji 'smart')
+        # 2. Chunking strukturalny (strona, offsety, ścieżka nagłówków)
         send_update("processing", "Dzielenie na fragmenty...", 20)
-        chunks = create_smart_chunks(raw_text)
+        with stage_timer("indexing", "chunk"):
+            chunks = create_structured_chunks(pages, paginated=paginated)
         total_chunks = len(chunks)
 
         if total_chunks == 0:
              send_update("completed", "Plik pusty, brak fragmentów.")
              return "No chunks"
 
-        # 3. Embedding i Zapis
-        # Czyścimy stare chunki (re-indeksowanie)
-        DocumentChunk.objects.filter(document=doc).delete()
-
+        # 3. Embedding batchami równolegle, zapis w jednym kroku po zebraniu wszystkich wektorów
         send_update("processing", f"Generowanie wektorów dla {total_chunks} fragmentów...", 30)
+        batch_size = settings.RAG_EMBED_BATCH_SIZE
+        header = group(
+            embed_chunks_batch_task.s([c["text"] for c in chunks[i:i + batch_size]], task_id, doc_id, total_chunks)
+            for i in range(0, total_chunks, batch_size)
+        )
+        cache.set(_indexing_chunks_key(task_id), chunks, timeout=settings.JOB_DEDUP_TTL)
+        body = store_document_chunks_task.s(doc_id, task_id).on_error(
+            indexing_pipeline_failed.s(doc_id, task_id)
+        )
+        chord(header)(body)
+        pipeline_started = True
+        return f"Pipeline started: {total_chunks} chunks in {len(header.tasks)} batches"
 
-        for i, chunk_text in enumerate(chunks):
-            vector = get_embedding(chunk_text)
-            
-            if vector:
-                DocumentChunk.objects.create(
-                    document=doc,
-                    chunk_index=i,
-                    text_content=chunk_text,
-                    embedding=vector
-                )
-            
-            # Raportujemy postęp co 10%
-            progress = 30 + int(((i + 1) / total_chunks) * 70)
-            if i % 5 == 0 or i == total_chunks - 1:
-                 send_update("processing", f"Indeksowanie: {i+1}/{total_chunks}", progress)
+    except Exception as e:
+        send_update("error", str(e))
+        raise e
 
-        send_update("completed", f"Zakończono. Zindeksowano {total_chunks} fragmentów.", 100)
-        return f"Indexed {total_chunks} chunks"
+    finally:
+        # bez pipeline'u (błąd / pusty plik) zwalniamy klucz deduplikacji od razu,
+        # w przeciwnym razie zrobi to etap zapisu
+        if not pipeline_started:
+            cache.delete(_indexing_chunks_key(task_id))
+            finish_single_flight(job_dedup_key("index", doc_id), task_id)
+
+
+@shared_task
+def embed_chunks_batch_task(texts, root_task_id, doc_id, total_chunks):
+    """Etap 2: wektory dla jednego batcha chunków (jedno wywołanie API embeddings)."""
+    with stage_timer("indexing", "embed"):
+        vectors = get_embeddings(texts)
+
+    # licznik gotowych chunków współdzielony przez równoległe batche
+    progress_key = _indexing_progress_key(root_task_id)
+    cache.add(progress_key, 0, timeout=settings.JOB_DEDUP_TTL)
+    done = min(cache.incr(progress_key, len(texts)), total_chunks)
+    send_indexing_update(
+        root_task_id, doc_id, "processing",
+        f"Indeksowanie: {done}/{total_chunks}",
+        30 + int(done / total_chunks * 65),
+    )
+    return vectors
+
+
+@shared_task
+def store_document_chunks_task(batches, doc_id, root_task_id):
+    """Etap 3: atomowa podmiana chunków dokumentu (stare znikają dopiero razem z zapisem nowych)."""
+    dedup_key = job_dedup_key("index", doc_id)
+    try:
+        vectors = [v for batch in batches for v in batch]
+        chunks = _load_indexing_chunks(doc_id, root_task_id)
+        with stage_timer("indexing", "store"):
+            stored = None if chunks is None else store_document_chunks(doc_id, chunks, vectors)
+        if stored is None:
+            send_indexing_update(root_task_id, doc_id, "error", "Dokument nie istnieje")
+            return "Document not found"
+
+        send_indexing_update(
+            root_task_id, doc_id, "completed", f"Zakończono. Zindeksowano {stored} fragmentów.", 100
+        )
+        return f"Indexed {stored} chunks"
 
     except Exception as e:
-        send_update("error", str(e))
-        raise e
\ No newline at end of file
+        send_indexing_update(root_task_id, doc_id, "error", str(e))
+        raise e
+
+    finally:
+        cache.delete_many([_indexing_progress_key(root_task_id), _indexing_chunks_key(root_task_id)])
+        finish_single_flight(dedup_key, root_task_id)
+
+
+@shared_task
+def indexing_pipeline_failed(request, exc, traceback, doc_id, root_task_id):
+    """Errback chorda: błąd w batchu embeddingów – etap zapisu się nie wykona."""
+    send_indexing_update(root_task_id, doc_id, "error", f"Błąd indeksowania: {exc}")
+    cache.delete_many([_indexing_progress_key(root_task_id), _indexing_chunks_key(root_task_id)])
+    finish_single_flight(job_dedup_key("index", doc_id), root_task_id)
+
+
+@shared_task
+def index_mock_corpus_task(streams=("docs", "erp", "mes"), all_versions=False, reindex=False):
+    """
+    Masowe indeksowanie korpusu mocka w tle (akcja w panelu admina): tworzy brakujące Document
+    i zleca dla każdego zwykły pipeline – plik jest -> process_document_indexing_task (single-flight,
+    chord na kolejkach cpu/llm), brak pliku -> fetch_and_store_file_task (kolejka io), który po zapisie
+    pliku sam zleca indeksowanie.
+    """
+    from documents.tasks import fetch_and_store_file_task  # documents.tasks importuje ten moduł
+
+    specs, created, docs = select_mock_corpus_documents(
+        MockErpMesClient(), streams=streams, all_versions=all_versions, reindex=reindex
+    )
+    stats = {"discovered": len(specs), "created": len(created), "scheduled": 0, "deduplicated": 0, "fetching": 0}
+    for doc in docs:
+        if not doc.file:
+            fetch_and_store_file_task.delay(doc.id)
+            stats["fetching"] += 1
+            continue
+        _, deduplicated = start_single_flight(
+            process_document_indexing_task, job_dedup_key("index", doc.id), args=(doc.id,)
+        )
+        stats["deduplicated" if deduplicated else "scheduled"] += 1
+    return stats
+
+
+# Harmonogram indeksowania: sygnał post_save i fetch z mocka nie wołają .delay() od razu –
+# id dokumentów zbiera batch przypięty do bieżącej transakcji (callback on_commit) i są wysyłane po COMMIT.
+# ROLLBACK (także savepointu) usuwa callback razem z jego id – nic nie przecieka do kolejnej transakcji.
+
+class _IndexingBatch:
+    """Callback on_commit z własną listą id dokumentów (jeden na poziom savepointu transakcji)."""
+
+    def __init__(self, doc_ids):
+        self.ids = list(doc_ids)
+
+    def __call__(self):
+        _dispatch_indexing(self.ids)
+
+
+def _dispatch_indexing(doc_ids):
+    ids = list(dict.fromkeys(doc_ids))
+    size = settings.INDEXING_BATCH_SIZE
+    for i in range(0, len(ids), size):
+        index_documents_batch_task.delay(ids[i:i + size])
+
+
+def schedule_document_indexing(doc_ids, using=None):
+    """
+    Zleca indeksowanie dokumentów po zatwierdzeniu bieżącej transakcji.
+    Wiele dokumentów z jednej transakcji (albo jednego żądania) -> jeden/kilka batchy.
+    Poza transakcją wysyła od razu.
+    """
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        _dispatch_indexing(doc_ids)
+        return
+    # dopisujemy do batcha z tego samego poziomu savepointu – rollback savepointu usuwa go w całości
+    savepoints = set(connection.savepoint_ids)
+    for callback_savepoints, callback, _robust in connection.run_on_commit:
+        if isinstance(callback, _IndexingBatch) and callback_savepoints == savepoints:
+            callback.ids.extend(doc_ids)
+            return
+    transaction.on_commit(_IndexingBatch(doc_ids), using=using)
+
+
+@shared_task
+def index_documents_batch_task(doc_ids):
+    """
+    Batch z harmonogramu: uruchamia pipeline indeksowania dla dokumentów, które mają już plik
+    (single-flight – dokument indeksowany w tej chwili nie zostanie zdublowany).
+    """
+    started = 0
+    ready = (
+        Document.objects.filter(id__in=doc_ids, is_active=True)
+        .exclude(file="")
+        .exclude(file__isnull=True)
+        .values_list("id", flat=True)
+    )
+    for doc_id in ready:
+        _, deduplicated = start_single_flight(
+            process_document_indexing_task, job_dedup_key("index", doc_id), args=(doc_id,)
+        )
+        started += not deduplicated
+    return started
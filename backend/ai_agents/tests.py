@@ -1,3 +1,481 @@
-from django.test import TestCase
+import datetime
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.test import TestCase, override_settings
+
+from documents.models import Document
+from erp_mes.models import ErpMesSnapshot
+from erp_mes.services import MockErpMesClient
+
+from .models import DocumentChunk
+from .services import (
+    _detect_heading,
+    _get_encoding,
+    build_rag_context,
+    claim_single_flight,
+    count_tokens,
+    create_structured_chunks,
+    current_chunker_version,
+    document_file_sha256,
+    finish_single_flight,
+    get_embeddings,
+    index_mock_corpus,
+    job_dedup_key,
+    select_mock_corpus_documents,
+    start_single_flight,
+    store_document_chunks,
+)
+from .tasks import (
+    generate_erp_mes_latest_report_task,
+    index_mock_corpus_task,
+    process_document_indexing_task,
+    schedule_document_indexing,
+    store_document_chunks_task,
+)
+
+
+class RecordingChannelLayer:
+    """Channel layer zapamiętujący wysłane wiadomości (bez Redisa)."""
+
+    def __init__(self) -> None:
+        self.messages: list[dict] = []
+
+    async def group_send(self, group, message):
+        self.messages.append(message["message"])
+
+
+@override_settings(MOCK_API_BASE="http://mock.invalid")
+class ErpMesReportFailureTests(TestCase):
+    """Błąd raportu dociera do klienta (status "error") i leci dalej jako oryginalny wyjątek."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email="report@example.com", password="x")
+        ErpMesSnapshot.objects.create(stream="mes", version_date=datetime.date(2026, 1, 5), is_latest=True)
+
+    def test_failure_sends_error_and_reraises(self):
+        layer = RecordingChannelLayer()
+        with mock.patch("ai_agents.tasks.get_channel_layer", return_value=layer), \
+                mock.patch("ai_agents.tasks.load_snapshot_records", side_effect=RuntimeError("mock down")):
+            with self.assertRaisesMessage(RuntimeError, "mock down"):
+                generate_erp_mes_latest_report_task(self.user.id)
+
+        self.assertEqual([m["status"] for m in layer.messages], ["started", "error"])
+        self.assertEqual(layer.messages[-1]["payload"], {"error": "mock down"})
+
+
+class DocumentFileHashTests(TestCase):
+    """Hash pliku dla cache streszczeń liczony jest najwyżej raz i zapamiętywany w Document."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=tmp.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_hash_is_computed_once_and_persisted(self):
+        doc = Document.objects.create(source=Document.SOURCE_USER_UPLOAD, title="spec")
+        doc.file.save("spec.txt", ContentFile(b"zawartosc"), save=True)
+        expected = hashlib.sha256(b"zawartosc").hexdigest()
+
+        with mock.patch("ai_agents.services.compute_file_sha256", wraps=lambda f: expected) as compute:
+            self.assertEqual(document_file_sha256(doc), expected)
+            self.assertEqual(document_file_sha256(doc), expected)
+            self.assertEqual(document_file_sha256(Document.objects.get(pk=doc.pk)), expected)
+        self.assertEqual(compute.call_count, 1)
+
+    def test_stored_hash_skips_reading_the_file(self):
+        doc = Document.objects.create(source=Document.SOURCE_USER_UPLOAD, title="spec", file_sha256="a" * 64)
+        doc.file.save("spec.txt", ContentFile(b"zawartosc"), save=True)
+
+        with mock.patch("ai_agents.services.compute_file_sha256") as compute:
+            self.assertEqual(document_file_sha256(doc), "a" * 64)
+        compute.assert_not_called()
+
+
+class EmbeddingFailureTests(TestCase):
+    """Błąd embeddingów nie może skończyć się podmianą indeksu na niepełny."""
+
+    def test_api_error_propagates(self):
+        client = mock.Mock()
+        client.embeddings.create.side_effect = RuntimeError("rate limited")
+        with mock.patch("ai_agents.services.get_openai_client", return_value=client):
+            with self.assertRaises(RuntimeError):
+                get_embeddings(["a", "b"])
+
+    def test_missing_vector_keeps_existing_chunks(self):
+        doc = Document.objects.create(source=Document.SOURCE_USER_UPLOAD, title="spec")
+        old = DocumentChunk.objects.create(document=doc, chunk_index=0, text_content="stary", embedding=[0.1] * 1536)
+        chunk = {"text": "nowy", "page_number": None, "char_start": 0, "char_end": 4, "heading_path": []}
+
+        with self.assertRaises(ValueError):
+            store_document_chunks(doc.id, [chunk, chunk], [[0.2] * 1536, []])
+        self.assertEqual(list(DocumentChunk.objects.filter(document=doc)), [old])
+
+
+@override_settings(MOCK_API_BASE="http://mock.invalid")
+class MockCorpusIndexingTests(TestCase):
+    """Masowe indeksowanie korpusu idzie przez single-flight pipeline'u Celery."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=tmp.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.with_file = Document.objects.create(source=Document.SOURCE_MOCK_DOCS, title="spec", mock_filename="spec.txt")
+        self.with_file.file.save("spec.txt", ContentFile(b"tresc"), save=True)
+        self.without_file = Document.objects.create(source=Document.SOURCE_MOCK_DOCS, title="new", mock_filename="new.txt")
+
+    def test_sync_indexing_skips_documents_indexed_by_celery(self):
+        key = job_dedup_key("index", self.with_file.id)
+        claim_single_flight(key, "celery-task-id")
+        self.addCleanup(cache.delete, key)
+
+        with mock.patch("ai_agents.services.select_mock_corpus_documents", return_value=([{}], [], [self.with_file])), \
+                mock.patch("ai_agents.services.index_document") as index:
+            stats = index_mock_corpus(concurrency=1)
+
+        index.assert_not_called()
+        self.assertEqual((stats["indexed"], stats["skipped"]), (0, 1))
+        self.assertEqual(finish_single_flight(key, "celery-task-id"), [])
+        self.assertTrue(claim_single_flight(key, "next-task")[1])
+
+    def test_task_dispatches_pipeline_per_document(self):
+        docs = [self.with_file, self.without_file]
+        with mock.patch("ai_agents.tasks.select_mock_corpus_documents", return_value=([{}, {}], [], docs)), \
+                mock.patch("ai_agents.tasks.start_single_flight", return_value=("t", False)) as start, \
+                mock.patch("documents.tasks.fetch_and_store_file_task.delay") as fetch:
+            stats = index_mock_corpus_task()
+
+        start.assert_called_once_with(
+            process_document_indexing_task, job_dedup_key("index", self.with_file.id), args=(self.with_file.id,)
+        )
+        fetch.assert_called_once_with(self.without_file.id)
+        self.assertEqual((stats["scheduled"], stats["fetching"]), (1, 1))
+
+
+class ChunkerVersionTests(TestCase):
+    """Chunki z innej wersji chunkera (inny rozmiar / overlap) traktujemy jak niezindeksowane."""
+
+    def test_stored_chunks_carry_current_version(self):
+        doc = Document.objects.create(source=Document.SOURCE_USER_UPLOAD, title="spec")
+        chunk = {"text": "nowy", "page_number": None, "char_start": 0, "char_end": 4, "heading_path": []}
+        store_document_chunks(doc.id, [chunk], [[0.1] * 1536])
+        self.assertEqual(DocumentChunk.objects.get(document=doc).chunker_version, current_chunker_version())
+
+    @override_settings(MOCK_API_BASE="http://mock.invalid")
+    def test_stale_chunks_are_selected_for_reindex(self):
+        stale = Document.objects.create(source=Document.SOURCE_MOCK_DOCS, title="old", mock_filename="old.txt")
+        fresh = Document.objects.create(source=Document.SOURCE_MOCK_DOCS, title="new", mock_filename="new.txt")
+        DocumentChunk.objects.create(document=stale, chunk_index=0, text_content="x", embedding=[0.1] * 1536)
+        DocumentChunk.objects.create(
+            document=fresh, chunk_index=0, text_content="x", embedding=[0.1] * 1536,
+            chunker_version=current_chunker_version(),
+        )
+
+        with mock.patch("ai_agents.services.discover_mock_documents", return_value=[]), \
+                mock.patch("ai_agents.services.create_mock_documents", return_value=([], [stale, fresh])):
+            _, _, docs = select_mock_corpus_documents(MockErpMesClient())
+        self.assertEqual(docs, [stale])
+
+
+class StructuredChunkingTests(TestCase):
+    """Offsety chunków wskazują dokładnie ich tekst, a ścieżka nagłówków odpowiada sekcji."""
+
+    ROW = "| zawór V1 | 2.5 bar | OK |\n"
+    PAGES = [
+        "# Instrukcja testu\n"
+        + "Wstęp do procedury. " * 12 + "\n"
+        + "4 TEST PROCEDURE\n"
+        + "Przygotuj stanowisko i sprawdź zasilanie. " * 6 + "\n"
+        + "4.2 Leakage test\n" + ROW * 25,
+        "ELECTRICAL SAFETY TEST\n" + ROW * 25 + "Koniec protokołu.\n",
+    ]
+
+    def _full_text(self, pages, paginated):
+        # ten sam układ offsetów co extract_text_from_document / create_structured_chunks
+        return "".join(p + ("\n" if paginated else "") for p in pages)
+
+    def test_offsets_point_at_chunk_text(self):
+        for overlap in (0, 10):
+            with self.subTest(overlap=overlap):
+                chunks = create_structured_chunks(self.PAGES, chunk_size=40, chunk_overlap=overlap)
+                full = self._full_text(self.PAGES, True)
+
+                self.assertGreater(len(chunks), 6)
+                for chunk in chunks:
+                    self.assertEqual(full[chunk["char_start"]:chunk["char_end"]], chunk["text"])
+                starts = [c["char_start"] for c in chunks]
+                self.assertEqual(starts, sorted(set(starts)))
+
+    def test_repeated_rows_keep_valid_offsets(self):
+        # identyczne wiersze tabeli – start_index LangChain (overlap w tokenach) przeskakuje tu na późniejsze
+        # wystąpienia i w końcu zwraca -1; offsety mają dalej wskazywać tekst fragmentu i rosnąć
+        pages = [self.ROW * 80]
+        chunks = create_structured_chunks(pages, paginated=False, chunk_size=30, chunk_overlap=10)
+
+        self.assertGreater(len(chunks), 3)
+        for chunk in chunks:
+            self.assertGreaterEqual(chunk["char_start"], 0)
+            self.assertEqual(pages[0][chunk["char_start"]:chunk["char_end"]], chunk["text"])
+        for prev, chunk in zip(chunks, chunks[1:]):
+            self.assertGreater(chunk["char_start"], prev["char_start"])
+        self.assertIsNone(chunks[0]["page_number"])
+
+    def test_heading_path_and_page_number(self):
+        chunks = create_structured_chunks(self.PAGES, chunk_size=40, chunk_overlap=0)
+
+        leakage = next(c for c in chunks if c["text"].startswith("| zawór") and c["page_number"] == 1)
+        self.assertEqual(leakage["heading_path"], ["4 TEST PROCEDURE", "4.2 Leakage test"])
+        procedure = next(c for c in chunks if "Przygotuj stanowisko" in c["text"])
+        self.assertEqual(procedure["heading_path"][-1], "4 TEST PROCEDURE")
+        last = chunks[-1]
+        self.assertEqual(last["page_number"], 2)
+        self.assertEqual(last["heading_path"], ["ELECTRICAL SAFETY TEST"])
+        self.assertEqual(chunks[0]["heading_path"], ["Instrukcja testu"])
+
+    def test_detect_heading(self):
+        cases = {
+            "## Kalibracja czujnika": (2, "Kalibracja czujnika"),
+            "3.2.1 Calibration procedure": (3, "3.2.1 Calibration procedure"),
+            "ELECTRICAL SAFETY TEST": (1, "ELECTRICAL SAFETY TEST"),
+            "UWAGA": None,                                  # jedno słowo wersalikami to nie sekcja
+            "Zwykłe zdanie zakończone kropką.": None,
+            "3.2 wartość mierzona w barach": None,          # po numerze musi być wielka litera
+            "": None,
+        }
+        for line, expected in cases.items():
+            with self.subTest(line=line):
+                self.assertEqual(_detect_heading(line), expected)
+
+
+class TokenizerFallbackTests(TestCase):
+    """Brak plików BPE tiktoken (offline) – ostrzeżenie w logach i szacunkowe liczenie tokenów."""
+
+    def setUp(self):
+        _get_encoding.cache_clear()
+        self.addCleanup(_get_encoding.cache_clear)
+
+    def test_missing_encoding_is_logged_once_and_estimated(self):
+        with mock.patch("tiktoken.encoding_for_model", side_effect=OSError("offline")) as load, \
+                self.assertLogs("ai_agents.services", level="WARNING") as logs:
+            self.assertEqual(count_tokens("abcdefgh", model="gpt-test"), 2)
+            self.assertEqual(count_tokens("abcd", model="gpt-test"), 1)
+
+        self.assertEqual(load.call_count, 1)
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("offline", logs.output[0])
+
+
+class BuildRagContextTests(TestCase):
+    """Sklejanie trafień w spany, sąsiedzi (radius) i twardy budżet tokenów kontekstu."""
+
+    TEXT = " ".join(f"slowo{i:03d}" for i in range(120))   # 959 znaków, każde słowo unikalne
+    SEP = "\n\n---\n\n"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doc = Document.objects.create(source=Document.SOURCE_USER_UPLOAD, title="spec")
+        # 0-2 nachodzą na siebie (overlap 40 znaków), 3 leży dalej w tekście
+        bounds = [(0, 200), (160, 360), (320, 520), (700, 900)]
+        cls.chunks = [
+            DocumentChunk.objects.create(
+                document=cls.doc, chunk_index=i, text_content=cls.TEXT[start:end],
+                char_start=start, char_end=end, embedding=[0.1] * 1536,
+            )
+            for i, (start, end) in enumerate(bounds)
+        ]
+
+    def test_overlapping_hits_are_merged_without_duplicated_text(self):
+        c0, c1, *_ = self.chunks
+        context, meta = build_rag_context(self.doc, [c1, c0], max_tokens=10_000, neighbour_radius=0)
+
+        self.assertEqual(context, self.TEXT[0:360])
+        self.assertEqual(meta["spans"], 1)
+        self.assertEqual(meta["chunk_indexes"], [[0, 1]])
+
+    def test_duplicate_hits_are_used_once(self):
+        c1 = self.chunks[1]
+        context, meta = build_rag_context(self.doc, [c1, c1], max_tokens=10_000, neighbour_radius=0)
+
+        self.assertEqual(context, c1.text_content)
+        self.assertEqual(meta["chunks_used"], 1)
+
+    def test_neighbour_radius_adds_adjacent_chunks(self):
+        c1 = self.chunks[1]
+        context, meta = build_rag_context(self.doc, [c1], max_tokens=10_000, neighbour_radius=1)
+
+        self.assertEqual(context, self.TEXT[0:520])
+        self.assertEqual(meta["chunk_indexes"], [[0, 1, 2]])
+        self.assertEqual(meta["neighbour_radius"], 1)
+
+        context, meta = build_rag_context(self.doc, [c1], max_tokens=10_000, neighbour_radius=0)
+        self.assertEqual(context, c1.text_content)
+
+    def test_disjoint_spans_follow_document_order(self):
+        c0, _, _, c3 = self.chunks
+        context, meta = build_rag_context(self.doc, [c3, c0], max_tokens=10_000, neighbour_radius=0)
+
+        self.assertEqual(context, c0.text_content + self.SEP + c3.text_content)
+        self.assertEqual(meta["chunk_indexes"], [[0], [3]])
+
+    def test_budget_overflow_truncates_lower_ranked_span(self):
+        c0, c1, c2, c3 = self.chunks
+        budget = count_tokens(c3.text_content) + count_tokens(self.SEP) + 60
+        context, meta = build_rag_context(self.doc, [c3, c0, c1, c2], max_tokens=budget, neighbour_radius=0)
+
+        # najlepsze trafienie (c3) w całości, span 0-2 przycięty do reszty budżetu
+        self.assertTrue(context.endswith(self.SEP + c3.text_content))
+        self.assertTrue(context.startswith(self.TEXT[:100]))
+        self.assertNotIn(self.TEXT[0:520], context)
+        self.assertEqual(meta["chunk_indexes"], [[0, 1, 2], [3]])
+        self.assertLessEqual(meta["context_tokens"], budget)
+        self.assertLessEqual(count_tokens(context), budget)
+
+    def test_budget_overflow_skips_span_without_room(self):
+        c0, _, _, c3 = self.chunks
+        budget = count_tokens(c3.text_content) + 10
+        context, meta = build_rag_context(self.doc, [c3, c0], max_tokens=budget, neighbour_radius=0)
+
+        self.assertEqual(context, c3.text_content)
+        self.assertEqual(meta["chunk_indexes"], [[3]])
+
+    def test_single_span_over_budget_is_cut_to_limit(self):
+        context, meta = build_rag_context(self.doc, self.chunks[:3], max_tokens=60, neighbour_radius=0)
+
+        self.assertTrue(self.TEXT.startswith(context))
+        self.assertLessEqual(meta["context_tokens"], 60)
+        self.assertGreater(meta["context_tokens"], 50)
+
+
+class SingleFlightTests(TestCase):
+    """Właściciel i oczekujący zadania zmieniają się atomowo – nikt nie ginie i nikt nie jest liczony dwa razy."""
+
+    key = "job:test:1:abc"
+
+    def setUp(self):
+        self.task = mock.Mock()
+        self.addCleanup(cache.delete, self.key)
+
+    def test_duplicate_request_is_registered_as_waiter(self):
+        task_id, deduplicated = start_single_flight(self.task, self.key, waiter_id=1)
+        self.assertFalse(deduplicated)
+        self.assertEqual(start_single_flight(self.task, self.key, waiter_id=2), (task_id, True))
+        self.assertEqual(finish_single_flight(self.key, task_id), [2])
+
+    def test_request_after_finish_starts_new_task_without_stale_waiters(self):
+        first, _ = start_single_flight(self.task, self.key, waiter_id=1)
+        start_single_flight(self.task, self.key, waiter_id=2)
+        self.assertEqual(finish_single_flight(self.key, first), [2])
+
+        second, deduplicated = start_single_flight(self.task, self.key, waiter_id=3)
+        self.assertFalse(deduplicated)
+        self.assertNotEqual(second, first)
+        # spóźnione zakończenie starego zadania nie zwalnia nowego
+        self.assertEqual(finish_single_flight(self.key, first), [])
+        self.assertEqual(finish_single_flight(self.key, second), [])
+
+    def test_concurrent_requests_have_one_owner_and_all_others_wait(self):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda uid: (uid, start_single_flight(self.task, self.key, waiter_id=uid)), range(1, 33)))
+
+        owners = [uid for uid, (_, deduplicated) in results if not deduplicated]
+        self.assertEqual(len(owners), 1)
+        self.assertEqual(len({task_id for _, (task_id, _) in results}), 1)
+        self.assertEqual(self.task.apply_async.call_count, 1)
+        waiters = finish_single_flight(self.key, results[0][1][0])
+        self.assertCountEqual(waiters, [uid for uid in range(1, 33) if uid not in owners])
+
+    def test_failed_dispatch_releases_the_key(self):
+        self.task.apply_async.side_effect = RuntimeError("broker down")
+        with self.assertRaises(RuntimeError):
+            start_single_flight(self.task, self.key, waiter_id=1)
+        self.task.apply_async.side_effect = None
+        self.assertFalse(start_single_flight(self.task, self.key, waiter_id=2)[1])
+
+
+class IndexingPipelineMessageTests(TestCase):
+    """Chunki nie jadą w wiadomości brokera – etap zapisu bierze je z cache (albo tnie ponownie)."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=tmp.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        patcher = mock.patch("ai_agents.tasks.get_channel_layer", return_value=RecordingChannelLayer())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.doc = Document.objects.create(source=Document.SOURCE_USER_UPLOAD, title="spec")
+        text = "\n\n".join(f"Sekcja {i}. " + "Tekst testowy dokumentu. " * 60 for i in range(6))
+        self.doc.file.save("spec.txt", ContentFile(text.encode("utf-8")), save=True)
+
+    def start_pipeline(self):
+        with mock.patch("ai_agents.tasks.chord") as chord:
+            process_document_indexing_task.apply(args=(self.doc.id,), task_id="idx-1")
+        header = chord.call_args.args[0]
+        body = chord.return_value.call_args.args[0]
+        return header, body
+
+    def test_body_carries_no_chunks_and_store_reads_them_from_cache(self):
+        header, body = self.start_pipeline()
+        self.assertEqual(tuple(body.args), (self.doc.id, "idx-1"))
+        texts = [t for sig in header.tasks for t in sig.args[0]]
+        self.assertGreater(len(texts), 1)
+
+        store_document_chunks_task([[[0.1] * 1536] * len(texts)], self.doc.id, "idx-1")
+        self.assertEqual(
+            list(DocumentChunk.objects.filter(document=self.doc).values_list("text_content", flat=True)), texts
+        )
+        self.assertIsNone(cache.get("index-chunks:idx-1"))
+
+    def test_store_rechunks_when_cache_entry_is_gone(self):
+        header, _ = self.start_pipeline()
+        count = sum(len(sig.args[0]) for sig in header.tasks)
+        cache.delete("index-chunks:idx-1")
+
+        store_document_chunks_task([[[0.1] * 1536] * count], self.doc.id, "idx-1")
+        self.assertEqual(DocumentChunk.objects.filter(document=self.doc).count(), count)
+
+
+class ScheduleIndexingTests(TestCase):
+    """Id dokumentów do indeksowania są wysyłane po COMMIT swojej transakcji, a po ROLLBACK – wcale."""
+
+    def test_commit_sends_one_batch_per_transaction(self):
+        with mock.patch("ai_agents.tasks.index_documents_batch_task.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    schedule_document_indexing([1, 2])
+                    schedule_document_indexing([2, 3])
+        delay.assert_called_once_with([1, 2, 3])
+
+    def test_rolled_back_ids_do_not_leak_into_next_commit(self):
+        with mock.patch("ai_agents.tasks.index_documents_batch_task.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(RuntimeError):
+                    with transaction.atomic():
+                        schedule_document_indexing([1])
+                        raise RuntimeError("rollback")
+                with transaction.atomic():
+                    schedule_document_indexing([2])
+        delay.assert_called_once_with([2])
+
+    def test_rolled_back_savepoint_keeps_outer_ids(self):
+        with mock.patch("ai_agents.tasks.index_documents_batch_task.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    schedule_document_indexing([1])
+                    with self.assertRaises(RuntimeError):
+                        with transaction.atomic():
+                            schedule_document_indexing([2])
+                            raise RuntimeError("rollback savepoint")
+        delay.assert_called_once_with([1])
@@ -5,14 +5,17 @@ from rest_framework.permissions import AllowAny  # <--- IMPORT 1
 from django.shortcuts import get_object_or_404
 from django.conf import settings                    # do agenta wiedzy
 from pgvector.django import L2Distance              # do agenta wiedzy (do szukania wektorów)
-from openai import OpenAI                           # do agenta wiedzy
 from documents.models import Document
 from .tasks import generate_summary_task, generate_erp_mes_latest_report_task, process_document_indexing_task
 from rest_framework.permissions import IsAuthenticated
-from .services import count_user_summaries_for_document, get_embedding # get_embediing do agenta wiedzy
+from .services import count_user_summaries_for_document, get_embedding, get_openai_client, format_chunk_citation, build_rag_context, llm_usage_meta, prompt_token_budget, job_dedup_key, start_single_flight, get_cached_summary, save_summary_artifact, current_chunker_version # get_embediing do agenta wiedzy
 from rest_framework import generics, permissions
 from .models import AiArtifact, DocumentChunk # DocumentChunk to do agenta wiedzy - do kontekstu
 from .serializers import AiArtifactSerializer
+from proscientia.pagination import OptionalCursorPagination
+from proscientia.metrics import VECTOR_SEARCH_SECONDS, llm_call
+from users.models import QuotaCounter
+from users.services import try_consume_quota
 
 
 class AiArtifactListView(generics.ListAPIView):
@@ -25,14 +28,23 @@ class AiArtifactListView(generics.ListAPIView):
     """
     serializer_class = AiArtifactSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OptionalCursorPagination
 
     def get_queryset(self):
         user = self.request.user
-        qs = AiArtifact.objects.filter(owner=user)
+        # select_related("document"): jedno zapytanie zamiast 1 + N (document.title w serializerze)
+        qs = (
+            AiArtifact.objects.filter(owner=user)
+            .select_related("document")
+            .only(
+                "id", "artifact_type", "title", "file", "metadata", "created_at",
+                "owner_id", "document__id", "document__title",
+            )
+        )
         type_param = self.request.query_params.get("type")
         if type_param:
             qs = qs.filter(artifact_type=type_param)
-        return qs
+        return qs.order_by("-created_at", "-id")
 
 
 class AiArtifactDetailView(generics.RetrieveDestroyAPIView):
@@ -49,6 +61,7 @@ class AiArtifactDetailView(generics.RetrieveDestroyAPIView):
     def get_queryset(self):
         return AiArtifact.objects.filter(owner=self.request.user)
 
+
 class TriggerIndexingView(APIView):
     """
     POST /api/agents/index/<doc_id>/
@@ -64,12 +77,16 @@ class TriggerIndexingView(APIView):
         except Document.DoesNotExist:
              return Response({"detail": "Not found"}, status=404)
         
-        task = process_document_indexing_task.delay(doc.id)
+        # single-flight: ponowne kliknięcie podpina się pod indeksowanie w toku
+        task_id, deduplicated = start_single_flight(
+            process_document_indexing_task, job_dedup_key("index", doc.id), args=(doc.id,)
+        )
         
         return Response({
             "message": "Rozpoczęto indeksowanie RAG.",
-            "task_id": task.id,
-            "doc_id": doc.id
+            "task_id": task_id,
+            "doc_id": doc.id,
+            "deduplicated": deduplicated,
         }, status=status.HTTP_202_ACCEPTED)
 
 class TriggerSummaryView(APIView):
@@ -91,23 +108,48 @@ class TriggerSummaryView(APIView):
                     status=status.HTTP_403_FORBIDDEN,
                 )
 
-        # 3) Limit 3 streszczeń na dokument per user
-        if count_user_summaries_for_document(user, doc) >= 3:
+        # 3) Limit streszczeń na dokument per user (per rola) – atomowy licznik;
+        #    task zwalnia jednostkę, jeśli streszczenie nie powstanie
+        allowed, limit = try_consume_quota(
+            user,
+            QuotaCounter.KIND_SUMMARY,
+            object_id=doc.id,                                               # type: ignore[attr-defined]
+            seed=lambda: count_user_summaries_for_document(user, doc),
+        )
+        if not allowed:
             return Response(
-                {"detail": "Limit 3 streszczeń dla tego pliku został przekroczony."},
+                {"detail": f"Limit {limit} streszczeń dla tego pliku został przekroczony."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
         # 4) Opcjonalny 'scope' (na przyszłego DocSearch)
         scope = request.data.get("scope")
 
-        # 5) Uruchomienie Celery Task z user_id i scope
-        task = generate_summary_task.delay(doc.id, user.id, scope)          # type: ignore
+        # 4a) Ten sam plik/scope/prompt/model był już streszczany – artefakt od razu, bez LLM
+        cached = get_cached_summary(doc, scope)
+        if cached is not None:
+            summary_text, summary_meta = cached
+            artifact = save_summary_artifact(doc, user, summary_text, summary_meta, scope)
+            return Response({
+                "message": "Streszczenie pobrane z cache.",
+                "task_id": None,
+                "document_id": doc.id,                                      # type: ignore
+                "cached": True,
+                "artifact": AiArtifactSerializer(artifact, context={"request": request}).data,
+            }, status=status.HTTP_201_CREATED)
+
+        # 5) Uruchomienie Celery Task z user_id i scope – single-flight po (doc, scope):
+        #    duplikat podpina się pod zadanie w toku (atomowo z jego wyszukaniem) i dostaje ten sam task_id
+        dedup_key = job_dedup_key("summary", doc.id, {"scope": scope})      # type: ignore
+        task_id, deduplicated = start_single_flight(
+            generate_summary_task, dedup_key, args=(doc.id, user.id, scope), waiter_id=user.id  # type: ignore
+        )
 
         return Response({
             "message": "Zadanie przyjęte do realizacji.",
-            "task_id": task.id,
+            "task_id": task_id,
             "document_id": doc.id,                                          # type: ignore
+            "deduplicated": deduplicated,
             "websocket_url": "/ws/notifications/",
         }, status=status.HTTP_202_ACCEPTED)
 
@@ -144,8 +186,9 @@ class AskDocumentView(APIView):
     
     Agent Wiedzy (QA):
     1. Zamienia pytanie usera na wektor.
-    2. Szuka 5 najbliższych fragmentów w tabeli DocumentChunk.
-    3. Generuje odpowiedź przy użyciu GPT-4o-mini.
+    2. Szuka RAG_TOP_K (domyślnie 5) najbliższych fragmentów w tabeli DocumentChunk.
+    3. Buduje kontekst: sąsiedzi + sklejanie overlapu + budżet tokenów (build_rag_context).
+    4. Generuje odpowiedź przy użyciu GPT-4o-mini.
     """
     permission_classes = [IsAuthenticated] # Wymaga tokena (jak reszta systemu)
 
@@ -167,11 +210,12 @@ class AskDocumentView(APIView):
             )
 
         # 4. Wyszukiwanie Semantyczne (RAG)
-        # Dla długich dokumentów pobieramy 5 najlepszych fragmentów.
+        # Dla długich dokumentów pobieramy RAG_TOP_K najlepszych fragmentów.
         # Używamy L2Distance (odległość euklidesowa) - im mniejsza, tym lepsze dopasowanie.
-        chunks = DocumentChunk.objects.filter(document=doc).annotate(
-            distance=L2Distance('embedding', query_vector)
-        ).order_by('distance')[:5]
+        with VECTOR_SEARCH_SECONDS.time():
+            chunks = list(DocumentChunk.objects.filter(document=doc).annotate(
+                distance=L2Distance('embedding', query_vector)
+            ).order_by('distance')[:settings.RAG_TOP_K])
 
         if not chunks:
             return Response(
@@ -182,37 +226,56 @@ class AskDocumentView(APIView):
                 status=400
             )
 
-        # 5. Budowanie Kontekstu (Sklejamy fragmenty w jeden tekst)
-        context_text = "\n\n---\n\n".join([chunk.text_content for chunk in chunks])
+        if chunks[0].chunker_version != current_chunker_version():
+            # indeks sprzed zmiany chunkera – odpowiadamy ze starych chunków, a w tle indeksujemy ponownie
+            start_single_flight(process_document_indexing_task, job_dedup_key("index", doc.id), args=(doc.id,))
 
-        # 6. Prompt Engineering (Instrukcja dla modelu)
+        model = "gpt-4o-mini"  # Szybki i tani model, idealny do RAG
+
+        # 5. Prompt Engineering (Instrukcja dla modelu)
         system_prompt = (
             "Jesteś precyzyjnym asystentem inżyniera produkcji. "
             "Odpowiadaj na pytania WYŁĄCZNIE na podstawie dostarczonego poniżej KONTEKSTU. "
             "Jeśli w kontekście nie ma odpowiedzi, napisz: 'Niestety, dokument nie zawiera informacji na ten temat.' "
             "Nie wymyślaj faktów. Odpowiedź powinna być zwięzła i w języku polskim."
         )
-        
-        user_message = f"Pytanie: {question}\n\nKONTEKST:\n{context_text}"
+        question_part = f"Pytanie: {question}\n\nKONTEKST:\n"
+
+        # 6. Budowanie Kontekstu – sklejamy nachodzące fragmenty (overlap chunkera),
+        #    dokładamy sąsiadów i pakujemy do budżetu tokenów (RAG_CONTEXT_MAX_TOKENS,
+        #    ale nie więcej niż zostaje w oknie modelu po prompcie systemowym i pytaniu)
+        max_tokens = prompt_token_budget(settings.RAG_CONTEXT_MAX_TOKENS, model, [system_prompt, question_part])
+        context_text, context_meta = build_rag_context(doc, chunks, max_tokens=max_tokens, model=model)
+
+        user_message = question_part + context_text
 
         # 7. Zapytanie do GPT
         try:
-            client = OpenAI(api_key=settings.OPENAI_API_KEY)
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",  # Szybki i tani model, idealny do RAG
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_message}
-                ],
-                temperature=0.0  # Zero kreatywności = maksymalna wierność dokumentowi
-            )
+            client = get_openai_client()
+            with llm_call("chat", model) as call:
+                response = client.chat.completions.create(
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_message}
+                    ],
+                    temperature=0.0  # Zero kreatywności = maksymalna wierność dokumentowi
+                )
+                call.usage = response.usage
             
             answer = response.choices[0].message.content
 
+            # Źródła tylko z trafień, które faktycznie weszły do kontekstu (pakowanie mogło część odrzucić)
+            packed = {i for indexes in context_meta["chunk_indexes"] for i in indexes}
+            used = [c for c in chunks if c.chunk_index in packed]
+
             # Zwracamy odpowiedź oraz źródła (dla weryfikacji przez człowieka)
             return Response({
                 "answer": answer,
-                "sources": [c.text_content[:200] + "..." for c in chunks] # Podgląd pierwszych 200 znaków każdego fragmentu
+                "sources": [c.text_content[:200] + "..." for c in used], # Podgląd pierwszych 200 znaków każdego fragmentu
+                "citations": [format_chunk_citation(c) for c in used],  # strona / sekcja / offsety fragmentu
+                "context": context_meta,
+                "usage": llm_usage_meta(model, response.usage),
             })
 
         except Exception as e:
@@ -0,0 +1,158 @@
+"""
+Benchmark rozdziału kolejek Celery przy mieszanym obciążeniu (symulacja pul workerów):
+  - "shared"  – jedna pula wątków, jak dotychczasowy worker (`ROLE=worker`: wszystkie kolejki,
+                `--pool=threads`, concurrency domyślna Celery = liczba rdzeni),
+  - "split"   – prefork dla CPU (cpu) + pula wątków dla zadań czekających na sieć (llm, io/sync).
+
+Zadania są syntetyczne, ale odwzorowują profile z CELERY_TASK_ROUTES:
+  cpu  – ekstrakcja/chunking (czysty CPU),
+  llm  – wywołanie OpenAI (czekanie na sieć, sleep),
+  sync – szybki sync ERP/MES z Beat (krótkie I/O).
+Mierzymy czas całości (throughput) i opóźnienie zadań sync (czy czekają za ciężkimi zadaniami).
+
+Czego symulacja NIE obejmuje (wyniki to górne przybliżenie różnicy między układami, nie pomiar Celery):
+  - brokera (Redis): serializacji, round-tripów, prefetchu (--prefetch-multiplier) i rezerwacji zadań
+    przez zajęty worker – zadanie trafia do wolnego wątku/procesu natychmiast,
+  - narzutu Celery na zadanie (sygnały, result backend, acks, chord/group i ich synchronizacji),
+  - limitów czasu, restartów procesów (max_tasks_per_child) i startu workerów (pule są rozgrzane),
+  - realnych bibliotek: parsowanie PDF/tokenizacja bywa częściowo poza GIL-em, a klient OpenAI
+    i połączenia DB mają własne pule i limity,
+  - zmienności sieci – czas zadań llm/sync to stały sleep.
+
+Uruchomienie (z katalogu backend/, nie wymaga Redisa ani Django):
+    python -m benchmarks.bench_celery_queues
+    python -m benchmarks.bench_celery_queues --cpu-tasks 16 --llm-tasks 64 --sync-tasks 16 --json bench_queues.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
+
+
+def cpu_task(units: int) -> int:
+    # ~ parsowanie PDF / chunking – czysta praca interpretera
+    acc = 0
+    for i in range(units):
+        acc = (acc * 31 + i) % 1_000_003
+    return acc
+
+
+def io_task(seconds: float) -> float:
+    # ~ oczekiwanie na OpenAI / mock ERP-MES
+    time.sleep(seconds)
+    return seconds
+
+
+def build_workload(cpu_tasks: int, llm_tasks: int, sync_tasks: int, cpu_units: int,
+                   llm_seconds: float, sync_seconds: float, seed: int) -> list[tuple[str, object, object]]:
+    jobs = (
+        [("cpu", cpu_task, cpu_units)] * cpu_tasks
+        + [("llm", io_task, llm_seconds)] * llm_tasks
+        + [("sync", io_task, sync_seconds)] * sync_tasks
+    )
+    random.Random(seed).shuffle(jobs)
+    return jobs
+
+
+def _timed(fn, arg, enqueued_at: float) -> tuple[float, float]:
+    started = time.perf_counter()
+    fn(arg)
+    return started - enqueued_at, time.perf_counter() - enqueued_at
+
+
+def run_scenario(jobs, pools: dict[str, Executor]) -> dict:
+    start = time.perf_counter()
+    futures = []
+    for queue, fn, arg in jobs:
+        pool = pools.get(queue) or pools["*"]
+        futures.append((queue, pool.submit(_timed, fn, arg, time.perf_counter())))
+    wait([f for _, f in futures])
+    total = time.perf_counter() - start
+
+    per_queue: dict[str, list[tuple[float, float]]] = {}
+    for queue, f in futures:
+        per_queue.setdefault(queue, []).append(f.result())
+
+    def p95(values: list[float]) -> float:
+        values = sorted(values)
+        return values[min(len(values) - 1, int(round(0.95 * (len(values) - 1))))]
+
+    return {
+        "total_seconds": round(total, 3),
+        "tasks_per_second": round(len(jobs) / total, 2),
+        "queues": {
+            q: {
+                "tasks": len(v),
+                "wait_p50_ms": round(statistics.median(w for w, _ in v) * 1e3, 1),
+                "wait_p95_ms": round(p95([w for w, _ in v]) * 1e3, 1),
+                "latency_p95_ms": round(p95([d for _, d in v]) * 1e3, 1),
+            }
+            for q, v in sorted(per_queue.items())
+        },
+    }
+
+
+def run(args) -> dict:
+    jobs = build_workload(
+        args.cpu_tasks, args.llm_tasks, args.sync_tasks,
+        args.cpu_units, args.llm_seconds, args.sync_seconds, args.seed,
+    )
+    results = {}
+
+    with ThreadPoolExecutor(args.shared_threads) as shared:
+        # rozgrzewka – start wątków nie wlicza się do pomiaru
+        wait([shared.submit(cpu_task, 1) for _ in range(args.shared_threads)])
+        results["shared"] = run_scenario(jobs, {"*": shared})
+
+    with ProcessPoolExecutor(args.processes) as cpu, \
+            ThreadPoolExecutor(args.llm_threads) as llm, \
+            ThreadPoolExecutor(args.io_threads) as io:
+        # rozgrzewka – start procesów nie wlicza się do pomiaru
+        wait([cpu.submit(cpu_task, 1) for _ in range(args.processes)])
+        results["split"] = run_scenario(jobs, {"cpu": cpu, "llm": llm, "sync": io, "*": cpu})
+
+    results["speedup_total"] = round(results["shared"]["total_seconds"] / results["split"]["total_seconds"], 2)
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shared-threads", type=int, default=os.cpu_count() or 2,
+                        help="concurrency wspólnego workera --pool=threads (domyślnie jak Celery: liczba rdzeni)")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 2, help="prefork concurrency (worker-cpu)")
+    parser.add_argument("--llm-threads", type=int, default=16)
+    parser.add_argument("--io-threads", type=int, default=8)
+    parser.add_argument("--cpu-tasks", type=int, default=8)
+    parser.add_argument("--llm-tasks", type=int, default=32)
+    parser.add_argument("--sync-tasks", type=int, default=8)
+    parser.add_argument("--cpu-units", type=int, default=3_000_000, help="praca jednego zadania CPU")
+    parser.add_argument("--llm-seconds", type=float, default=0.5)
+    parser.add_argument("--sync-seconds", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="zapisz wyniki do pliku JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+
+    print(f"{'scenario':8} {'total s':>8} {'tasks/s':>8}  {'queue':5} {'wait p50':>9} {'wait p95':>9} {'lat p95':>9}")
+    for name in ("shared", "split"):
+        r = results[name]
+        for i, (queue, q) in enumerate(r["queues"].items()):
+            head = f"{name:8} {r['total_seconds']:>8} {r['tasks_per_second']:>8}" if i == 0 else " " * 26
+            print(f"{head}  {queue:5} {q['wait_p50_ms']:>9} {q['wait_p95_ms']:>9} {q['latency_p95_ms']:>9}")
+    print(f"speedup (total): {results['speedup_total']}x")
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+Benchmark serializacji / parsowania JSON na prawdziwych plikach snapshotów ERP/MES:
+  - stdlib json.dumps / json.loads,
+  - DRF JSONRenderer (dotychczasowy renderer API),
+  - ORJSONRenderer / fast_loads (proscientia.renderers).
+
+Uruchomienie (z katalogu backend/):
+    python -m benchmarks.bench_json_render
+    python -m benchmarks.bench_json_render --scale 500 --repeat 10 --json bench_json.json
+
+--scale powiela rekordy, żeby zasymulować duże snapshoty (mock ma tylko ~200 KB danych).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "proscientia.settings")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+import django  # noqa: E402
+
+django.setup()
+
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from proscientia.renderers import ORJSONRenderer, fast_loads  # noqa: E402
+
+DEFAULT_DATA_ROOT = Path(__file__).resolve().parents[2] / "mock" / "data"
+
+
+def load_payloads(data_root: Path, scale: int) -> dict[str, list]:
+    """{ "erp"/"mes": wszystkie rekordy wszystkich snapshotów, powielone scale razy }."""
+    payloads: dict[str, list] = {}
+    for stream in ("erp", "mes"):
+        records: list = []
+        for path in sorted((data_root / stream).glob("*/*.json")):
+            data = json.loads(path.read_text(encoding="utf-8"))
+            records.extend(data if isinstance(data, list) else [data])
+        payloads[stream] = records * scale
+    return payloads
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(data_root: Path, scale: int, repeat: int) -> list[dict]:
+    drf = JSONRenderer()
+    fast = ORJSONRenderer()
+    results = []
+
+    for name, payload in load_payloads(data_root, scale).items():
+        raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        timings = {
+            "dumps_stdlib": best_of(lambda: json.dumps(payload, ensure_ascii=False).encode("utf-8"), repeat),
+            "render_drf": best_of(lambda: drf.render(payload), repeat),
+            "render_orjson": best_of(lambda: fast.render(payload), repeat),
+            "loads_stdlib": best_of(lambda: json.loads(raw.decode("utf-8")), repeat),
+            "loads_orjson": best_of(lambda: fast_loads(raw), repeat),
+        }
+        results.append({
+            "payload": name,
+            "records": len(payload),
+            "bytes": len(raw),
+            "seconds": timings,
+            "speedup_render": round(timings["render_drf"] / timings["render_orjson"], 2),
+            "speedup_loads": round(timings["loads_stdlib"] / timings["loads_orjson"], 2),
+        })
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-root", type=Path, default=DEFAULT_DATA_ROOT)
+    parser.add_argument("--scale", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", type=Path, help="zapisz wyniki do pliku JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.data_root, args.scale, args.repeat)
+
+    print(f"{'payload':8} {'records':>8} {'MB':>7} {'drf ms':>9} {'orjson ms':>10} {'x':>6} {'loads ms':>9} {'orjson ms':>10} {'x':>6}")
+    for r in results:
+        t = r["seconds"]
+        print(
+            f"{r['payload']:8} {r['records']:>8} {r['bytes'] / 1e6:>7.2f} "
+            f"{t['render_drf'] * 1e3:>9.2f} {t['render_orjson'] * 1e3:>10.2f} {r['speedup_render']:>6} "
+            f"{t['loads_stdlib'] * 1e3:>9.2f} {t['loads_orjson'] * 1e3:>10.2f} {r['speedup_loads']:>6}"
+        )
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
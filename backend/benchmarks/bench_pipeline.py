@@ -0,0 +1,387 @@
+"""
+Benchmark end-to-end: ingestia dokumentów, indeksowanie RAG, QA oraz sync/raport ERP/MES.
+
+Offline: OpenAI podmienione atrapą (benchmarks.fakes, opcjonalne --openai-latency) albo – z --openai-base-url –
+prawdziwy klient openai skierowany na lokalny serwer mock/fake_openai (HTTP, retry, 429), cache/channels w pamięci,
+Celery w trybie eager, osobna baza testowa (jak `manage.py test`) – dane deweloperskie nie są ruszane.
+Etapy sync/report potrzebują lokalnego mocka ERP/MES (MOCK_API_BASE), ask – PostgreSQL z pgvector;
+bez nich etap jest oznaczany jako "skipped".
+
+Etapy (--only extract,chunk,index,ask,sync,report):
+  extract – extract_text_from_document per format (pdf/txt/json/jsonl/xml): p50 ms, MB/s,
+  chunk   – create_smart_chunks / create_structured_chunks: znaki/s, chunki/s,
+  index   – index_document (ekstrakcja -> chunking -> embeddingi -> zapis): chunki/s,
+  ask     – POST /api/agents/ask/<id>/ (AskDocumentView): p50/p95 ms,
+  sync    – sync_erp_mes_snapshots_task (z ingestią rekordów i KPI): pierwszy i ponowny przebieg,
+  report  – generate_erp_mes_latest_report_task: zimny i ciepły przebieg (cache plików snapshotów).
+
+Uruchomienie (z katalogu backend/):
+    python -m benchmarks.bench_pipeline --json bench_results/$(git rev-parse --short HEAD).json
+    python -m benchmarks.bench_pipeline --only extract,chunk --scale 20
+    python -m benchmarks.bench_pipeline --only index,ask --openai-base-url http://localhost:8002/v1
+    python -m benchmarks.compare bench_results/<stary>.json bench_results/<nowy>.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "proscientia.settings")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+import django  # noqa: E402
+
+django.setup()
+
+import requests  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.db.backends.signals import connection_created  # noqa: E402
+from django.test.utils import override_settings, setup_databases, setup_test_environment, teardown_databases  # noqa: E402
+
+from benchmarks.fakes import patch_openai  # noqa: E402
+
+STAGES = ("extract", "chunk", "index", "ask", "sync", "report")
+REPO_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_DATA_ROOT = REPO_ROOT / "mock" / "data"
+
+QUESTIONS = (
+    "Jakie są wymagania dotyczące bezpieczeństwa elektrycznego?",
+    "Jak przeprowadzić kalibrację przepływu?",
+    "Jakie alarmy sygnalizuje urządzenie?",
+    "Jakie są parametry zasilania?",
+    "Jak często wykonywać konserwację?",
+)
+
+
+# --- pomiary ---
+
+def measure(fn: Callable[[], object], repeat: int) -> list[float]:
+    timings = []
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def summarize(timings: list[float]) -> dict:
+    return {
+        "runs": len(timings),
+        "min_ms": round(min(timings) * 1e3, 2),
+        "p50_ms": round(statistics.median(timings) * 1e3, 2),
+        "p95_ms": round(percentile(timings, 0.95) * 1e3, 2),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# --- dane wejściowe ---
+
+def prepare_sample_files(media: Path, data_root: Path, scale: int, pdf: Path | None) -> dict[str, tuple[str, str]]:
+    """Pliki próbne w MEDIA_ROOT/bench -> { format: (ścieżka względna, content_type) }."""
+    bench = media / "bench"
+    bench.mkdir(parents=True, exist_ok=True)
+    files: dict[str, tuple[str, str]] = {}
+
+    pdf = pdf or next(iter(sorted((data_root / "docs").rglob("*.pdf"), key=lambda p: -p.stat().st_size)), None)
+    if pdf is not None:
+        shutil.copy(pdf, bench / "sample.pdf")
+        files["pdf"] = ("bench/sample.pdf", "application/pdf")
+
+    records: list = []
+    for path in sorted(data_root.glob("*/*/*.json")):
+        data = json.loads(path.read_text(encoding="utf-8"))
+        records.extend(data if isinstance(data, list) else [data])
+    records *= max(1, scale)
+
+    (bench / "sample.json").write_text(json.dumps(records, ensure_ascii=False, indent=2), encoding="utf-8")
+    files["json"] = ("bench/sample.json", "application/json")
+    (bench / "sample.jsonl").write_text(
+        "\n".join(json.dumps(r, ensure_ascii=False) for r in records), encoding="utf-8"
+    )
+    files["jsonl"] = ("bench/sample.jsonl", "application/jsonl")
+    (bench / "sample.xml").write_text(
+        "<records>\n" + "\n".join(f"  <record>{json.dumps(r, ensure_ascii=False)}</record>" for r in records)
+        + "\n</records>\n",
+        encoding="utf-8",
+    )
+    files["xml"] = ("bench/sample.xml", "application/xml")
+
+    # TXT: tekst dokumentu (z PDF, jeśli jest) – realistyczna proza do chunkingu
+    text = ""
+    if pdf is not None:
+        from ai_agents.services import extract_text
+        text = extract_text(str(bench / "sample.pdf"))
+    text = (text or "\n".join(json.dumps(r, ensure_ascii=False) for r in records)) * max(1, scale)
+    (bench / "sample.txt").write_text(text, encoding="utf-8")
+    files["txt"] = ("bench/sample.txt", "text/plain")
+    return files
+
+
+def mock_available() -> bool:
+    base = (getattr(settings, "MOCK_API_BASE", None) or "").rstrip("/")
+    if not base:
+        return False
+    try:
+        return requests.get(f"{base}/health", timeout=2).ok
+    except requests.RequestException:
+        return False
+
+
+# --- etapy ---
+
+class Suite:
+    def __init__(self, args, media: Path) -> None:
+        self.args = args
+        self.media = media
+        self.results: dict[str, dict] = {}
+        self.files: dict[str, tuple[str, str]] = {}
+        self.user = None
+        self.indexed_doc = None
+
+    def _document(self, fmt: str, save: bool = False):
+        from documents.models import Document
+
+        name, content_type = self.files[fmt]
+        doc = Document(source=Document.SOURCE_USER_UPLOAD, title=f"bench-{fmt}", content_type=content_type,
+                       file=name, uploaded_by=self.user)
+        if save:
+            # bulk_create – bez sygnału post_save (bez auto-indeksowania w tle)
+            doc = Document.objects.bulk_create([doc])[0]
+        return doc
+
+    def setup(self) -> None:
+        from django.contrib.auth import get_user_model
+
+        self.files = prepare_sample_files(self.media, self.args.data_root, self.args.scale, self.args.pdf)
+        self.user = get_user_model().objects.create_user(email="bench@example.com", password="bench")
+
+    def extract(self) -> dict:
+        from ai_agents.services import extract_text_from_document
+
+        out = {}
+        for fmt in self.files:
+            doc = self._document(fmt)
+            size = (self.media / self.files[fmt][0]).stat().st_size
+            text = extract_text_from_document(doc)
+            timings = measure(lambda: extract_text_from_document(doc), self.args.repeat)
+            out[fmt] = {
+                "bytes": size,
+                "chars": len(text),
+                **summarize(timings),
+                "mb_per_second": round(size / 1e6 / statistics.median(timings), 2),
+            }
+        return out
+
+    def chunk(self) -> dict:
+        from ai_agents.services import create_smart_chunks, create_structured_chunks
+
+        text = (self.media / self.files["txt"][0]).read_text(encoding="utf-8")
+        out = {"chars": len(text)}
+        for name, fn in (
+            ("smart", lambda: create_smart_chunks(text)),
+            ("structured", lambda: create_structured_chunks([text], paginated=False)),
+        ):
+            chunks = fn()
+            timings = measure(fn, self.args.repeat)
+            median = statistics.median(timings)
+            out[name] = {
+                "chunks": len(chunks),
+                **summarize(timings),
+                "chars_per_second": round(len(text) / median),
+                "chunks_per_second": round(len(chunks) / median, 1),
+            }
+        return out
+
+    def index(self) -> dict:
+        from ai_agents.services import index_document
+
+        out = {}
+        for fmt in ("pdf", "txt"):
+            if fmt not in self.files:
+                continue
+            doc = self._document(fmt, save=True)
+            stats = index_document(doc)
+            timings = measure(lambda: index_document(doc), self.args.repeat)
+            median = statistics.median(timings)
+            out[fmt] = {
+                "chunks": stats["stored"],
+                "tokens": stats["tokens"],
+                **summarize(timings),
+                "chunks_per_second": round(stats["stored"] / median, 1),
+            }
+            if fmt == "pdf" or self.indexed_doc is None:
+                self.indexed_doc = doc
+        return out
+
+    def ask(self) -> dict:
+        if connection.vendor != "postgresql":
+            return {"skipped": f"wymaga PostgreSQL + pgvector (baza: {connection.vendor})"}
+        if self.indexed_doc is None:
+            self.results["index"] = self.index()
+
+        from django.urls import reverse
+        from rest_framework.test import APIClient
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse("agent-ask", args=[self.indexed_doc.id])
+        statuses: dict[int, int] = {}
+        timings = []
+        for i in range(self.args.ask_requests):
+            start = time.perf_counter()
+            resp = client.post(url, {"question": QUESTIONS[i % len(QUESTIONS)]}, format="json")
+            timings.append(time.perf_counter() - start)
+            statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+        return {**summarize(timings), "statuses": statuses}
+
+    def sync(self) -> dict:
+        if not mock_available():
+            return {"skipped": "mock ERP/MES niedostępny (MOCK_API_BASE/health)"}
+        from erp_mes.models import ErpMesSnapshot
+        from erp_mes.tasks import sync_erp_mes_snapshots_task
+
+        first = measure(sync_erp_mes_snapshots_task, 1)
+        repeat = measure(sync_erp_mes_snapshots_task, self.args.repeat)
+        return {
+            "snapshots": ErpMesSnapshot.objects.count(),
+            "first_ms": round(first[0] * 1e3, 2),
+            "repeat": summarize(repeat),
+        }
+
+    def report(self) -> dict:
+        from erp_mes.models import ErpMesSnapshot
+
+        if not ErpMesSnapshot.objects.filter(is_latest=True).exists():
+            if "sync" in self.results and "skipped" in self.results["sync"]:
+                return {"skipped": "brak snapshotów (sync pominięty)"}
+            self.results["sync"] = self.sync()
+            if "skipped" in self.results["sync"]:
+                return {"skipped": "brak snapshotów (sync pominięty)"}
+
+        from ai_agents.tasks import generate_erp_mes_latest_report_task
+
+        def run_report():
+            return generate_erp_mes_latest_report_task.apply(args=(self.user.id,)).get()
+
+        cold = measure(run_report, 1)
+        warm = measure(run_report, self.args.repeat)
+        return {"result": str(run_report())[:120], "cold_ms": round(cold[0] * 1e3, 2), "warm": summarize(warm)}
+
+    def run(self, stages: list[str]) -> dict:
+        self.setup()
+        for stage in stages:
+            print(f"[bench] {stage}...", flush=True)
+            started = time.perf_counter()
+            try:
+                self.results[stage] = getattr(self, stage)()
+            except Exception as exc:  # wynik etapu zapisujemy, reszta suite'u leci dalej
+                self.results[stage] = {"error": f"{type(exc).__name__}: {exc}"}
+            self.results[stage]["stage_seconds"] = round(time.perf_counter() - started, 2)
+        return self.results
+
+
+def _enable_pgvector(sender, connection, **kwargs) -> None:
+    # baza testowa powstaje z template1 – rozszerzenie trzeba założyć przed migracją DocumentChunk
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS vector")
+
+
+def run(args) -> dict:
+    from proscientia.celery_app import app as celery_app
+
+    stages = [s for s in STAGES if s in args.only] if args.only else list(STAGES)
+    tmp = Path(tempfile.mkdtemp(prefix="proscientia-bench-"))
+    overrides = override_settings(
+        MEDIA_ROOT=str(tmp / "media"),
+        ERP_MES_FILE_CACHE_DIR=tmp / "erp_mes_cache",
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+        CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+    )
+    if args.openai_base_url:
+        openai_overrides = override_settings(
+            OPENAI_BASE_URL=args.openai_base_url,
+            OPENAI_API_KEY=settings.OPENAI_API_KEY or "fake",
+        )
+    else:
+        openai_overrides = patch_openai(latency=args.openai_latency)
+    celery_app.conf.task_always_eager = True
+    celery_app.conf.task_eager_propagates = True
+    connection_created.connect(_enable_pgvector)
+
+    setup_test_environment()
+    db_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        with overrides, openai_overrides:
+            results = Suite(args, tmp / "media").run(stages)
+    finally:
+        teardown_databases(db_config, verbosity=0)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "db_vendor": connection.vendor,
+            "openai": args.openai_base_url or f"fake (latency {args.openai_latency}s)",
+            "scale": args.scale,
+            "repeat": args.repeat,
+        },
+        "stages": results,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", type=lambda s: [x.strip() for x in s.split(",") if x.strip()],
+                        help=f"etapy po przecinku ({','.join(STAGES)})")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=int, default=5, help="powielenie danych wejściowych extract/chunk")
+    parser.add_argument("--ask-requests", type=int, default=50)
+    parser.add_argument("--openai-latency", type=float, default=0.0, help="sztuczne opóźnienie atrapy OpenAI [s]")
+    parser.add_argument("--openai-base-url", help="serwer zgodny z API OpenAI (np. mock/fake_openai) zamiast atrapy w procesie")
+    parser.add_argument("--data-root", type=Path, default=DEFAULT_DATA_ROOT, help="katalog danych mocka")
+    parser.add_argument("--pdf", type=Path, help="PDF do etapów extract/index (domyślnie największy z data/docs)")
+    parser.add_argument("--json", type=Path, help="zapisz wyniki do pliku JSON")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    for stage, result in report["stages"].items():
+        print(f"{stage:8} {json.dumps(result, ensure_ascii=False)}")
+
+    if args.json:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        args.json.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"[bench] zapisano {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
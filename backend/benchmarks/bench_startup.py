@@ -0,0 +1,170 @@
+"""
+Benchmark czasu startu procesu: django.setup() (serwer, manage.py) i start workera Celery.
+
+Każdy pomiar to osobny proces `python -X importtime` – liczy się czas importów (suma "self" z importtime)
+i czas ścianowy całego procesu (mediana z --repeat uruchomień). Ciężkie zależności agentów
+(openai, pypdf, langchain_text_splitters, tiktoken) oraz SDK OpenTelemetry (przy TRACING_EXPORTER=none)
+mają się ładować dopiero przy pierwszym użyciu – ich obecność przy starcie to regresja.
+
+Uruchomienie (z katalogu backend/):
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --budget-ms 1500 --json bench_results/startup.json
+
+Kod wyjścia 1, gdy import przekroczy --budget-ms albo przy starcie załaduje się moduł z listy leniwych
+(nadaje się jako krok CI). Wynik --json jest zgodny z benchmarks.compare.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+REPO_ROOT = BACKEND_ROOT.parent
+
+TARGETS = {
+    "django": "import django; django.setup()",
+    "celery": (
+        "from proscientia.celery_app import app; import django; django.setup(); "
+        "app.loader.import_default_modules()"
+    ),
+}
+
+# moduły ładowane leniwie (ai_agents/services.py, proscientia/tracing.py) – nie mogą pojawić się przy starcie
+LAZY_MODULES = ("openai", "pypdf", "langchain_text_splitters", "tiktoken")
+LAZY_MODULES_NO_TRACING = ("opentelemetry.sdk",)
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_importtime(stderr: str) -> dict[str, int]:
+    """{ moduł: czas "self" w µs } z linii `import time: self [us] | cumulative | imported package`."""
+    modules: dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # nagłówek tabeli
+        modules[parts[2].strip()] = int(parts[0])
+    return modules
+
+
+def measure(code: str, env: dict[str, str]) -> tuple[float, dict[str, int]]:
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_ROOT, env=env, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"Startup failed ({proc.returncode}):\n{proc.stderr[-2000:]}")
+    return wall, parse_importtime(proc.stderr)
+
+
+def top_packages(modules: dict[str, int], limit: int) -> list[tuple[str, float]]:
+    """Najdroższe pakiety najwyższego poziomu (suma czasów "self" ich modułów, ms)."""
+    totals: dict[str, int] = {}
+    for name, self_us in modules.items():
+        top = name.lstrip().split(".", 1)[0]
+        totals[top] = totals.get(top, 0) + self_us
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return [(name, round(us / 1000, 1)) for name, us in ranked]
+
+
+def run(targets: list[str], repeat: int, top: int) -> tuple[dict, list[str]]:
+    env = os.environ.copy()
+    env.setdefault("DJANGO_SETTINGS_MODULE", "proscientia.settings")
+    env.setdefault("SECRET_KEY", "benchmark")
+    lazy = LAZY_MODULES
+    if env.get("TRACING_EXPORTER", "none") == "none":
+        lazy += LAZY_MODULES_NO_TRACING
+
+    results: dict[str, dict] = {}
+    violations: list[str] = []
+    for target in targets:
+        walls, imports = [], []
+        modules: dict[str, int] = {}
+        for _ in range(repeat):
+            wall, modules = measure(TARGETS[target], env)
+            walls.append(wall)
+            imports.append(sum(modules.values()) / 1000)
+        names = {m.strip() for m in modules}
+        loaded = [
+            lazy_name for lazy_name in lazy
+            if any(name == lazy_name or name.startswith(lazy_name + ".") for name in names)
+        ]
+        violations += [f"{target}: {name}" for name in loaded]
+        results[target] = {
+            "import_ms": round(statistics.median(imports), 1),
+            "wall_ms": round(statistics.median(walls) * 1000, 1),
+            "modules": len(modules),
+            "top_packages_ms": dict(top_packages(modules, top)),
+            "lazy_loaded": loaded,
+        }
+    return results, violations
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", default=",".join(TARGETS), help=f"lista z: {', '.join(TARGETS)}")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="ile najdroższych pakietów pokazać")
+    parser.add_argument("--budget-ms", type=float, help="limit czasu importów (import_ms) dla każdego celu")
+    parser.add_argument("--json", type=Path, help="zapisz wyniki do pliku JSON")
+    args = parser.parse_args(argv)
+
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    unknown = [t for t in targets if t not in TARGETS]
+    if unknown:
+        parser.error(f"nieznane cele: {', '.join(unknown)}")
+
+    results, violations = run(targets, max(1, args.repeat), args.top)
+
+    failed = False
+    for target, r in results.items():
+        over = args.budget_ms is not None and r["import_ms"] > args.budget_ms
+        failed |= over
+        budget = f" (budżet {args.budget_ms:.0f} ms{' PRZEKROCZONY' if over else ''})" if args.budget_ms else ""
+        print(f"{target}: import {r['import_ms']:.1f} ms, proces {r['wall_ms']:.1f} ms, "
+              f"{r['modules']} modułów{budget}")
+        for name, ms in r["top_packages_ms"].items():
+            print(f"    {name:32} {ms:>8.1f} ms")
+    if violations:
+        failed = True
+        print("Moduły ładowane przy starcie mimo leniwego importu:")
+        for violation in violations:
+            print(f"    {violation}")
+
+    if args.json:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        args.json.write_text(json.dumps({
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "repeat": args.repeat,
+                "budget_ms": args.budget_ms,
+            },
+            "stages": {"startup": results},
+        }, indent=2), encoding="utf-8")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+Porównanie dwóch wyników benchmarku (np. bench_pipeline --json z dwóch commitów).
+
+Uruchomienie (z katalogu backend/):
+    python -m benchmarks.compare bench_results/abc123.json bench_results/def456.json
+    python -m benchmarks.compare old.json new.json --filter p50 --threshold 5
+
+Metryki czasu (*_ms, *seconds) – mniej znaczy lepiej; przepustowość (*_per_second) – więcej znaczy lepiej.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def flatten(data, prefix: str = "") -> dict[str, float]:
+    out: dict[str, float] = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            out.update(flatten(value, f"{prefix}.{key}" if prefix else str(key)))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        out[prefix] = float(data)
+    return out
+
+
+def lower_is_better(metric: str) -> bool | None:
+    name = metric.rsplit(".", 1)[-1]
+    if name.endswith("_ms") or (name.endswith("seconds") and not name.endswith("_per_second")):
+        return True
+    if name.endswith("_per_second") or name.startswith("speedup"):
+        return False
+    return None
+
+
+def compare(old: dict, new: dict, name_filter: str | None = None) -> list[dict]:
+    old_flat = flatten(old.get("stages", old))
+    new_flat = flatten(new.get("stages", new))
+    rows = []
+    for metric in sorted(set(old_flat) & set(new_flat)):
+        if name_filter and name_filter not in metric:
+            continue
+        a, b = old_flat[metric], new_flat[metric]
+        change = (b - a) / a * 100 if a else 0.0
+        direction = lower_is_better(metric)
+        better = None if direction is None or not change else (change < 0) == direction
+        rows.append({"metric": metric, "old": a, "new": b, "change_pct": round(change, 1), "better": better})
+    return rows
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("old", type=Path)
+    parser.add_argument("new", type=Path)
+    parser.add_argument("--filter", help="tylko metryki zawierające ten tekst")
+    parser.add_argument("--threshold", type=float, default=0.0, help="pokaż tylko zmiany >= N%%")
+    args = parser.parse_args(argv)
+
+    old = json.loads(args.old.read_text(encoding="utf-8"))
+    new = json.loads(args.new.read_text(encoding="utf-8"))
+    print(f"old: {old.get('meta', {}).get('commit')}  new: {new.get('meta', {}).get('commit')}")
+
+    for row in compare(old, new, args.filter):
+        if abs(row["change_pct"]) < args.threshold:
+            continue
+        mark = {True: "+", False: "-", None: " "}[row["better"]]
+        print(f"{mark} {row['metric']:55} {row['old']:>14.2f} {row['new']:>14.2f} {row['change_pct']:>+8.1f}%")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Atrapa klienta OpenAI dla benchmarków (bez sieci i bez kosztów).
+
+  - embeddings.create       -> deterministyczne wektory 1536 (ten sam tekst = ten sam wektor),
+  - chat.completions.create -> krótka odpowiedź z licznikiem znaków wejścia,
+  - latency                 -> opcjonalne opóźnienie na wywołanie (symulacja czasu odpowiedzi API).
+
+Podmiana przez patch_openai(): klasa openai.OpenAI (ai_agents.services importuje ją leniwie w get_openai_client).
+"""
+from __future__ import annotations
+
+import hashlib
+import time
+from contextlib import ExitStack, contextmanager
+from types import SimpleNamespace
+from typing import Iterator
+from unittest import mock
+
+import numpy as np
+
+EMBEDDING_DIMENSIONS = 1536
+
+# miejsca, skąd kod bierze klasę OpenAI (import w funkcji czyta atrybut modułu openai przy każdym wywołaniu)
+OPENAI_IMPORT_SITES = ("openai.OpenAI",)
+
+
+def fake_embedding(text: str, dimensions: int = EMBEDDING_DIMENSIONS) -> list[float]:
+    seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "little")
+    vec = np.random.default_rng(seed).standard_normal(dimensions)
+    return (vec / np.linalg.norm(vec)).tolist()
+
+
+def _usage(prompt_chars: int, completion_chars: int) -> SimpleNamespace:
+    # ~4 znaki na token – wystarczy do statystyk w metadanych
+    prompt, completion = prompt_chars // 4, completion_chars // 4
+    return SimpleNamespace(prompt_tokens=prompt, completion_tokens=completion, total_tokens=prompt + completion)
+
+
+class _Embeddings:
+    def __init__(self, owner: "FakeOpenAI") -> None:
+        self._owner = owner
+
+    def create(self, input, model: str, **kwargs):
+        self._owner._wait()
+        texts = [input] if isinstance(input, str) else list(input)
+        return SimpleNamespace(
+            data=[SimpleNamespace(index=i, embedding=fake_embedding(t)) for i, t in enumerate(texts)],
+            model=model,
+            usage=_usage(sum(len(t) for t in texts), 0),
+        )
+
+
+class _Completions:
+    def __init__(self, owner: "FakeOpenAI") -> None:
+        self._owner = owner
+
+    def create(self, model: str, messages: list[dict], **kwargs):
+        self._owner._wait()
+        prompt_chars = sum(len(m.get("content") or "") for m in messages)
+        content = f"- Odpowiedź testowa ({model}), wejście: {prompt_chars} znaków."
+        return SimpleNamespace(
+            choices=[SimpleNamespace(index=0, message=SimpleNamespace(role="assistant", content=content),
+                                     finish_reason="stop")],
+            model=model,
+            usage=_usage(prompt_chars, len(content)),
+        )
+
+
+class FakeOpenAI:
+    """Zgodny (w zakresie używanym przez projekt) z openai.OpenAI."""
+
+    latency: float = 0.0
+
+    def __init__(self, *args, **kwargs) -> None:
+        self.embeddings = _Embeddings(self)
+        self.chat = SimpleNamespace(completions=_Completions(self))
+
+    def _wait(self) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+
+
+@contextmanager
+def patch_openai(latency: float = 0.0) -> Iterator[type[FakeOpenAI]]:
+    fake = type("FakeOpenAI", (FakeOpenAI,), {"latency": latency})
+    with ExitStack() as stack:
+        for target in OPENAI_IMPORT_SITES:
+            stack.enter_context(mock.patch(target, fake))
+        yield fake
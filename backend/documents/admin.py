@@ -1,6 +1,36 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+
+from ai_agents.services import job_dedup_key, start_single_flight
+from ai_agents.tasks import index_mock_corpus_task, process_document_indexing_task
+
 from .models import Document
 
 @admin.register(Document)
 class DocumentAdmin(admin.ModelAdmin):
-    list_display = ['title', 'source', 'created_at']
\ No newline at end of file
+    list_display = ['title', 'source', 'created_at']
+    actions = ['index_selected', 'import_and_index_mock_corpus']
+
+    def save_model(self, request, obj, form, change):
+        if "file" in form.changed_data:
+            obj.file_sha256 = ""  # policzy się przy pierwszym streszczeniu
+        super().save_model(request, obj, form, change)
+
+    @admin.action(description="Zindeksuj zaznaczone dokumenty (RAG)")
+    def index_selected(self, request, queryset):
+        scheduled = 0
+        for doc_id in queryset.values_list("id", flat=True):
+            _, deduplicated = start_single_flight(
+                process_document_indexing_task, job_dedup_key("index", doc_id), args=(doc_id,)
+            )
+            scheduled += not deduplicated
+        self.message_user(request, f"Zlecono indeksowanie {scheduled} dokumentów.", messages.SUCCESS)
+
+    @admin.action(description="Importuj cały korpus mocka (docs/ERP/MES) i zindeksuj – niezależnie od zaznaczenia")
+    def import_and_index_mock_corpus(self, request, queryset):
+        task = index_mock_corpus_task.delay()
+        self.message_user(
+            request,
+            f"Zlecono import i indeksowanie korpusu mocka (task {task.id}). "
+            "Z konsoli: python manage.py index_mock_corpus",
+            messages.SUCCESS,
+        )
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['is_active', '-created_at'], name='doc_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['source', 'mock_stream', 'mock_version_date'], name='doc_source_mock_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0002_document_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='document',
+            name='file',
+            field=models.FileField(blank=True, max_length=500, null=True, upload_to='documents/%Y/%m/%d'),
+        ),
+    ]
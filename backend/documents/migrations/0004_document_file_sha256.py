@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0003_document_file_max_length'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='file_sha256',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
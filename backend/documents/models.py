@@ -40,10 +40,15 @@ class Document(models.Model):
     # fizyczny plik (dla USER_UPLOAD i dla mocków po ściągnięciu)
     file = models.FileField(
         upload_to="documents/%Y/%m/%d",
+        max_length=500,  # pliki mocka mają zagnieżdżone, długie ścieżki
         null=True,
         blank=True,
     )
 
+    # SHA-256 zawartości pliku (klucz cache streszczeń) – liczony przy zapisie pliku,
+    # puste = jeszcze nie policzony (starsze rekordy, bulk_create mocków, zmiana pliku w adminie)
+    file_sha256 = models.CharField(max_length=64, blank=True)
+
     # --- powiązania z mockiem ERP/MES/docs ---
 
     # "erp", "mes" lub "docs" – tylko dla dokumentów pochodzących z mocka
@@ -62,6 +67,11 @@ class Document(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        # filtry listy /api/documents/ (source, mock_stream, mock_version_date) + sortowanie po created_at
+        indexes = [
+            models.Index(fields=["is_active", "-created_at"], name="doc_active_created_idx"),
+            models.Index(fields=["source", "mock_stream", "mock_version_date"], name="doc_source_mock_idx"),
+        ]
 
     def __str__(self) -> str:  # type: ignore[override]
         return f"{self.title} [{self.source}]"
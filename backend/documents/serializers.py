@@ -3,6 +3,7 @@ from __future__ import annotations
 from rest_framework import serializers
 
 from .models import Document
+from .services import compute_file_sha256
 
 
 class DocumentSerializer(serializers.ModelSerializer):
@@ -66,6 +67,7 @@ class DocumentUploadSerializer(serializers.ModelSerializer):
             tags=validated_data.get("tags", []),
             uploaded_by=user,
             file=file,
+            file_sha256=compute_file_sha256(file),
             content_type=getattr(file, "content_type", ""),
         )
         return doc
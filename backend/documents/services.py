@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import mimetypes
+from datetime import date as date_cls
+from typing import Iterable, Optional
+
+from django.core.files.base import ContentFile, File
+
+from erp_mes.services import MockErpMesClient
+
+from .models import Document
+
+logger = logging.getLogger(__name__)
+
+
+STREAM_SOURCES = {
+    "docs": Document.SOURCE_MOCK_DOCS,
+    "erp": Document.SOURCE_MOCK_ERP,
+    "mes": Document.SOURCE_MOCK_MES,
+}
+
+
+def compute_file_sha256(file: File) -> str:
+    """SHA-256 zawartości pliku liczony blokami (UploadedFile, ContentFile, FieldFile)."""
+    digest = hashlib.sha256()
+    for block in file.chunks():
+        digest.update(block)
+    return digest.hexdigest()
+
+
+def discover_mock_documents(
+    client: MockErpMesClient,
+    streams: Iterable[str] = ("docs", "erp", "mes"),
+    all_versions: bool = False,
+) -> list[dict]:
+    """
+    Lista plików dostępnych w mocku jako specyfikacje dokumentów:
+      - docs: /files/docs-list,
+      - erp/mes: listing najnowszego snapshotu albo (all_versions) wszystkich wersji z manifestu.
+    Każdy element: { stream, filename, version_date (date|None), size }.
+    """
+    specs: list[dict] = []
+    streams = list(streams)
+
+    if "docs" in streams:
+        for f in client.list_docs().get("files", []):
+            specs.append({"stream": "docs", "filename": f["name"], "version_date": None, "size": f.get("size")})
+
+    manifest = client.get_manifest() if all_versions else {}
+    for stream in ("erp", "mes"):
+        if stream not in streams:
+            continue
+        dates = (manifest.get(stream) or {}).get("versions") if all_versions else [None]
+        for version in dates or []:
+            listing = client.get_stream_listing(stream, date=version)
+            if not listing.get("date"):
+                continue
+            version_date = date_cls.fromisoformat(listing["date"])
+            for f in listing.get("files", []):
+                specs.append(
+                    {"stream": stream, "filename": f["name"], "version_date": version_date, "size": f.get("size")}
+                )
+    return specs
+
+
+def create_mock_documents(specs: list[dict]) -> tuple[list[Document], list[Document]]:
+    """
+    Tworzy brakujące dokumenty mocka jednym bulk_create (bez sygnału post_save).
+    Zwraca (utworzone, już istniejące).
+    """
+    existing_by_key = {
+        (d.mock_stream, d.mock_version_date, d.mock_filename): d
+        for d in Document.objects.filter(
+            source__in=STREAM_SOURCES.values(),
+            mock_filename__in={s["filename"] for s in specs},
+            is_active=True,
+        )
+    }
+
+    existing: list[Document] = []
+    to_create: list[Document] = []
+    for spec in specs:
+        key = (spec["stream"], spec["version_date"], spec["filename"])
+        if key in existing_by_key:
+            existing.append(existing_by_key[key])
+            continue
+        content_type, _ = mimetypes.guess_type(spec["filename"])
+        to_create.append(
+            Document(
+                source=STREAM_SOURCES[spec["stream"]],
+                title=spec["filename"].rsplit("/", 1)[-1],
+                content_type=content_type or "",
+                tags=[spec["stream"]],
+                mock_stream=spec["stream"],
+                mock_version_date=spec["version_date"],
+                mock_filename=spec["filename"],
+            )
+        )
+
+    created = Document.objects.bulk_create(to_create, batch_size=500)
+    return created, existing
+
+
+def fetch_mock_document_file(doc: Document, client: Optional[MockErpMesClient] = None) -> bool:
+    """
+    Pobiera plik dokumentu z mocka (ERP/MES/docs) i zapisuje go do FileField.
+    Zwraca True, jeśli plik został zapisany.
+    """
+    if not (doc.is_mock_doc or doc.is_mock_erp_mes):
+        logger.info("Document %s is not a mock-based document. Skipping.", doc.id)          # type: ignore[attr-defined]
+        return False
+
+    client = client or MockErpMesClient()
+
+    if doc.is_mock_erp_mes:
+        if not doc.mock_version_date or not doc.mock_filename:
+            logger.error(
+                "Document %s missing mock_version_date or mock_filename", doc.id            # type: ignore[attr-defined]
+            )
+            return False
+
+        stream = doc.mock_stream  # "erp" lub "mes"
+        date_str = doc.mock_version_date.strftime("%Y-%m-%d")
+        content_bytes = client.get_file_bytes(stream=stream, name=doc.mock_filename, date=date_str)
+    else:
+        # MOCK_DOCS
+        if not doc.mock_filename:
+            logger.error("Document %s missing mock_filename", doc.id)                       # type: ignore[attr-defined]
+            return False
+
+        content_bytes = client.get_file_bytes(stream="docs", name=doc.mock_filename, date=None)
+
+    # Zapis do FileField
+    file_name = doc.mock_filename or f"document_{doc.id}"                                   # type: ignore[attr-defined]
+    doc.file_sha256 = hashlib.sha256(content_bytes).hexdigest()
+    doc.file.save(file_name, ContentFile(content_bytes), save=True)
+    return True
@@ -3,11 +3,11 @@ from __future__ import annotations
 import logging
 
 from celery import shared_task
-from django.core.files.base import ContentFile
 
-from .models import Document
+from ai_agents.tasks import schedule_document_indexing
 
-from erp_mes.services import MockErpMesClient
+from .models import Document
+from .services import fetch_mock_document_file
 
 logger = logging.getLogger(__name__)
 
@@ -28,41 +28,10 @@ def fetch_and_store_file_task(document_id: int) -> None:
         logger.warning("Document %s does not exist", document_id)
         return
 
-    if not (doc.is_mock_doc or doc.is_mock_erp_mes):
-        logger.info("Document %s is not a mock-based document. Skipping.", document_id)
-        return
-
-    client = MockErpMesClient()
-
-    if doc.is_mock_erp_mes:
-        if not doc.mock_version_date or not doc.mock_filename:
-            logger.error(
-                "Document %s missing mock_version_date or mock_filename", document_id
-            )
-            return
-
-        stream = doc.mock_stream  # "erp" lub "mes"
-        date_str = doc.mock_version_date.strftime("%Y-%m-%d")
-        name = doc.mock_filename
-
-        content_bytes = client.get_file_bytes(stream=stream, name=name, date=date_str)
-    else:
-        # MOCK_DOCS
-        if not doc.mock_filename:
-            logger.error("Document %s missing mock_filename", document_id)
-            return
-
-        content_bytes = client.get_file_bytes(
-            stream="docs",
-            name=doc.mock_filename,
-            date=None,
-        )
-
-    # Zapis do FileField
-    file_name = doc.mock_filename or f"document_{doc.id}"                   # type: ignore[attr-defined]
-    doc.file.save(file_name, ContentFile(content_bytes), save=True)
-
-    logger.info("Document %s file fetched and stored.", document_id)
+    if fetch_mock_document_file(doc):
+        logger.info("Document %s file fetched and stored.", document_id)
+        # plik już istnieje – dopiero teraz indeksowanie (RAG)
+        schedule_document_indexing([document_id])
 
 
 @shared_task
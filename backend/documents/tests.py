@@ -1,3 +1,76 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from ai_agents.models import AiArtifact
+
+from .models import Document
+
+
+class ListQueryCountTests(TestCase):
+    """
+    Listy dokumentów i artefaktów muszą wykonywać stałą liczbę zapytań
+    niezależnie od liczby wierszy i rozmiaru strony (brak N+1).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create_user(email="owner@example.com", password="x")
+        uploaders = [
+            User.objects.create_user(email=f"u{i}@example.com", password="x") for i in range(30)
+        ]
+        # bulk_create – bez sygnału post_save (auto-indeksowanie przez Celery)
+        docs = Document.objects.bulk_create(
+            Document(
+                source=Document.SOURCE_USER_UPLOAD,
+                title=f"Doc {i}",
+                uploaded_by=uploader,
+                file=f"documents/doc_{i}.pdf",
+            )
+            for i, uploader in enumerate(uploaders)
+        )
+        AiArtifact.objects.bulk_create(
+            AiArtifact(
+                artifact_type=AiArtifact.TYPE_SUMMARY,
+                document=doc,
+                owner=cls.user,
+                file=f"ai_artifacts/summary_{i}.txt",
+                title=f"Summary {i}",
+            )
+            for i, doc in enumerate(docs)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _assert_constant_queries(self, url):
+        for params in ({}, {"page_size": 5}, {"page_size": 25}):
+            with self.assertNumQueries(1):
+                resp = self.client.get(url, params)
+            self.assertEqual(resp.status_code, 200)
+
+    def test_document_list_query_count(self):
+        self._assert_constant_queries(reverse("document-list"))
+
+    def test_artifact_list_query_count(self):
+        self._assert_constant_queries(reverse("ai-artifact-list"))
+
+    def test_cursor_pagination_walks_all_rows(self):
+        url = reverse("document-list")
+        seen = []
+        resp = self.client.get(url, {"page_size": 7})
+        while True:
+            body = resp.json()
+            seen.extend(item["id"] for item in body["results"])
+            if not body["next"]:
+                break
+            resp = self.client.get(body["next"])
+        self.assertEqual(len(seen), 30)
+        self.assertEqual(len(set(seen)), 30)
+
+    def test_unpaginated_list_stays_a_plain_array(self):
+        resp = self.client.get(reverse("document-list"))
+        self.assertIsInstance(resp.json(), list)
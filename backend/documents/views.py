@@ -14,6 +14,17 @@ from .serializers import (
     DocumentFromErpMesSerializer,
 )
 from .tasks import fetch_and_store_file_task, parse_document_task
+from proscientia.pagination import OptionalCursorPagination
+from users.models import QuotaCounter
+from users.services import release_quota, try_consume_quota
+
+
+# kolumny potrzebne DocumentSerializer – dla .only() w liście
+DOCUMENT_LIST_FIELDS = (
+    "id", "source", "title", "description", "content_type", "tags", "file",
+    "mock_stream", "mock_version_date", "mock_filename", "created_at", "updated_at",
+    "uploaded_by__email",
+)
 
 
 # HELPERS
@@ -26,7 +37,7 @@ ALLOWED_UPLOAD_EXTENSIONS = {
 def count_user_uploaded_documents(user) -> int:
     """
     Liczy aktywne dokumenty wgrane przez użytkownika.
-    Używane do limitu 5 własnych plików.
+    Używane tylko do zainicjowania licznika QuotaCounter (limit własnych plików).
     """
     if user.is_anonymous:
         return 0
@@ -53,13 +64,21 @@ class DocumentListView(generics.ListAPIView):
     """
     GET /api/documents/
     Lista dokumentów z prostym filtrowaniem.
+    Paginacja kursorowa na żądanie: ?page_size=50, kolejne strony przez ?cursor=...
     """
 
     serializer_class = DocumentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OptionalCursorPagination
 
     def get_queryset(self):     # type: ignore[override]
-        qs = Document.objects.filter(is_active=True)
+        # select_related + only: jedno zapytanie niezależnie od liczby wierszy
+        # (uploaded_by_email bez N+1)
+        qs = (
+            Document.objects.filter(is_active=True)
+            .select_related("uploaded_by")
+            .only(*DOCUMENT_LIST_FIELDS)
+        )
 
         source = self.request.query_params.get("source")                            # type: ignore[var-annotated]
         if source:
@@ -73,7 +92,7 @@ class DocumentListView(generics.ListAPIView):
         if version_date:
             qs = qs.filter(mock_version_date=version_date)
 
-        return qs.order_by("-created_at")
+        return qs.order_by("-created_at", "-id")
 
 
 class DocumentDetailView(generics.RetrieveDestroyAPIView):
@@ -92,7 +111,7 @@ class DocumentDetailView(generics.RetrieveDestroyAPIView):
             raise PermissionDenied("Można usuwać tylko własne pliki użytkownika.")
         if instance.uploaded_by != self.request.user:
             raise PermissionDenied("Można usuwać tylko własne pliki użytkownika.")
-        instance.delete()
+        instance.delete()  # limit zwalnia sygnał post_delete (ai_agents/signals.py)
 
 
 """class DocumentUploadView(APIView):
@@ -122,13 +141,6 @@ class DocumentUploadView(APIView):
     def post(self, request, *args, **kwargs):
         user = request.user
 
-        # 1) Limit 5 własnych plików
-        if count_user_uploaded_documents(user) >= 5:
-            return Response(
-                {"detail": "Limit 5 własnych plików na użytkownika został przekroczony."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
         upload_file = request.FILES.get("file")
         if not upload_file:
             return Response(
@@ -136,17 +148,32 @@ class DocumentUploadView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # 2) Walidacja typu/rozszerzenia
+        # 1) Walidacja typu/rozszerzenia
         if not is_allowed_user_file(upload_file.name):
             return Response(
                 {"detail": "Niedozwolony typ pliku. Dozwolone: pdf, txt, json, jsonl, yaml, xml, doc, docx."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # 3) Standardowy upload
         serializer = DocumentUploadSerializer(data=request.data, context={"request": request})
         serializer.is_valid(raise_exception=True)
-        doc = serializer.save(uploaded_by=user)
+
+        # 2) Limit własnych plików (per rola) – atomowy licznik zamiast COUNT(*)
+        allowed, limit = try_consume_quota(
+            user, QuotaCounter.KIND_UPLOAD, seed=lambda: count_user_uploaded_documents(user), reconcile=True
+        )
+        if not allowed:
+            return Response(
+                {"detail": f"Limit {limit} własnych plików na użytkownika został przekroczony."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # 3) Standardowy upload
+        try:
+            doc = serializer.save(uploaded_by=user)
+        except Exception:
+            release_quota(user.id, QuotaCounter.KIND_UPLOAD)
+            raise
 
         # (opcjonalnie) możesz znów przywrócić parsowanie:
         # parse_document_task.delay(doc.id)
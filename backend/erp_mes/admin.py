@@ -1,3 +1,9 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import SnapshotKpi
+
+
+@admin.register(SnapshotKpi)
+class SnapshotKpiAdmin(admin.ModelAdmin):
+    list_display = ["snapshot", "dimension", "key", "computed_at"]
+    list_filter = ["dimension", "snapshot"]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_mes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotKpi',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('total', 'Total'), ('line', 'Line'), ('product', 'Product'), ('shift', 'Shift'), ('downtime_cause', 'Downtime cause')], max_length=16)),
+                ('key', models.CharField(max_length=100)),
+                ('metrics', models.JSONField(blank=True, default=dict)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='kpis', to='erp_mes.erpmessnapshot')),
+            ],
+            options={
+                'ordering': ['snapshot', 'dimension', 'key'],
+                'unique_together': {('snapshot', 'dimension', 'key')},
+            },
+        ),
+    ]
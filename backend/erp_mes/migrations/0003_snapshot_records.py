@@ -0,0 +1,134 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_mes', '0002_snapshotkpi'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='erpmessnapshot',
+            name='records_ingested_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='BomComponent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('product_id', models.CharField(max_length=64)),
+                ('bom_version', models.CharField(blank=True, max_length=16)),
+                ('component_id', models.CharField(max_length=64)),
+                ('supplier', models.CharField(blank=True, max_length=128)),
+                ('quantity_per', models.FloatField(blank=True, null=True)),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='erp_mes.erpmessnapshot')),
+            ],
+            options={
+                'ordering': ['snapshot', 'product_id', 'bom_version', 'component_id'],
+                'indexes': [models.Index(fields=['snapshot', 'product_id', 'bom_version'], name='erp_mes_bom_snapsho_5cc1f9_idx'), models.Index(fields=['component_id', 'snapshot'], name='erp_mes_bom_compone_17dcc4_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DowntimeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('event_id', models.CharField(max_length=64)),
+                ('machine_id', models.CharField(blank=True, max_length=64)),
+                ('line_id', models.CharField(blank=True, max_length=32)),
+                ('type', models.CharField(blank=True, max_length=16)),
+                ('reason_code', models.CharField(blank=True, max_length=64)),
+                ('duration_min', models.FloatField(blank=True, null=True)),
+                ('start_time', models.DateTimeField(blank=True, null=True)),
+                ('end_time', models.DateTimeField(blank=True, null=True)),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='erp_mes.erpmessnapshot')),
+            ],
+            options={
+                'ordering': ['snapshot', 'start_time', 'event_id'],
+                'indexes': [models.Index(fields=['snapshot', 'event_id'], name='erp_mes_dow_snapsho_e5f5f1_idx'), models.Index(fields=['snapshot', 'line_id', 'start_time'], name='erp_mes_dow_snapsho_af00c0_idx'), models.Index(fields=['snapshot', 'reason_code'], name='erp_mes_dow_snapsho_519369_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Machine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('machine_id', models.CharField(max_length=64)),
+                ('line_id', models.CharField(blank=True, max_length=32)),
+                ('type', models.CharField(blank=True, max_length=64)),
+                ('status', models.CharField(blank=True, max_length=32)),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='erp_mes.erpmessnapshot')),
+            ],
+            options={
+                'ordering': ['snapshot', 'machine_id'],
+                'indexes': [models.Index(fields=['snapshot', 'machine_id'], name='erp_mes_mac_snapsho_98692c_idx'), models.Index(fields=['machine_id', 'snapshot'], name='erp_mes_mac_machine_3c9350_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductionBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('batch_id', models.CharField(max_length=64)),
+                ('work_order_id', models.CharField(blank=True, max_length=64)),
+                ('product_id', models.CharField(blank=True, max_length=64)),
+                ('line_id', models.CharField(blank=True, max_length=32)),
+                ('status', models.CharField(blank=True, max_length=32)),
+                ('quantity_planned', models.IntegerField(blank=True, null=True)),
+                ('quantity_good', models.IntegerField(blank=True, null=True)),
+                ('quantity_reject', models.IntegerField(blank=True, null=True)),
+                ('start_time', models.DateTimeField(blank=True, null=True)),
+                ('end_time', models.DateTimeField(blank=True, null=True)),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='erp_mes.erpmessnapshot')),
+            ],
+            options={
+                'ordering': ['snapshot', 'start_time', 'batch_id'],
+                'indexes': [models.Index(fields=['snapshot', 'batch_id'], name='erp_mes_pro_snapsho_e45305_idx'), models.Index(fields=['batch_id', 'snapshot'], name='erp_mes_pro_batch_i_18f7fe_idx'), models.Index(fields=['snapshot', 'work_order_id'], name='erp_mes_pro_snapsho_20e530_idx'), models.Index(fields=['snapshot', 'line_id', 'start_time'], name='erp_mes_pro_snapsho_b600ae_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='QualityCheck',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('check_id', models.CharField(max_length=64)),
+                ('batch_id', models.CharField(blank=True, max_length=64)),
+                ('product_id', models.CharField(blank=True, max_length=64)),
+                ('checkpoint', models.CharField(blank=True, max_length=128)),
+                ('result', models.CharField(blank=True, max_length=16)),
+                ('defect_code', models.CharField(blank=True, max_length=64)),
+                ('timestamp', models.DateTimeField(blank=True, null=True)),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='erp_mes.erpmessnapshot')),
+            ],
+            options={
+                'ordering': ['snapshot', 'timestamp', 'check_id'],
+                'indexes': [models.Index(fields=['snapshot', 'check_id'], name='erp_mes_qua_snapsho_6b7706_idx'), models.Index(fields=['snapshot', 'batch_id'], name='erp_mes_qua_snapsho_13e5bb_idx'), models.Index(fields=['snapshot', 'result'], name='erp_mes_qua_snapsho_77eedc_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='WorkOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('order_id', models.CharField(max_length=64)),
+                ('product_id', models.CharField(blank=True, max_length=64)),
+                ('status', models.CharField(blank=True, max_length=32)),
+                ('priority', models.CharField(blank=True, max_length=16)),
+                ('line_id', models.CharField(blank=True, max_length=32)),
+                ('quantity', models.IntegerField(blank=True, null=True)),
+                ('quantity_completed', models.IntegerField(blank=True, null=True)),
+                ('start_date', models.DateField(blank=True, null=True)),
+                ('due_date', models.DateField(blank=True, null=True)),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='erp_mes.erpmessnapshot')),
+            ],
+            options={
+                'ordering': ['snapshot', 'order_id'],
+                'indexes': [models.Index(fields=['snapshot', 'order_id'], name='erp_mes_wor_snapsho_cd68de_idx'), models.Index(fields=['order_id', 'snapshot'], name='erp_mes_wor_order_i_fee5a7_idx'), models.Index(fields=['snapshot', 'status'], name='erp_mes_wor_snapsho_c831aa_idx'), models.Index(fields=['snapshot', 'line_id'], name='erp_mes_wor_snapsho_872969_idx')],
+            },
+        ),
+    ]
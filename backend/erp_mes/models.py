@@ -18,6 +18,9 @@ class ErpMesSnapshot(models.Model):
     # [{ "name": "work_orders.json", "size": 12345 }, ...]
     files = models.JSONField(default=list, blank=True)
 
+    # Kiedy rekordy snapshotu zostały załadowane do tabel relacyjnych (WorkOrder, ProductionBatch, ...)
+    records_ingested_at = models.DateTimeField(null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -32,6 +35,14 @@ class ErpMesSnapshot(models.Model):
             return 0
         return len(self.files)
 
+    def get_previous(self) -> "ErpMesSnapshot | None":
+        """Poprzedni snapshot tego samego streamu (punkt odniesienia dla diffu)."""
+        return (
+            ErpMesSnapshot.objects.filter(stream=self.stream, version_date__lt=self.version_date)
+            .order_by("-version_date")
+            .first()
+        )
+
     def __str__(self) -> str:
         return f"{self.get_stream_display()} {self.version_date}"   # type: ignore
 
@@ -64,4 +75,181 @@ class SnapshotSyncLog(models.Model):
     error_message = models.TextField(blank=True)
 
     def __str__(self) -> str:
-        return f"{self.stream.upper()} {self.version_date} [{self.status}]"
\ No newline at end of file
+        return f"{self.stream.upper()} {self.version_date} [{self.status}]"
+
+class SnapshotKpi(models.Model):
+    """
+    Prekomputowane KPI snapshotu MES (liczone raz po syncu snapshotu).
+    Jeden wiersz = jeden przekrój (linia / produkt / zmiana / przyczyna przestoju / total).
+    """
+    DIM_TOTAL = "total"
+    DIM_LINE = "line"
+    DIM_PRODUCT = "product"
+    DIM_SHIFT = "shift"
+    DIM_DOWNTIME_CAUSE = "downtime_cause"
+
+    DIMENSION_CHOICES = [
+        (DIM_TOTAL, "Total"),
+        (DIM_LINE, "Line"),
+        (DIM_PRODUCT, "Product"),
+        (DIM_SHIFT, "Shift"),
+        (DIM_DOWNTIME_CAUSE, "Downtime cause"),
+    ]
+
+    snapshot = models.ForeignKey(
+        ErpMesSnapshot,
+        on_delete=models.CASCADE,
+        related_name="kpis",
+    )
+    dimension = models.CharField(max_length=16, choices=DIMENSION_CHOICES)
+    key = models.CharField(max_length=100)
+
+    # np. {"yield": 0.96, "scrap_rate": 0.04, "downtime_min": 135, "oee": 0.81, ...}
+    metrics = models.JSONField(default=dict, blank=True)
+
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("snapshot", "dimension", "key")
+        ordering = ["snapshot", "dimension", "key"]
+
+    def __str__(self) -> str:
+        return f"{self.snapshot} {self.dimension}={self.key}"
+
+
+# --- Rekordy snapshotów w tabelach relacyjnych (ingestia z plików JSON mocka) ---
+
+class SnapshotRecord(models.Model):
+    """
+    Baza dla rekordów snapshotu: powiązanie ze snapshotem + pełny rekord źródłowy (data).
+    Kolumny w klasach potomnych to pola, po których filtrujemy / łączymy (indeksowane).
+    FILTER_FIELDS – pola dozwolone jako filtry w API (?status=completed&line_id=LINE-1).
+    """
+    FILTER_FIELDS: tuple[str, ...] = ()
+
+    snapshot = models.ForeignKey(ErpMesSnapshot, on_delete=models.CASCADE, related_name="+")
+    data = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        abstract = True
+
+
+class WorkOrder(SnapshotRecord):
+    FILTER_FIELDS = ("order_id", "product_id", "status", "priority", "line_id")
+
+    order_id = models.CharField(max_length=64)
+    product_id = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=32, blank=True)
+    priority = models.CharField(max_length=16, blank=True)
+    line_id = models.CharField(max_length=32, blank=True)
+    quantity = models.IntegerField(null=True, blank=True)
+    quantity_completed = models.IntegerField(null=True, blank=True)
+    start_date = models.DateField(null=True, blank=True)
+    due_date = models.DateField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["snapshot", "order_id"]
+        indexes = [
+            models.Index(fields=["snapshot", "order_id"]),
+            models.Index(fields=["order_id", "snapshot"]),
+            models.Index(fields=["snapshot", "status"]),
+            models.Index(fields=["snapshot", "line_id"]),
+        ]
+
+
+class BomComponent(SnapshotRecord):
+    FILTER_FIELDS = ("product_id", "bom_version", "component_id", "supplier")
+
+    product_id = models.CharField(max_length=64)
+    bom_version = models.CharField(max_length=16, blank=True)
+    component_id = models.CharField(max_length=64)
+    supplier = models.CharField(max_length=128, blank=True)
+    quantity_per = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["snapshot", "product_id", "bom_version", "component_id"]
+        indexes = [
+            models.Index(fields=["snapshot", "product_id", "bom_version"]),
+            models.Index(fields=["component_id", "snapshot"]),
+        ]
+
+
+class Machine(SnapshotRecord):
+    FILTER_FIELDS = ("machine_id", "line_id", "type", "status")
+
+    machine_id = models.CharField(max_length=64)
+    line_id = models.CharField(max_length=32, blank=True)
+    type = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=32, blank=True)
+
+    class Meta:
+        ordering = ["snapshot", "machine_id"]
+        indexes = [
+            models.Index(fields=["snapshot", "machine_id"]),
+            models.Index(fields=["machine_id", "snapshot"]),
+        ]
+
+
+class ProductionBatch(SnapshotRecord):
+    FILTER_FIELDS = ("batch_id", "work_order_id", "product_id", "line_id", "status")
+
+    batch_id = models.CharField(max_length=64)
+    work_order_id = models.CharField(max_length=64, blank=True)
+    product_id = models.CharField(max_length=64, blank=True)
+    line_id = models.CharField(max_length=32, blank=True)
+    status = models.CharField(max_length=32, blank=True)
+    quantity_planned = models.IntegerField(null=True, blank=True)
+    quantity_good = models.IntegerField(null=True, blank=True)
+    quantity_reject = models.IntegerField(null=True, blank=True)
+    start_time = models.DateTimeField(null=True, blank=True)
+    end_time = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["snapshot", "start_time", "batch_id"]
+        indexes = [
+            models.Index(fields=["snapshot", "batch_id"]),
+            models.Index(fields=["batch_id", "snapshot"]),
+            models.Index(fields=["snapshot", "work_order_id"]),
+            models.Index(fields=["snapshot", "line_id", "start_time"]),
+        ]
+
+
+class QualityCheck(SnapshotRecord):
+    FILTER_FIELDS = ("check_id", "batch_id", "product_id", "result", "defect_code")
+
+    check_id = models.CharField(max_length=64)
+    batch_id = models.CharField(max_length=64, blank=True)
+    product_id = models.CharField(max_length=64, blank=True)
+    checkpoint = models.CharField(max_length=128, blank=True)
+    result = models.CharField(max_length=16, blank=True)
+    defect_code = models.CharField(max_length=64, blank=True)
+    timestamp = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["snapshot", "timestamp", "check_id"]
+        indexes = [
+            models.Index(fields=["snapshot", "check_id"]),
+            models.Index(fields=["snapshot", "batch_id"]),
+            models.Index(fields=["snapshot", "result"]),
+        ]
+
+
+class DowntimeEvent(SnapshotRecord):
+    FILTER_FIELDS = ("event_id", "machine_id", "line_id", "type", "reason_code")
+
+    event_id = models.CharField(max_length=64)
+    machine_id = models.CharField(max_length=64, blank=True)
+    line_id = models.CharField(max_length=32, blank=True)
+    type = models.CharField(max_length=16, blank=True)
+    reason_code = models.CharField(max_length=64, blank=True)
+    duration_min = models.FloatField(null=True, blank=True)
+    start_time = models.DateTimeField(null=True, blank=True)
+    end_time = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["snapshot", "start_time", "event_id"]
+        indexes = [
+            models.Index(fields=["snapshot", "event_id"]),
+            models.Index(fields=["snapshot", "line_id", "start_time"]),
+            models.Index(fields=["snapshot", "reason_code"]),
+        ]
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import ErpMesSnapshot
+from .models import ErpMesSnapshot, SnapshotKpi
 
 
 class SnapshotFileSerializer(serializers.Serializer):
@@ -38,4 +38,29 @@ class ErpMesSnapshotListSerializer(serializers.ModelSerializer):
         )
         
     def get_files_count(self, obj) -> int:
-        return obj.files_count
\ No newline at end of file
+        return obj.files_count
+
+
+class SnapshotKpiSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SnapshotKpi
+        fields = (
+            "dimension",
+            "key",
+            "metrics",
+            "computed_at",
+        )
+
+
+class SnapshotRecordSerializer(serializers.Serializer):
+    """
+    Rekord z tabel relacyjnych snapshotu (WorkOrder, ProductionBatch, ...):
+    oryginalny rekord z pliku + stream/version_date snapshotu.
+    """
+
+    def to_representation(self, instance):
+        return {
+            "stream": instance.snapshot.stream,
+            "version_date": instance.snapshot.version_date.isoformat(),
+            **(instance.data or {}),
+        }
@@ -1,14 +1,48 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import logging
-from typing import Any, Dict, List, Optional
+import os
+import tarfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
 
+import numpy as np
 import requests
+import urllib3
+from opentelemetry.trace import SpanKind
+from urllib3.util import make_headers
 from django.conf import settings
 from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from proscientia.metrics import MOCK_REQUEST_SECONDS, cache_lookup
+from proscientia.renderers import fast_loads
+from proscientia.tracing import inject_headers, span
+
+from .models import (
+    ErpMesSnapshot,
+    SnapshotKpi,
+    WorkOrder,
+    BomComponent,
+    Machine,
+    ProductionBatch,
+    QualityCheck,
+    DowntimeEvent,
+)
 
 logger = logging.getLogger(__name__)
 
+# gzip/deflate (+ br/zstd, jeśli zainstalowane są odpowiednie pakiety) – requests dekoduje odpowiedź sam
+ACCEPT_ENCODING = make_headers(accept_encoding=True)["accept-encoding"]
+
 
 class MockErpMesClient:
     def __init__(self, base_url: Optional[str] = None, timeout: float = 10.0) -> None:
@@ -17,9 +51,30 @@ class MockErpMesClient:
             raise ValueError("MOCK_API_BASE must be configured in settings/.env")
         self.timeout = timeout
 
-    def _get(self, path: str, params: Optional[Dict[str, Any]] = None) -> requests.Response:
+    def _get(
+        self,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        stream: bool = False,
+    ) -> requests.Response:
         url = f"{self.base_url}{path}"
-        resp = requests.get(url, params=params, timeout=self.timeout)
+        started = time.perf_counter()
+        status = "error"
+        try:
+            with span(f"mock GET {path}", SpanKind.CLIENT, **{"url.full": url}) as current:
+                resp = requests.get(
+                    url,
+                    params=params,
+                    headers=inject_headers({"Accept-Encoding": ACCEPT_ENCODING, **(headers or {})}),
+                    timeout=self.timeout,
+                    stream=stream,
+                )
+                status = str(resp.status_code)
+                current.set_attribute("http.response.status_code", resp.status_code)
+        finally:
+            # przy stream=True to czas do nagłówków odpowiedzi, bez pobierania treści
+            MOCK_REQUEST_SECONDS.labels(path, status).observe(time.perf_counter() - started)
         resp.raise_for_status()
         return resp
 
@@ -30,11 +85,12 @@ class MockErpMesClient:
 
         if use_cache:
             cached = cache.get(cache_key)
+            cache_lookup("mock_api", cached is not None)
             if cached is not None:
                 return cached
 
         resp = self._get("/manifest")
-        data = resp.json()
+        data = fast_loads(resp.content)
 
         cache.set(cache_key, data, timeout=900)  # 15 minut
         return data
@@ -54,6 +110,7 @@ class MockErpMesClient:
         cache_key = f"mock:{stream}:listing:{date or 'latest'}"
         if use_cache:
             cached = cache.get(cache_key)
+            cache_lookup("mock_api", cached is not None)
             if cached is not None:
                 return cached
 
@@ -63,13 +120,39 @@ class MockErpMesClient:
 
         path = f"/{stream}"
         resp = self._get(path, params=params)
-        data = resp.json()
+        data = fast_loads(resp.content)
+
+        cache.set(cache_key, data, timeout=300)
+        return data
+
+    # --- Dokumenty (data/docs) ---
+
+    def list_docs(self, use_cache: bool = True) -> Dict[str, Any]:
+        """{ "files": [ { name, size }, ... ] } – ścieżki względne w data/docs."""
+        cache_key = "mock:docs:listing"
+        if use_cache:
+            cached = cache.get(cache_key)
+            cache_lookup("mock_api", cached is not None)
+            if cached is not None:
+                return cached
+
+        resp = self._get("/files/docs-list")
+        data = fast_loads(resp.content)
 
         cache.set(cache_key, data, timeout=300)
         return data
 
     # --- Files (JSON / PDF / inne) ---
 
+    @staticmethod
+    def _file_params(stream: str, name: str, date: Optional[str]) -> Dict[str, Any]:
+        params: Dict[str, Any] = {"stream": stream, "name": name}
+        if stream in ("erp", "mes"):
+            if not date:
+                raise ValueError("date is required for erp/mes file")
+            params["date"] = date
+        return params
+
     def get_file_bytes(
         self,
         stream: str,
@@ -81,12 +164,989 @@ class MockErpMesClient:
         STREAM:
           - "docs" -> pliki z data/docs/
           - "erp" / "mes" -> pliki dla danego snapshotu (wymaga date)
+        Pliki tekstowe (JSON) przychodzą skompresowane (gzip/br) – resp.content jest już zdekodowane.
         """
-        params: Dict[str, Any] = {"stream": stream, "name": name}
-        if stream in ("erp", "mes"):
-            if not date:
-                raise ValueError("date is required for erp/mes file")
+        resp = self._get("/files", params=self._file_params(stream, name, date))
+        return resp.content
+
+    def get_file_range(
+        self,
+        stream: str,
+        name: str,
+        date: Optional[str] = None,
+        start: int = 0,
+        max_bytes: int = 64 * 1024,
+    ) -> bytes:
+        """
+        Pobiera fragment pliku (nagłówek Range, odpowiedź 206) – np. pierwsze N KB dużego JSON-a
+        do podglądu. Zakres dotyczy bajtów oryginalnego pliku (bez kompresji).
+        Jeśli serwer zignoruje Range (200), przycinamy odpowiedź lokalnie; start za końcem pliku -> b"".
+        """
+        if max_bytes <= 0:
+            return b""
+        try:
+            resp = self._get(
+                "/files",
+                params=self._file_params(stream, name, date),
+                headers={"Range": f"bytes={start}-{start + max_bytes - 1}"},
+            )
+        except requests.HTTPError as exc:
+            # 416 – początek zakresu za końcem pliku
+            if exc.response is not None and exc.response.status_code == 416:
+                return b""
+            raise
+        if resp.status_code == 206:
+            return resp.content
+        return resp.content[start:start + max_bytes]
+
+    # --- Bundle snapshotu (jeden tar zamiast N zapytań /files) ---
+
+    def iter_snapshot_bundle(
+        self,
+        stream: str,
+        date: Optional[str] = None,
+        names: Optional[List[str]] = None,
+    ) -> Iterator[tuple[str, bytes]]:
+        """
+        Strumieniowo czyta /{stream}/bundle (tar, zwykle gzip) i zwraca kolejne (nazwa_pliku, bajty).
+        Archiwum nie jest buforowane w całości – w pamięci jest naraz tylko jeden plik.
+        """
+        if stream not in ("erp", "mes"):
+            raise ValueError(f"Invalid stream: {stream}")
+
+        params: Dict[str, Any] = {}
+        if date:
             params["date"] = date
+        if names:
+            params["names"] = ",".join(names)
 
-        resp = self._get("/files", params=params)
-        return resp.content
+        with self._get(f"/{stream}/bundle", params=params, stream=True) as resp:
+            resp.raw.decode_content = True  # gzip dekodowany w locie przez urllib3
+            with tarfile.open(fileobj=resp.raw, mode="r|") as tar:
+                for member in tar:
+                    if not member.isfile():
+                        continue
+                    f = tar.extractfile(member)
+                    if f is not None:
+                        yield member.name, f.read()
+
+    def get_snapshot_bundle(
+        self,
+        stream: str,
+        date: Optional[str] = None,
+        names: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """Cały snapshot jednym żądaniem: { nazwa_pliku: sparsowany JSON (albo bajty dla innych plików) }."""
+        return {
+            name: fast_loads(content) if name.endswith(".json") else content
+            for name, content in self.iter_snapshot_bundle(stream, date, names)
+        }
+
+
+# --- Diff snapshotów ERP/MES ---
+
+# Klucze rekordów per zbiór danych (nazwa pliku bez .json, po normalizacji).
+RECORD_KEY_FIELDS: Dict[str, tuple[str, ...]] = {
+    "work_orders": ("id",),
+    "bom": ("product_id", "version"),
+    "routing": ("product_id", "version"),
+    "machines": ("machine_id",),
+    "maintenance_plans": ("plan_id",),
+    "production_batches": ("batch_id",),
+    "quality_checks": ("check_id",),
+    "downtime_log": ("event_id",),
+    "shift_log": ("shift_id",),
+}
+
+# Literówki w nazwach plików mocka (maintence_plan.json, shfit_log.json itd.)
+DATASET_ALIASES: Dict[str, str] = {
+    "maintence_plan": "maintenance_plans",
+    "maintence_plans": "maintenance_plans",
+    "maintenance_plan": "maintenance_plans",
+    "shfit_log": "shift_log",
+}
+
+
+def normalize_dataset_name(filename: str) -> str:
+    """'maintence_plan.json' -> 'maintenance_plans'."""
+    stem = filename.rsplit("/", 1)[-1]
+    if stem.endswith(".json"):
+        stem = stem[: -len(".json")]
+    return DATASET_ALIASES.get(stem, stem)
+
+
+def resolve_key_fields(dataset: str, records: List[Dict[str, Any]]) -> tuple[str, ...]:
+    """
+    Klucz rekordów dla zbioru: skonfigurowany w RECORD_KEY_FIELDS (jeśli występuje
+    we wszystkich rekordach), w przeciwnym razie pierwsze pole "id"/"*_id"
+    unikalne w obrębie zbioru.
+    """
+    configured = RECORD_KEY_FIELDS.get(dataset)
+    if configured and all(all(f in r for f in configured) for r in records):
+        return configured
+
+    if not records:
+        return configured or ()
+
+    candidates = ["id"] + sorted(k for k in records[0] if k.endswith("_id"))
+    for field in candidates:
+        values = [r.get(field) for r in records]
+        if None not in values and len(set(map(str, values))) == len(values):
+            return (field,)
+    return ()
+
+
+def _record_key(record: Dict[str, Any], key_fields: tuple[str, ...]) -> str:
+    return "|".join(str(record.get(f)) for f in key_fields)
+
+
+def diff_records(
+    old: List[Dict[str, Any]],
+    new: List[Dict[str, Any]],
+    key_fields: tuple[str, ...],
+) -> Dict[str, Any]:
+    """
+    Diff dwóch list rekordów po kluczu:
+      added   – rekordy tylko w new,
+      removed – rekordy tylko w old,
+      changed – [{ "key": ..., "changes": { pole: {"old": x, "new": y} } }].
+    Bez klucza (key_fields puste) porównujemy rekordy jako całość.
+    """
+    if not key_fields:
+        old_set = {json.dumps(r, sort_keys=True, ensure_ascii=False) for r in old}
+        new_set = {json.dumps(r, sort_keys=True, ensure_ascii=False) for r in new}
+        return {
+            "key_fields": [],
+            "added": [json.loads(r) for r in sorted(new_set - old_set)],
+            "removed": [json.loads(r) for r in sorted(old_set - new_set)],
+            "changed": [],
+            "unchanged": len(old_set & new_set),
+        }
+
+    old_by_key = {_record_key(r, key_fields): r for r in old}
+    new_by_key = {_record_key(r, key_fields): r for r in new}
+
+    added = [new_by_key[k] for k in new_by_key if k not in old_by_key]
+    removed = [old_by_key[k] for k in old_by_key if k not in new_by_key]
+
+    changed = []
+    unchanged = 0
+    for key, new_rec in new_by_key.items():
+        old_rec = old_by_key.get(key)
+        if old_rec is None:
+            continue
+        changes = {
+            field: {"old": old_rec.get(field), "new": new_rec.get(field)}
+            for field in sorted(set(old_rec) | set(new_rec))
+            if old_rec.get(field) != new_rec.get(field)
+        }
+        if changes:
+            changed.append({"key": key, "changes": changes})
+        else:
+            unchanged += 1
+
+    return {
+        "key_fields": list(key_fields),
+        "added": added,
+        "removed": removed,
+        "changed": changed,
+        "unchanged": unchanged,
+    }
+
+
+def _as_records(data: Any) -> List[Dict[str, Any]]:
+    """Plik snapshotu -> lista rekordów (lista dictów albo dict z jedną listą)."""
+    if isinstance(data, list):
+        return [r for r in data if isinstance(r, dict)]
+    if isinstance(data, dict):
+        lists = [v for v in data.values() if isinstance(v, list)]
+        if len(lists) == 1:
+            return [r for r in lists[0] if isinstance(r, dict)]
+        return [data]
+    return []
+
+
+class SnapshotLoadError(RuntimeError):
+    """Nie udało się pobrać / sparsować części plików snapshotu (load_snapshot_records(strict=True))."""
+
+    def __init__(self, stream: str, date: str, failed: Dict[str, str]) -> None:
+        self.failed = failed
+        super().__init__(f"Cannot load {len(failed)} file(s) of {stream}/{date}: {', '.join(sorted(failed))}")
+
+
+def load_snapshot_records(
+    client: MockErpMesClient,
+    stream: str,
+    date: str,
+    files: List[Dict[str, Any]],
+    strict: bool = False,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Pobiera wszystkie pliki JSON snapshotu (przez lokalny cache) -> { dataset: [rekordy] }.
+    Brakujące w cache pliki ściągamy jednym bundlem (prefetch_snapshot_files).
+    Plik, którego nie da się pobrać, jest pomijany (diff, raport); strict=True (ingestia) – po próbie
+    wszystkich plików leci SnapshotLoadError, żeby niepełny snapshot nie został oznaczony jako załadowany.
+    """
+    names = [f.get("name", "") for f in files or [] if f.get("name", "").endswith(".json")]
+    prefetched = prefetch_snapshot_files(stream, date, names, client=client)
+
+    datasets: Dict[str, List[Dict[str, Any]]] = {}
+    failed: Dict[str, str] = {}
+    for name in names:
+        try:
+            if name in prefetched:
+                data = prefetched[name]
+            else:
+                data, _, _ = get_snapshot_json(stream, date, name, client=client)
+        except Exception as exc:
+            logger.warning("Cannot load %s/%s/%s: %s", stream, date, name, exc)
+            failed[name] = str(exc)
+            continue
+        datasets.setdefault(normalize_dataset_name(name), []).extend(_as_records(data))
+    if strict and failed:
+        raise SnapshotLoadError(stream, date, failed)
+    return datasets
+
+
+def diff_snapshot_records(
+    old: Dict[str, List[Dict[str, Any]]],
+    new: Dict[str, List[Dict[str, Any]]],
+) -> Dict[str, Dict[str, Any]]:
+    """Diff dwóch snapshotów (wynik load_snapshot_records) per zbiór danych."""
+    result: Dict[str, Dict[str, Any]] = {}
+    for dataset in sorted(set(old) | set(new)):
+        old_records = old.get(dataset, [])
+        new_records = new.get(dataset, [])
+        key_fields = resolve_key_fields(dataset, new_records or old_records)
+        diff = diff_records(old_records, new_records, key_fields)
+        diff["count_old"] = len(old_records)
+        diff["count_new"] = len(new_records)
+        result[dataset] = diff
+    return result
+
+
+def diff_snapshots(
+    stream: str,
+    old_snapshot,
+    new_snapshot,
+    client: Optional[MockErpMesClient] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Diff dwóch ErpMesSnapshot tego samego streamu.
+    old_snapshot może być None (pierwszy snapshot -> wszystko jako "added").
+    """
+    client = client or MockErpMesClient()
+    new_records = load_snapshot_records(
+        client, stream, new_snapshot.version_date.isoformat(), new_snapshot.files
+    )
+    old_records: Dict[str, List[Dict[str, Any]]] = {}
+    if old_snapshot is not None:
+        old_records = load_snapshot_records(
+            client, stream, old_snapshot.version_date.isoformat(), old_snapshot.files
+        )
+    return diff_snapshot_records(old_records, new_records)
+
+
+def summarize_snapshot_diff(diff: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, int]]:
+    """Same liczniki (bez rekordów) – do metadata artefaktu i odpowiedzi API."""
+    return {
+        dataset: {
+            "count_old": d["count_old"],
+            "count_new": d["count_new"],
+            "added": len(d["added"]),
+            "removed": len(d["removed"]),
+            "changed": len(d["changed"]),
+            "unchanged": d["unchanged"],
+        }
+        for dataset, d in diff.items()
+    }
+
+
+def snapshot_aggregates(records: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Proste agregaty całego snapshotu: liczba rekordów per zbiór
+    i rozkład pola "status" / "result" / "type" (jeśli występuje).
+    """
+    result: Dict[str, Dict[str, Any]] = {}
+    for dataset, items in records.items():
+        agg: Dict[str, Any] = {"records": len(items)}
+        for field in ("status", "result", "type"):
+            values = [r.get(field) for r in items if r.get(field) is not None]
+            if values and all(isinstance(v, str) for v in values):
+                counts: Dict[str, int] = {}
+                for v in values:
+                    counts[v] = counts.get(v, 0) + 1
+                agg[field] = counts
+        result[dataset] = agg
+    return result
+
+
+def render_snapshot_diff(
+    diff: Dict[str, Dict[str, Any]],
+    max_records_per_section: int = 20,
+) -> str:
+    """
+    Tekstowa (kompaktowa) reprezentacja diffu dla LLM:
+    liczniki per zbiór + rekordy dodane/usunięte/zmienione (do limitu per sekcja).
+    """
+    def dump(obj: Any) -> str:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str)
+
+    lines: List[str] = []
+    for dataset, d in diff.items():
+        lines.append(
+            f"## {dataset} (klucz: {', '.join(d['key_fields']) or '-'}): "
+            f"{d['count_old']} -> {d['count_new']} rekordów; "
+            f"+{len(d['added'])} / -{len(d['removed'])} / ~{len(d['changed'])}"
+        )
+        for label, items in (("DODANE", d["added"]), ("USUNIĘTE", d["removed"]), ("ZMIENIONE", d["changed"])):
+            if not items:
+                continue
+            lines.append(f"{label}:")
+            for item in items[:max_records_per_section]:
+                lines.append(dump(item))
+            if len(items) > max_records_per_section:
+                lines.append(f"... oraz {len(items) - max_records_per_section} kolejnych")
+    return "\n".join(lines)
+
+
+# --- KPI snapshotów MES (liczone raz po syncu, zapisywane w SnapshotKpi) ---
+
+def _column(records: List[Dict[str, Any]], field: str, default: Any = "") -> List[Any]:
+    return [r.get(field) if r.get(field) is not None else default for r in records]
+
+
+def _numeric(records: List[Dict[str, Any]], field: str) -> np.ndarray:
+    return np.asarray(
+        [r.get(field) if isinstance(r.get(field), (int, float)) else 0 for r in records],
+        dtype=float,
+    )
+
+
+def _minutes_between(records: List[Dict[str, Any]], start: str = "start_time", end: str = "end_time") -> np.ndarray:
+    """Czas trwania w minutach (NaT -> 0) – wektorowo przez datetime64."""
+    if not records:
+        return np.zeros(0)
+    starts = np.asarray([r.get(start) or "NaT" for r in records], dtype="datetime64[s]")
+    ends = np.asarray([r.get(end) or "NaT" for r in records], dtype="datetime64[s]")
+    minutes = (ends - starts) / np.timedelta64(1, "m")
+    return np.nan_to_num(minutes.astype(float), nan=0.0).clip(min=0)
+
+
+def _group_sum(keys: List[Any], columns: Dict[str, np.ndarray]) -> Dict[str, Dict[str, float]]:
+    """Group-by + sum (np.unique + np.bincount) -> { klucz: { kolumna: suma } }."""
+    if not keys:
+        return {}
+    labels, inverse = np.unique(np.asarray([str(k) for k in keys]), return_inverse=True)
+    sums = {
+        name: np.bincount(inverse, weights=col, minlength=len(labels))
+        for name, col in columns.items()
+    }
+    return {
+        str(label): {name: float(values[i]) for name, values in sums.items()}
+        for i, label in enumerate(labels)
+    }
+
+
+def _ratio(num: float | None, den: float | None) -> float | None:
+    if num is None or not den:
+        return None
+    return round(num / den, 4)
+
+
+def _shift_code_from_time(timestamps: List[Any]) -> List[str]:
+    """Zmiana wg godziny startu: A 06-14, B 14-22, C 22-06."""
+    codes = []
+    for ts in timestamps:
+        try:
+            hour = int(str(ts)[11:13])
+        except ValueError:
+            codes.append("?")
+            continue
+        codes.append("A" if 6 <= hour < 14 else "B" if 14 <= hour < 22 else "C")
+    return codes
+
+
+def _assign_shifts(records: List[Dict[str, Any]], shifts: List[Dict[str, Any]], time_field: str) -> List[str]:
+    """
+    Przypisuje rekord do zmiany wg godziny startu (_shift_code_from_time). shift_log nie ma godzin
+    zmian, więc służy tylko do sprawdzenia wyniku: jeśli linia miała tego dnia zapisaną dokładnie
+    jedną zmianę, a wyliczona jest inna (np. przedłużona zmiana A w pilotażu) – bierzemy zapisaną.
+    Przy kilku zmianach dziennie (A/B/C) zostaje zmiana z godziny startu.
+    """
+    logged: Dict[tuple, set] = {}
+    for s in shifts:
+        if s.get("shift_code"):
+            logged.setdefault((s.get("line_id"), str(s.get("date") or "")), set()).add(s.get("shift_code"))
+
+    timestamps = _column(records, time_field)
+    codes = _shift_code_from_time(timestamps)
+    for i, r in enumerate(records):
+        ts = str(timestamps[i] or "")
+        day = ts[:10]
+        if codes[i] == "C" and ts[11:13] < "06":
+            # zmiana C po północy należy do dnia, w którym się zaczęła
+            try:
+                day = (parse_date(day) - timedelta(days=1)).isoformat()      # type: ignore[operator]
+            except (TypeError, ValueError):
+                pass
+        on_shift = logged.get((r.get("line_id"), day))
+        if on_shift and codes[i] not in on_shift and len(on_shift) == 1:
+            codes[i] = next(iter(on_shift))
+    return codes
+
+
+def ideal_cycle_times(routing: List[Dict[str, Any]]) -> Dict[str, float]:
+    """
+    Idealny czas cyklu per produkt (min/szt.) z ERP routing:
+    najdłuższa operacja (wąskie gardło) najnowszej wersji routingu.
+    """
+    latest: Dict[str, Dict[str, Any]] = {}
+    for r in routing:
+        product = r.get("product_id")
+        if product and str(r.get("valid_from") or "") >= str(latest.get(product, {}).get("valid_from") or ""):
+            latest[product] = r
+    return {
+        product: float(max((op.get("std_time_min") or 0) for op in r.get("operations") or [{}]))
+        for product, r in latest.items()
+    }
+
+
+def compute_mes_kpis(
+    records: Dict[str, List[Dict[str, Any]]],
+    routing: Optional[List[Dict[str, Any]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Liczy KPI snapshotu MES (wynik load_snapshot_records) per linia / produkt / zmiana
+    oraz przestoje per przyczyna:
+      - yield, scrap_rate (z production_batches),
+      - first_pass_rate (z quality_checks),
+      - downtime_min (planned/unplanned, per reason_code),
+      - składowe OEE: availability, performance (wymaga ERP routing), quality, oee.
+    Zwraca listę { "dimension", "key", "metrics" } gotową do zapisu w SnapshotKpi.
+    """
+    batches = records.get("production_batches", [])
+    checks = records.get("quality_checks", [])
+    downtime = records.get("downtime_log", [])
+    shifts = records.get("shift_log", [])
+
+    cycle = ideal_cycle_times(routing or [])
+    batch_products = _column(batches, "product_id")
+    batch_cols = {
+        "batches": np.ones(len(batches)),
+        "quantity_planned": _numeric(batches, "quantity_planned"),
+        "quantity_good": _numeric(batches, "quantity_good"),
+        "quantity_reject": _numeric(batches, "quantity_reject"),
+        "run_time_min": _minutes_between(batches),
+        # idealny czas produkcji = szt. * czas cyklu wąskiego gardła
+        "ideal_time_min": (_numeric(batches, "quantity_good") + _numeric(batches, "quantity_reject"))
+        * np.asarray([cycle.get(p, np.nan) for p in batch_products], dtype=float),
+    }
+
+    check_results = np.asarray(_column(checks, "result"), dtype=object)
+    check_cols = {
+        "qc_checks": np.ones(len(checks)),
+        "qc_fail": (check_results == "fail").astype(float) if len(checks) else np.zeros(0),
+    }
+    # quality_checks nie mają line_id – bierzemy je z partii
+    batch_line = {b.get("batch_id"): b.get("line_id") for b in batches}
+    batch_shift = dict(zip((b.get("batch_id") for b in batches), _assign_shifts(batches, shifts, "start_time")))
+
+    dt_minutes = _numeric(downtime, "duration_min")
+    dt_minutes = np.where(dt_minutes > 0, dt_minutes, _minutes_between(downtime))
+    dt_unplanned = (np.asarray(_column(downtime, "type"), dtype=object) != "planned").astype(float)
+    dt_cols = {
+        "downtime_events": np.ones(len(downtime)),
+        "downtime_min": dt_minutes,
+        "downtime_unplanned_min": dt_minutes * dt_unplanned,
+        "downtime_planned_min": dt_minutes * (1 - dt_unplanned),
+    }
+
+    dimensions = {
+        SnapshotKpi.DIM_LINE: (
+            _column(batches, "line_id"),
+            [batch_line.get(c.get("batch_id"), "") for c in checks],
+            _column(downtime, "line_id"),
+        ),
+        SnapshotKpi.DIM_PRODUCT: (
+            batch_products,
+            _column(checks, "product_id"),
+            None,
+        ),
+        SnapshotKpi.DIM_SHIFT: (
+            [batch_shift[b.get("batch_id")] for b in batches],
+            [batch_shift.get(c.get("batch_id"), "?") for c in checks],
+            _assign_shifts(downtime, shifts, "start_time"),
+        ),
+        SnapshotKpi.DIM_TOTAL: (
+            ["all"] * len(batches),
+            ["all"] * len(checks),
+            ["all"] * len(downtime),
+        ),
+    }
+
+    rows: List[Dict[str, Any]] = []
+    for dimension, (batch_keys, check_keys, dt_keys) in dimensions.items():
+        groups: Dict[str, Dict[str, float]] = {}
+        for key, values in _group_sum(batch_keys, batch_cols).items():
+            groups.setdefault(key, {}).update(values)
+        for key, values in _group_sum(check_keys, check_cols).items():
+            groups.setdefault(key, {}).update(values)
+        if dt_keys is not None:
+            for key, values in _group_sum(dt_keys, dt_cols).items():
+                groups.setdefault(key, {}).update(values)
+
+        for key, m in groups.items():
+            rows.append({"dimension": dimension, "key": key or "-", "metrics": _finalize_kpis(m, dt_keys is not None)})
+
+    for cause, m in _group_sum(_column(downtime, "reason_code", "UNKNOWN"), dt_cols).items():
+        rows.append({"dimension": SnapshotKpi.DIM_DOWNTIME_CAUSE, "key": cause, "metrics": {
+            "downtime_events": int(m["downtime_events"]),
+            "downtime_min": round(m["downtime_min"], 1),
+            "downtime_unplanned_min": round(m["downtime_unplanned_min"], 1),
+        }})
+
+    return rows
+
+
+def _finalize_kpis(m: Dict[str, float], with_downtime: bool) -> Dict[str, Any]:
+    good = m.get("quantity_good", 0.0)
+    reject = m.get("quantity_reject", 0.0)
+    produced = good + reject
+    run_time = m.get("run_time_min", 0.0)
+    unplanned = m.get("downtime_unplanned_min", 0.0)
+    ideal = m.get("ideal_time_min", float("nan"))
+
+    availability = _ratio(run_time, run_time + unplanned) if with_downtime else None
+    performance = None if np.isnan(ideal) else min(_ratio(ideal, run_time) or 0.0, 1.0) if run_time else None
+    quality = _ratio(good, produced)
+    oee = (
+        round(availability * performance * quality, 4)
+        if None not in (availability, performance, quality)
+        else None
+    )
+
+    metrics: Dict[str, Any] = {
+        "batches": int(m.get("batches", 0)),
+        "quantity_planned": int(m.get("quantity_planned", 0)),
+        "quantity_good": int(good),
+        "quantity_reject": int(reject),
+        "yield": _ratio(good, produced),
+        "scrap_rate": _ratio(reject, produced),
+        "run_time_min": round(run_time, 1),
+        "qc_checks": int(m.get("qc_checks", 0)),
+        "qc_fail": int(m.get("qc_fail", 0)),
+        "first_pass_rate": _ratio(m.get("qc_checks", 0) - m.get("qc_fail", 0), m.get("qc_checks", 0)),
+        "availability": availability,
+        "performance": performance,
+        "quality": quality,
+        "oee": oee,
+    }
+    if with_downtime:
+        metrics.update({
+            "downtime_events": int(m.get("downtime_events", 0)),
+            "downtime_min": round(m.get("downtime_min", 0.0), 1),
+            "downtime_planned_min": round(m.get("downtime_planned_min", 0.0), 1),
+            "downtime_unplanned_min": round(unplanned, 1),
+        })
+    return metrics
+
+
+def compute_and_store_snapshot_kpis(
+    snapshot: ErpMesSnapshot,
+    client: Optional[MockErpMesClient] = None,
+    records: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+) -> int:
+    """
+    Pobiera pliki snapshotu MES (jednorazowo, o ile nie podano records),
+    liczy KPI i zapisuje je w SnapshotKpi.
+    Routing (do składowej performance) bierzemy z ERP snapshotu z tą samą datą
+    albo najnowszego wcześniejszego.
+    Zwraca liczbę zapisanych wierszy.
+    """
+    client = client or MockErpMesClient()
+    if records is None:
+        date_str = snapshot.version_date.isoformat()
+        records = load_snapshot_records(client, snapshot.stream, date_str, snapshot.files)
+
+    routing: List[Dict[str, Any]] = []
+    erp_snapshot = (
+        ErpMesSnapshot.objects.filter(stream=ErpMesSnapshot.STREAM_ERP, version_date__lte=snapshot.version_date)
+        .order_by("-version_date")
+        .first()
+    )
+    if erp_snapshot is not None:
+        routing_files = [f for f in erp_snapshot.files or [] if normalize_dataset_name(f.get("name", "")) == "routing"]
+        routing = load_snapshot_records(
+            client, erp_snapshot.stream, erp_snapshot.version_date.isoformat(), routing_files
+        ).get("routing", [])
+
+    rows = compute_mes_kpis(records, routing=routing)
+
+    with transaction.atomic():
+        SnapshotKpi.objects.filter(snapshot=snapshot).delete()
+        SnapshotKpi.objects.bulk_create(
+            SnapshotKpi(snapshot=snapshot, dimension=r["dimension"], key=r["key"][:100], metrics=r["metrics"])
+            for r in rows
+        )
+    return len(rows)
+
+
+def render_snapshot_kpis(kpis) -> str:
+    """KPI (SnapshotKpi albo dicty z compute_mes_kpis) jako zwarte linie tekstu dla LLM."""
+    lines = []
+    for k in kpis:
+        dimension = k["dimension"] if isinstance(k, dict) else k.dimension
+        key = k["key"] if isinstance(k, dict) else k.key
+        metrics = k["metrics"] if isinstance(k, dict) else k.metrics
+        values = " ".join(f"{name}={value}" for name, value in metrics.items() if value is not None)
+        lines.append(f"{dimension} {key}: {values}")
+    return "\n".join(lines)
+
+
+# --- Ingestia rekordów snapshotu do tabel relacyjnych ---
+
+def _str(value: Any, max_length: int) -> str:
+    return "" if value is None else str(value)[:max_length]
+
+
+def _int(value: Any) -> Optional[int]:
+    return int(value) if isinstance(value, (int, float)) else None
+
+
+def _float(value: Any) -> Optional[float]:
+    return float(value) if isinstance(value, (int, float)) else None
+
+
+def _date(value: Any):
+    return parse_date(str(value)[:10]) if value else None
+
+
+def _datetime(value: Any):
+    if not value:
+        return None
+    dt = parse_datetime(str(value))
+    if dt is not None and timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+    return dt
+
+
+def _work_order_rows(snapshot: ErpMesSnapshot, records: List[Dict[str, Any]]):
+    for r in records:
+        yield WorkOrder(
+            snapshot=snapshot, data=r,
+            order_id=_str(r.get("id") or r.get("work_order_id"), 64),
+            product_id=_str(r.get("product_id"), 64),
+            status=_str(r.get("status"), 32),
+            priority=_str(r.get("priority"), 16),
+            line_id=_str(r.get("line_id"), 32),
+            quantity=_int(r.get("quantity")),
+            quantity_completed=_int(r.get("quantity_completed")),
+            start_date=_date(r.get("start_date")),
+            due_date=_date(r.get("due_date")),
+        )
+
+
+def _bom_component_rows(snapshot: ErpMesSnapshot, records: List[Dict[str, Any]]):
+    # bom.json: jeden rekord = wersja BOM produktu z listą komponentów -> wiersz per komponent
+    for bom in records:
+        for c in bom.get("components") or []:
+            yield BomComponent(
+                snapshot=snapshot, data=c,
+                product_id=_str(bom.get("product_id"), 64),
+                bom_version=_str(bom.get("version"), 16),
+                component_id=_str(c.get("component_id"), 64),
+                supplier=_str(c.get("supplier"), 128),
+                quantity_per=_float(c.get("quantity_per")),
+            )
+
+
+def _machine_rows(snapshot: ErpMesSnapshot, records: List[Dict[str, Any]]):
+    for r in records:
+        yield Machine(
+            snapshot=snapshot, data=r,
+            machine_id=_str(r.get("machine_id"), 64),
+            line_id=_str(r.get("line_id"), 32),
+            type=_str(r.get("type"), 64),
+            status=_str(r.get("status"), 32),
+        )
+
+
+def _production_batch_rows(snapshot: ErpMesSnapshot, records: List[Dict[str, Any]]):
+    for r in records:
+        yield ProductionBatch(
+            snapshot=snapshot, data=r,
+            batch_id=_str(r.get("batch_id"), 64),
+            work_order_id=_str(r.get("work_order_id"), 64),
+            product_id=_str(r.get("product_id"), 64),
+            line_id=_str(r.get("line_id"), 32),
+            status=_str(r.get("status"), 32),
+            quantity_planned=_int(r.get("quantity_planned")),
+            quantity_good=_int(r.get("quantity_good")),
+            quantity_reject=_int(r.get("quantity_reject")),
+            start_time=_datetime(r.get("start_time")),
+            end_time=_datetime(r.get("end_time")),
+        )
+
+
+def _quality_check_rows(snapshot: ErpMesSnapshot, records: List[Dict[str, Any]]):
+    for r in records:
+        yield QualityCheck(
+            snapshot=snapshot, data=r,
+            check_id=_str(r.get("check_id"), 64),
+            batch_id=_str(r.get("batch_id"), 64),
+            product_id=_str(r.get("product_id"), 64),
+            checkpoint=_str(r.get("checkpoint"), 128),
+            result=_str(r.get("result"), 16),
+            defect_code=_str(r.get("defect_code"), 64),
+            timestamp=_datetime(r.get("timestamp")),
+        )
+
+
+def _downtime_event_rows(snapshot: ErpMesSnapshot, records: List[Dict[str, Any]]):
+    for r in records:
+        yield DowntimeEvent(
+            snapshot=snapshot, data=r,
+            event_id=_str(r.get("event_id"), 64),
+            machine_id=_str(r.get("machine_id"), 64),
+            line_id=_str(r.get("line_id"), 32),
+            type=_str(r.get("type"), 16),
+            reason_code=_str(r.get("reason_code"), 64),
+            duration_min=_float(r.get("duration_min")),
+            start_time=_datetime(r.get("start_time")),
+            end_time=_datetime(r.get("end_time")),
+        )
+
+
+# dataset (normalize_dataset_name) -> (model, builder wierszy)
+SNAPSHOT_RECORD_TABLES = {
+    "work_orders": (WorkOrder, _work_order_rows),
+    "bom": (BomComponent, _bom_component_rows),
+    "machines": (Machine, _machine_rows),
+    "production_batches": (ProductionBatch, _production_batch_rows),
+    "quality_checks": (QualityCheck, _quality_check_rows),
+    "downtime_log": (DowntimeEvent, _downtime_event_rows),
+}
+
+
+def ingest_snapshot_records(
+    snapshot: ErpMesSnapshot,
+    records: Dict[str, List[Dict[str, Any]]],
+    batch_size: int = 1000,
+) -> Dict[str, int]:
+    """
+    Ładuje rekordy snapshotu (wynik load_snapshot_records) do tabel relacyjnych.
+    Idempotentne: poprzednie wiersze tego snapshotu są usuwane w tej samej transakcji.
+    Zwraca { dataset: liczba_wierszy }.
+    """
+    counts: Dict[str, int] = {}
+    with transaction.atomic():
+        for dataset, (model, build_rows) in SNAPSHOT_RECORD_TABLES.items():
+            model.objects.filter(snapshot=snapshot).delete()
+            if dataset not in records:
+                continue
+            created = model.objects.bulk_create(build_rows(snapshot, records[dataset]), batch_size=batch_size)
+            counts[dataset] = len(created)
+
+        snapshot.records_ingested_at = timezone.now()
+        snapshot.save(update_fields=["records_ingested_at", "updated_at"])
+    return counts
+
+
+# --- Lokalny cache sparsowanych plików snapshotów ---
+
+class _ParsedFileLRU:
+    """
+    Mały LRU w pamięci procesu: (stream, date, filename) -> (etag, dane).
+
+    Limit liczymy w bajtach, nie w liczbie wpisów – pliki snapshotów mają od kilku KB do
+    dziesiątek MB. Rozmiar wpisu to rozmiar surowego JSON-a razy SIZE_FACTOR (sparsowane
+    dict/list/str w Pythonie zajmują kilka razy więcej niż tekst). Plik większy niż cały
+    budżet nie trafia do pamięci – zostaje tylko kopia na dysku.
+    """
+
+    SIZE_FACTOR = 4
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._items: "OrderedDict[tuple, tuple[str, Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[tuple[str, Any]]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            return item[0], item[1]
+
+    def set(self, key: tuple, value: tuple[str, Any], raw_size: int) -> None:
+        size = raw_size * self.SIZE_FACTOR
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[2]
+            if size > self.max_bytes:
+                return
+            self._items[key] = (value[0], value[1], size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.total_bytes -= evicted[2]
+
+    def discard(self, key: tuple) -> None:
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[2]
+
+
+_parsed_files = _ParsedFileLRU(settings.ERP_MES_FILE_CACHE_MAX_BYTES)
+
+
+def _snapshot_cache_path(stream: str, date: str, filename: str) -> Path:
+    return Path(settings.ERP_MES_FILE_CACHE_DIR) / stream / date / filename
+
+
+def is_safe_snapshot_filename(filename: str) -> bool:
+    """Nazwa pliku snapshotu trafia do ścieżki na dysku – bez separatorów i plików ukrytych."""
+    return bool(filename) and "/" not in filename and "\\" not in filename and not filename.startswith(".")
+
+
+def get_snapshot_json(
+    stream: str,
+    date: str,
+    filename: str,
+    client: Optional[MockErpMesClient] = None,
+) -> tuple[Any, str, bool]:
+    """
+    Zwraca (dane, etag, immutable) dla pliku JSON snapshotu.
+
+    Jeśli snapshot (stream, date) istnieje w DB, plik jest niezmienny:
+      1. LRU w pamięci procesu (sparsowany JSON),
+      2. kopia na dysku (ERP_MES_FILE_CACHE_DIR/stream/date/filename),
+      3. dopiero potem mock (wynik zapisujemy na dysk i do LRU).
+    Na dysk trafia tylko treść, która się sparsowała – ucięta / błędna odpowiedź nie zostaje
+    w cache niezmiennego snapshotu na zawsze (ValueError leci do wywołującego).
+    Dla snapshotów spoza DB zawsze pobieramy z mocka i nie cache'ujemy.
+    """
+    if not is_safe_snapshot_filename(filename):
+        raise ValueError("Invalid filename")
+
+    immutable = ErpMesSnapshot.objects.filter(stream=stream, version_date=parse_date(date)).exists()
+    key = (stream, date, filename)
+
+    if immutable:
+        cached = _parsed_files.get(key)
+        cache_lookup("snapshot_memory", cached is not None)
+        if cached is not None:
+            return cached[1], cached[0], True
+
+    path = _snapshot_cache_path(stream, date, filename)
+    on_disk = immutable and path.is_file()
+    if immutable:
+        cache_lookup("snapshot_disk", on_disk)
+    if on_disk:
+        content = path.read_bytes()
+        try:
+            data = fast_loads(content)
+        except ValueError:
+            # uszkodzona kopia (np. zapisana przed parsowaniem) – usuwamy i pobieramy ponownie
+            logger.warning("Corrupt cached snapshot file %s, refetching", path)
+            path.unlink(missing_ok=True)
+            on_disk = False
+    if not on_disk:
+        client = client or MockErpMesClient()
+        content = client.get_file_bytes(stream=stream, name=filename, date=date)
+        data = fast_loads(content)
+        if immutable:
+            _write_snapshot_cache_file(path, content)
+
+    etag = hashlib.sha1(content).hexdigest()
+    if immutable:
+        _parsed_files.set(key, (etag, data), len(content))
+    return data, etag, immutable
+
+
+def _write_snapshot_cache_file(path: Path, content: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_bytes(content)
+    os.replace(tmp, path)
+
+
+def prefetch_snapshot_files(
+    stream: str,
+    date: str,
+    filenames: List[str],
+    client: Optional[MockErpMesClient] = None,
+) -> Dict[str, Any]:
+    """
+    Pliki snapshotu, których nie ma w cache (LRU / dysk), pobiera jednym żądaniem /{stream}/bundle
+    i zapisuje do cache tak samo jak get_snapshot_json. Zwraca { nazwa: dane } dla pobranych plików.
+    Przy 0–1 brakującym pliku bundle się nie opłaca. Błąd bundla (np. starszy mock) nie przerywa pracy –
+    zwracamy to, co zdążyło przyjść, a resztę load_snapshot_records pobierze per plik.
+    """
+    names = [n for n in filenames if is_safe_snapshot_filename(n)]
+    immutable = ErpMesSnapshot.objects.filter(stream=stream, version_date=parse_date(date)).exists()
+    if immutable:
+        names = [
+            n for n in names
+            if _parsed_files.get((stream, date, n)) is None and not _snapshot_cache_path(stream, date, n).is_file()
+        ]
+    if len(names) < 2:
+        return {}
+
+    wanted = set(names)
+    result: Dict[str, Any] = {}
+    client = client or MockErpMesClient()
+    try:
+        for name, content in client.iter_snapshot_bundle(stream, date, names):
+            if name not in wanted:
+                continue
+            try:
+                data = fast_loads(content)
+            except ValueError as exc:
+                # uszkodzony plik w bundlu – pominięty, load_snapshot_records pobierze go osobno
+                logger.warning("Bundle %s/%s: invalid JSON in %s, skipping: %s", stream, date, name, exc)
+                continue
+            if immutable:
+                _write_snapshot_cache_file(_snapshot_cache_path(stream, date, name), content)
+                _parsed_files.set((stream, date, name), (hashlib.sha1(content).hexdigest(), data), len(content))
+            result[name] = data
+    except (requests.RequestException, urllib3.exceptions.HTTPError, tarfile.TarError, EOFError, OSError) as exc:
+        # treść czytamy z resp.raw, więc błędy urllib3 (ProtocolError, ReadTimeoutError, DecodeError)
+        # nie są opakowane w requests.RequestException
+        logger.warning("Bundle %s/%s failed, falling back to per-file fetch: %s", stream, date, exc)
+    return result
+
+
+def project_records(
+    data: Any,
+    fields: Optional[List[str]] = None,
+    filters: Optional[List[tuple[str, str]]] = None,
+) -> Any:
+    """
+    Prosty filtr + projekcja pól dla list rekordów:
+      filters – [(pole, wartość)], porównanie po str() (AND),
+      fields  – lista pól do zwrócenia.
+    Dane niebędące listą zwracamy bez zmian (poza projekcją pól dla dicta).
+    """
+    if isinstance(data, dict):
+        return {k: v for k, v in data.items() if k in fields} if fields else data
+    if not isinstance(data, list):
+        return data
+
+    records = data
+    if filters:
+        records = [
+            r for r in records
+            if isinstance(r, dict) and all(str(r.get(k)) == v for k, v in filters)
+        ]
+    if fields:
+        records = [
+            {k: r.get(k) for k in fields if k in r} if isinstance(r, dict) else r
+            for r in records
+        ]
+    return records
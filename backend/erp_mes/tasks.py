@@ -1,14 +1,21 @@
 # erp_mes/tasks.py
 from __future__ import annotations
 
-import json
 from typing import Optional
 
 from celery import shared_task
 from django.utils.dateparse import parse_date
 
+from proscientia.renderers import fast_loads
+
 from .models import ErpMesSnapshot, SnapshotSyncLog
-from .services import MockErpMesClient
+from .services import (
+    MockErpMesClient,
+    SnapshotLoadError,
+    compute_and_store_snapshot_kpis,
+    ingest_snapshot_records,
+    load_snapshot_records,
+)
 
 
 @shared_task
@@ -44,6 +51,10 @@ def sync_erp_mes_snapshots_task():
             snapshot.files = files
             snapshot.save()
 
+            # Rekordy do tabel + KPI (MES) ładujemy raz na snapshot (snapshoty są niezmienne)
+            if snapshot.records_ingested_at is None:
+                ingest_snapshot_task.delay(snapshot.id)                                # type: ignore[attr-defined]
+
             SnapshotSyncLog.objects.create(
                 stream=stream,
                 version_date=date_obj,
@@ -52,6 +63,32 @@ def sync_erp_mes_snapshots_task():
             )
 
 
+@shared_task(autoretry_for=(SnapshotLoadError,), retry_backoff=30, max_retries=5)
+def ingest_snapshot_task(snapshot_id: int) -> dict:
+    """
+    Ingestia snapshotu: pobiera pliki JSON raz, ładuje rekordy do tabel relacyjnych
+    (WorkOrder, BomComponent, Machine, ProductionBatch, QualityCheck, DowntimeEvent),
+    a dla MES od razu liczy KPI z tych samych rekordów.
+    Gdy któregoś pliku nie da się pobrać, snapshot nie dostaje records_ingested_at – task
+    ponawia się sam (pobrane pliki są już w cache), a po wyczerpaniu prób ponowi go kolejny sync.
+    """
+    try:
+        snapshot = ErpMesSnapshot.objects.get(id=snapshot_id)
+    except ErpMesSnapshot.DoesNotExist:
+        return {}
+
+    client = MockErpMesClient()
+    records = load_snapshot_records(
+        client, snapshot.stream, snapshot.version_date.isoformat(), snapshot.files, strict=True
+    )
+    counts = ingest_snapshot_records(snapshot, records)
+
+    if snapshot.stream == ErpMesSnapshot.STREAM_MES:
+        compute_and_store_snapshot_kpis(snapshot, client=client, records=records)
+
+    return counts
+
+
 @shared_task
 def fetch_erp_mes_json_file_task(stream: str, date: str, filename: str) -> Optional[dict]:
     """
@@ -61,6 +98,6 @@ def fetch_erp_mes_json_file_task(stream: str, date: str, filename: str) -> Optio
     client = MockErpMesClient()
     content_bytes = client.get_file_bytes(stream=stream, name=filename, date=date)
     try:
-        return json.loads(content_bytes.decode("utf-8"))
+        return fast_loads(content_bytes)
     except Exception:
         return None
@@ -1,3 +1,502 @@
-from django.test import TestCase
+import datetime
+import tempfile
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from urllib3.exceptions import ProtocolError
+
+from .models import ErpMesSnapshot, SnapshotKpi
+from .services import (
+    SnapshotLoadError,
+    _ParsedFileLRU,
+    _assign_shifts,
+    _parsed_files,
+    _snapshot_cache_path,
+    compute_mes_kpis,
+    diff_records,
+    diff_snapshot_records,
+    get_snapshot_json,
+    prefetch_snapshot_files,
+    resolve_key_fields,
+)
+from .tasks import ingest_snapshot_task
+
+
+class StubClient:
+    """MockErpMesClient podający kolejne odpowiedzi get_file_bytes."""
+
+    def __init__(self, *responses: bytes) -> None:
+        self.responses = list(responses)
+        self.calls = 0
+
+    def get_file_bytes(self, stream, name, date=None):
+        self.calls += 1
+        return self.responses.pop(0)
+
+
+class InvalidDateParamTests(TestCase):
+    """Zła lub nieistniejąca data w URL / query string to 400, a nie 500."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email="erp@example.com", password="x")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_diff_view_rejects_invalid_dates(self):
+        url = reverse("erp-mes-snapshot-diff", args=["erp"])
+        for params in ({"to": "2026-02-30"}, {"to": "yesterday"}, {"from": "2026-13-01"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, params).status_code, 400)
+
+    def test_record_list_rejects_invalid_dates(self):
+        url = reverse("erp-mes-records", args=["work_orders"])
+        for params in ({"date": "2026-02-30"}, {"date_from": "x"}, {"date_to": "2026-04-31"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, params).status_code, 400)
+
+    def test_json_file_view_rejects_invalid_date(self):
+        url = reverse("erp-mes-json-file", args=["mes", "2026-02-30", "machines.json"])
+        self.assertEqual(self.client.get(url).status_code, 400)
+
+    def test_json_file_view_maps_invalid_json_to_400(self):
+        url = reverse("erp-mes-json-file", args=["mes", "2026-01-05", "machines.json"])
+        with mock.patch("erp_mes.views.get_snapshot_json", side_effect=ValueError("unexpected end of data")):
+            self.assertEqual(self.client.get(url).status_code, 400)
+
+    def test_record_list_accepts_valid_range(self):
+        url = reverse("erp-mes-records", args=["work_orders"])
+        resp = self.client.get(url, {"date_from": "2026-01-01", "date_to": "2026-01-31"})
+        self.assertEqual(resp.status_code, 200)
+
+
+class SnapshotFileCacheTests(TestCase):
+    """Do trwałego cache niezmiennego snapshotu trafia tylko treść, która się sparsowała."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings_override = override_settings(ERP_MES_FILE_CACHE_DIR=tmp.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        ErpMesSnapshot.objects.create(stream="mes", version_date=datetime.date(2026, 1, 5))
+        self.args = ("mes", "2026-01-05", "machines.json")
+        _parsed_files.discard(self.args)
+
+    def test_truncated_response_is_not_cached(self):
+        with self.assertRaises(ValueError):
+            get_snapshot_json(*self.args, client=StubClient(b'[{"id": 1'))
+        self.assertFalse(_snapshot_cache_path(*self.args).exists())
+
+        data, _, immutable = get_snapshot_json(*self.args, client=StubClient(b'[{"id": 1}]'))
+        self.assertEqual(data, [{"id": 1}])
+        self.assertTrue(immutable)
+        self.assertTrue(_snapshot_cache_path(*self.args).is_file())
+
+    def test_corrupt_disk_copy_is_refetched(self):
+        path: Path = _snapshot_cache_path(*self.args)
+        path.parent.mkdir(parents=True)
+        path.write_bytes(b'[{"id"')
+        client = StubClient(b'[{"id": 2}]')
+
+        data, _, _ = get_snapshot_json(*self.args, client=client)
+        self.assertEqual(data, [{"id": 2}])
+        self.assertEqual(client.calls, 1)
+        self.assertEqual(path.read_bytes(), b'[{"id": 2}]')
+
+
+class DiffRecordsTests(TestCase):
+    """Diff rekordów po kluczu: dodane, usunięte, zmienione pola i rekordy bez zmian."""
+
+    def test_added_removed_changed(self):
+        old = [{"id": 1, "status": "open", "qty": 5}, {"id": 2, "status": "open"}, {"id": 3, "status": "done"}]
+        new = [{"id": 1, "status": "done", "qty": 5}, {"id": 3, "status": "done"}, {"id": 4, "status": "open"}]
+
+        diff = diff_records(old, new, ("id",))
+
+        self.assertEqual(diff["key_fields"], ["id"])
+        self.assertEqual(diff["added"], [{"id": 4, "status": "open"}])
+        self.assertEqual(diff["removed"], [{"id": 2, "status": "open"}])
+        self.assertEqual(diff["changed"], [{"key": "1", "changes": {"status": {"old": "open", "new": "done"}}}])
+        self.assertEqual(diff["unchanged"], 1)
+
+    def test_added_and_removed_fields_count_as_changes(self):
+        diff = diff_records([{"id": 1, "note": "x"}], [{"id": 1, "line_id": "L2"}], ("id",))
+        self.assertEqual(
+            diff["changed"][0]["changes"],
+            {"line_id": {"old": None, "new": "L2"}, "note": {"old": "x", "new": None}},
+        )
+
+    def test_composite_key(self):
+        old = [{"product_id": "P1", "version": 1, "qty": 2}, {"product_id": "P1", "version": 2, "qty": 2}]
+        new = [{"product_id": "P1", "version": 1, "qty": 3}, {"product_id": "P1", "version": 2, "qty": 2}]
+
+        diff = diff_records(old, new, ("product_id", "version"))
+
+        self.assertEqual(diff["changed"], [{"key": "P1|1", "changes": {"qty": {"old": 2, "new": 3}}}])
+        self.assertEqual(diff["unchanged"], 1)
+
+    def test_without_key_compares_whole_records(self):
+        diff = diff_records([{"a": 1}, {"a": 2}], [{"a": 2}, {"a": 3}], ())
+
+        self.assertEqual(diff["added"], [{"a": 3}])
+        self.assertEqual(diff["removed"], [{"a": 1}])
+        self.assertEqual((diff["changed"], diff["unchanged"]), ([], 1))
+
+    def test_snapshot_diff_resolves_keys_per_dataset(self):
+        old = {"work_orders": [{"id": 1, "status": "open"}], "machines": [{"machine_id": "M1"}]}
+        new = {"work_orders": [{"id": 1, "status": "done"}]}
+
+        diff = diff_snapshot_records(old, new)
+
+        self.assertEqual(diff["work_orders"]["key_fields"], ["id"])
+        self.assertEqual(len(diff["work_orders"]["changed"]), 1)
+        self.assertEqual(diff["machines"]["removed"], [{"machine_id": "M1"}])
+        self.assertEqual((diff["machines"]["count_old"], diff["machines"]["count_new"]), (1, 0))
+
+
+class ResolveKeyFieldsTests(TestCase):
+    """Klucz z RECORD_KEY_FIELDS, a gdy go brakuje – pierwsze unikalne pole id / *_id."""
+
+    def test_configured_key(self):
+        records = [{"product_id": "P1", "version": 1}, {"product_id": "P1", "version": 2}]
+        self.assertEqual(resolve_key_fields("bom", records), ("product_id", "version"))
+
+    def test_configured_key_missing_falls_back_to_unique_id(self):
+        records = [{"id": 1, "line_id": "L1"}, {"id": 2, "line_id": "L1"}]
+        self.assertEqual(resolve_key_fields("production_batches", records), ("id",))
+
+    def test_first_unique_suffix_field(self):
+        records = [{"line_id": "L1", "order_id": 1}, {"line_id": "L1", "order_id": 2}]
+        self.assertEqual(resolve_key_fields("custom", records), ("order_id",))
+
+    def test_no_unique_field(self):
+        records = [{"line_id": "L1"}, {"line_id": "L1"}]
+        self.assertEqual(resolve_key_fields("custom", records), ())
+        self.assertEqual(resolve_key_fields("work_orders", []), ("id",))
+        self.assertEqual(resolve_key_fields("custom", []), ())
+
+
+class SnapshotDiffViewTests(TestCase):
+    """Stronicowanie list diffu i mapowanie błędów (4xx dla klienta, 502 tylko dla niedostępnego mocka)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email="diff@example.com", password="x")
+        ErpMesSnapshot.objects.create(stream="erp", version_date=datetime.date(2026, 1, 5))
+        ErpMesSnapshot.objects.create(stream="erp", version_date=datetime.date(2026, 1, 6), is_latest=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("erp-mes-snapshot-diff", args=["erp"])
+        old = {"work_orders": [{"id": i, "status": "open"} for i in range(10)], "machines": []}
+        new = {"work_orders": [{"id": i, "status": "open"} for i in range(5, 15)], "machines": []}
+        self.diff = diff_snapshot_records(old, new)
+
+    def get(self, params=None, side_effect=None):
+        with mock.patch("erp_mes.views.diff_snapshots", return_value=self.diff, side_effect=side_effect):
+            return self.client.get(self.url, params or {})
+
+    def test_lists_are_paged_and_summary_keeps_totals(self):
+        body = self.get({"limit": 2, "offset": 1}).json()
+
+        self.assertEqual((body["from"], body["to"]), ("2026-01-05", "2026-01-06"))
+        self.assertEqual((body["limit"], body["offset"]), (2, 1))
+        orders = body["datasets"]["work_orders"]
+        self.assertEqual([r["id"] for r in orders["added"]], [11, 12])
+        self.assertEqual([r["id"] for r in orders["removed"]], [1, 2])
+        self.assertEqual(body["summary"]["work_orders"]["added"], 5)
+        self.assertEqual(body["summary"]["work_orders"]["removed"], 5)
+
+    def test_default_limit_and_cap(self):
+        self.assertEqual(self.get().json()["limit"], 100)
+        self.assertEqual(self.get({"limit": 10**6}).json()["limit"], 1000)
+        self.assertEqual(self.get({"limit": "many"}).status_code, 400)
+
+    def test_single_dataset(self):
+        body = self.get({"dataset": "work_orders"}).json()
+        self.assertEqual(list(body["datasets"]), ["work_orders"])
+        self.assertEqual(list(body["summary"]), ["work_orders"])
+        self.assertEqual(self.get({"dataset": "nope"}).status_code, 404)
+
+    def test_upstream_errors(self):
+        not_found = requests.HTTPError(response=mock.Mock(status_code=404))
+        self.assertEqual(self.get(side_effect=not_found).status_code, 404)
+        bad_request = requests.HTTPError(response=mock.Mock(status_code=422))
+        self.assertEqual(self.get(side_effect=bad_request).status_code, 400)
+        self.assertEqual(self.get(side_effect=requests.ConnectionError("down")).status_code, 502)
+        server_error = requests.HTTPError(response=mock.Mock(status_code=503))
+        self.assertEqual(self.get(side_effect=server_error).status_code, 502)
+
+    def test_programming_errors_are_not_masked_as_502(self):
+        with self.assertRaises(KeyError):
+            self.get(side_effect=KeyError("count_old"))
+
+    def test_missing_snapshot_is_404(self):
+        self.assertEqual(self.get({"to": "2026-02-01"}).status_code, 404)
+
+
+class MesKpiTests(TestCase):
+    """KPI snapshotu MES na małym zbiorze z ręcznie policzonymi wartościami."""
+
+    ROUTING = [
+        {"product_id": "P1", "valid_from": "2025-06-01", "operations": [{"std_time_min": 5.0}]},
+        # najnowsza wersja routingu – czas cyklu = najdłuższa operacja (2 min/szt.)
+        {"product_id": "P1", "valid_from": "2026-01-01", "operations": [{"std_time_min": 1.0}, {"std_time_min": 2.0}]},
+    ]
+    RECORDS = {
+        "production_batches": [
+            {"batch_id": "B1", "line_id": "L1", "product_id": "P1", "quantity_planned": 60, "quantity_good": 50,
+             "quantity_reject": 5, "start_time": "2026-01-05T06:00:00", "end_time": "2026-01-05T08:00:00"},
+            # P2 nie ma routingu – brak idealnego czasu cyklu (NaN)
+            {"batch_id": "B2", "line_id": "L2", "product_id": "P2", "quantity_planned": 50, "quantity_good": 40,
+             "quantity_reject": 10, "start_time": "2026-01-05T23:00:00", "end_time": "2026-01-06T01:00:00"},
+            {"batch_id": "B3", "line_id": "L1", "product_id": "P1", "quantity_planned": 20, "quantity_good": 20,
+             "quantity_reject": 0, "start_time": "2026-01-06T02:00:00", "end_time": "2026-01-06T03:00:00"},
+        ],
+        "quality_checks": [
+            {"check_id": "Q1", "batch_id": "B1", "product_id": "P1", "result": "pass"},
+            {"check_id": "Q2", "batch_id": "B1", "product_id": "P1", "result": "fail"},
+            {"check_id": "Q3", "batch_id": "B2", "product_id": "P2", "result": "pass"},
+        ],
+        "downtime_log": [
+            {"event_id": "D1", "line_id": "L1", "type": "unplanned", "reason_code": "JAM", "duration_min": 30,
+             "start_time": "2026-01-05T07:00:00"},
+            # bez duration_min – czas z start/end
+            {"event_id": "D2", "line_id": "L1", "type": "planned", "reason_code": "PM",
+             "start_time": "2026-01-05T12:00:00", "end_time": "2026-01-05T12:20:00"},
+            {"event_id": "D3", "line_id": "L2", "type": "unplanned", "reason_code": "JAM", "duration_min": 15,
+             "start_time": "2026-01-05T23:30:00"},
+        ],
+        "shift_log": [
+            {"shift_id": "S1", "line_id": "L1", "date": "2026-01-05", "shift_code": "A"},
+            {"shift_id": "S2", "line_id": "L1", "date": "2026-01-05", "shift_code": "C"},
+            {"shift_id": "S3", "line_id": "L2", "date": "2026-01-05", "shift_code": "C"},
+        ],
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.kpis = {
+            (row["dimension"], row["key"]): row["metrics"]
+            for row in compute_mes_kpis(cls.RECORDS, cls.ROUTING)
+        }
+
+    def test_line_kpis(self):
+        l1 = self.kpis[(SnapshotKpi.DIM_LINE, "L1")]
+        self.assertEqual(
+            {k: l1[k] for k in ("batches", "quantity_planned", "quantity_good", "quantity_reject", "run_time_min")},
+            {"batches": 2, "quantity_planned": 80, "quantity_good": 70, "quantity_reject": 5, "run_time_min": 180.0},
+        )
+        self.assertEqual((l1["yield"], l1["scrap_rate"]), (0.9333, 0.0667))
+        self.assertEqual((l1["qc_checks"], l1["qc_fail"], l1["first_pass_rate"]), (2, 1, 0.5))
+        self.assertEqual(
+            (l1["downtime_events"], l1["downtime_min"], l1["downtime_planned_min"], l1["downtime_unplanned_min"]),
+            (2, 50.0, 20.0, 30.0),
+        )
+        # availability 180/(180+30), performance (55+20)*2/180, quality 70/75
+        self.assertEqual((l1["availability"], l1["performance"], l1["quality"]), (0.8571, 0.8333, 0.9333))
+        self.assertEqual(l1["oee"], 0.6666)
+
+    def test_unknown_cycle_time_leaves_performance_empty(self):
+        l2 = self.kpis[(SnapshotKpi.DIM_LINE, "L2")]
+        self.assertEqual((l2["availability"], l2["quality"], l2["first_pass_rate"]), (0.8889, 0.8, 1.0))
+        self.assertIsNone(l2["performance"])
+        self.assertIsNone(l2["oee"])
+        # jedna partia bez czasu cyklu -> performance całości też nieznane
+        self.assertIsNone(self.kpis[(SnapshotKpi.DIM_TOTAL, "all")]["performance"])
+
+    def test_product_kpis_have_no_availability(self):
+        p1 = self.kpis[(SnapshotKpi.DIM_PRODUCT, "P1")]
+        self.assertEqual((p1["performance"], p1["quality"]), (0.8333, 0.9333))
+        self.assertIsNone(p1["availability"])
+        self.assertIsNone(p1["oee"])
+        self.assertNotIn("downtime_min", p1)
+
+    def test_shift_kpis(self):
+        a = self.kpis[(SnapshotKpi.DIM_SHIFT, "A")]
+        self.assertEqual((a["batches"], a["qc_checks"], a["downtime_min"]), (1, 2, 50.0))
+        self.assertEqual((a["availability"], a["performance"], a["quality"], a["oee"]), (0.8, 0.9167, 0.9091, 0.6667))
+        c = self.kpis[(SnapshotKpi.DIM_SHIFT, "C")]
+        # B2 (23:00) i B3 (02:00 następnego dnia) to ta sama nocna zmiana
+        self.assertEqual((c["batches"], c["quantity_good"], c["downtime_min"]), (2, 60, 15.0))
+        self.assertIsNone(c["performance"])
+
+    def test_downtime_causes(self):
+        self.assertEqual(
+            self.kpis[(SnapshotKpi.DIM_DOWNTIME_CAUSE, "JAM")],
+            {"downtime_events": 2, "downtime_min": 45.0, "downtime_unplanned_min": 45.0},
+        )
+        self.assertEqual(
+            self.kpis[(SnapshotKpi.DIM_DOWNTIME_CAUSE, "PM")],
+            {"downtime_events": 1, "downtime_min": 20.0, "downtime_unplanned_min": 0.0},
+        )
+
+    def test_night_shift_after_midnight_uses_start_day_log(self):
+        record = [{"line_id": "L3", "start_time": "2026-01-06T02:00:00"}]
+        # jedyna zapisana zmiana linii w dniu startu nocnej zmiany (05.01) wygrywa z godziną
+        logged_previous_day = [{"line_id": "L3", "date": "2026-01-05", "shift_code": "B"}]
+        self.assertEqual(_assign_shifts(record, logged_previous_day, "start_time"), ["B"])
+        # wpis z 06.01 dotyczy innej zmiany – zostaje C z godziny startu
+        logged_same_day = [{"line_id": "L3", "date": "2026-01-06", "shift_code": "B"}]
+        self.assertEqual(_assign_shifts(record, logged_same_day, "start_time"), ["C"])
+
+    def test_shift_from_time_boundaries(self):
+        records = [{"line_id": "L9", "start_time": f"2026-01-05T{h}:00:00"} for h in ("05", "06", "13", "14", "21", "22")]
+        self.assertEqual(_assign_shifts(records, [], "start_time"), ["C", "A", "A", "B", "B", "C"])
+
+
+class ParsedFileLRUTests(TestCase):
+    """LRU sparsowanych plików pilnuje budżetu w bajtach, nie liczby wpisów."""
+
+    def test_evicts_oldest_entries_over_byte_budget(self):
+        lru = _ParsedFileLRU(max_bytes=100 * _ParsedFileLRU.SIZE_FACTOR)
+        lru.set("a", ("ea", [1]), 40)
+        lru.set("b", ("eb", [2]), 40)
+        lru.get("a")
+        lru.set("c", ("ec", [3]), 40)
+
+        self.assertIsNone(lru.get("b"))
+        self.assertEqual(lru.get("a"), ("ea", [1]))
+        self.assertEqual(lru.get("c"), ("ec", [3]))
+        self.assertEqual(lru.total_bytes, 80 * _ParsedFileLRU.SIZE_FACTOR)
+
+    def test_file_larger_than_budget_is_not_kept(self):
+        lru = _ParsedFileLRU(max_bytes=100 * _ParsedFileLRU.SIZE_FACTOR)
+        lru.set("a", ("ea", [1]), 40)
+        lru.set("big", ("eb", [2]), 101)
+
+        self.assertIsNone(lru.get("big"))
+        self.assertEqual(lru.get("a"), ("ea", [1]))
+
+    def test_replacing_entry_updates_size(self):
+        lru = _ParsedFileLRU(max_bytes=100 * _ParsedFileLRU.SIZE_FACTOR)
+        lru.set("a", ("e1", [1]), 60)
+        lru.set("a", ("e2", [1]), 10)
+        lru.discard("a")
+        self.assertEqual(lru.total_bytes, 0)
+
+
+class JsonFileViewTests(TestCase):
+    """ETag / 304, projekcja pól i stronicowanie w erp_mes_json_file_view."""
+
+    RECORDS = [{"id": i, "status": "done" if i % 2 else "open", "line_id": "L1"} for i in range(1, 6)]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email="json@example.com", password="x")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("erp-mes-json-file", args=["mes", "2026-01-05", "work_orders.json"])
+        patcher = mock.patch(
+            "erp_mes.views.get_snapshot_json", return_value=(self.RECORDS, "abc123", True),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_etag_and_not_modified(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["ETag"], '"abc123"')
+        self.assertIn("immutable", resp["Cache-Control"])
+        self.assertEqual(resp.json(), self.RECORDS)
+
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH='"abc123"')
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp["ETag"], '"abc123"')
+
+    def test_etag_depends_on_query(self):
+        plain = self.client.get(self.url)["ETag"]
+        projected = self.client.get(self.url, {"fields": "id"})["ETag"]
+        self.assertNotEqual(plain, projected)
+        # ETag całego pliku nie pasuje do projekcji – pełna odpowiedź zamiast 304
+        resp = self.client.get(self.url, {"fields": "id"}, HTTP_IF_NONE_MATCH=plain)
+        self.assertEqual(resp.status_code, 200)
+
+    def test_fields_and_filter_projection(self):
+        resp = self.client.get(self.url + "?fields=id,status&filter=status:done")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(
+            resp.json(),
+            [{"id": 1, "status": "done"}, {"id": 3, "status": "done"}, {"id": 5, "status": "done"}],
+        )
+
+    def test_paging_envelope(self):
+        resp = self.client.get(self.url, {"page": 2, "page_size": 2, "fields": "id"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(
+            resp.json(),
+            {"count": 5, "page": 2, "page_size": 2, "results": [{"id": 3}, {"id": 4}]},
+        )
+
+    def test_last_partial_page_and_invalid_page(self):
+        body = self.client.get(self.url, {"page": 3, "page_size": 2}).json()
+        self.assertEqual([r["id"] for r in body["results"]], [5])
+        self.assertEqual(self.client.get(self.url, {"page": "x"}).status_code, 400)
+
+
+class BrokenBundleClient:
+    """Bundle z jednym poprawnym plikiem, jednym uszkodzonym, urwany błędem urllib3."""
+
+    def iter_snapshot_bundle(self, stream, date, names):
+        yield "machines.json", b'[{"id": 1}]'
+        yield "work_orders.json", b'[{"id"'
+        raise ProtocolError("Connection broken: IncompleteRead")
+
+
+class SnapshotBundlePrefetchTests(TestCase):
+    """Błędy w trakcie czytania bundla nie przerywają pracy – brakujące pliki idą ścieżką per plik."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings_override = override_settings(ERP_MES_FILE_CACHE_DIR=tmp.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        ErpMesSnapshot.objects.create(stream="mes", version_date=datetime.date(2026, 1, 5))
+        self.names = ["machines.json", "work_orders.json", "shift_log.json"]
+        for name in self.names:
+            _parsed_files.discard(("mes", "2026-01-05", name))
+
+    def test_partial_bundle_keeps_parsed_members(self):
+        result = prefetch_snapshot_files("mes", "2026-01-05", self.names, client=BrokenBundleClient())
+
+        self.assertEqual(result, {"machines.json": [{"id": 1}]})
+        self.assertTrue(_snapshot_cache_path("mes", "2026-01-05", "machines.json").is_file())
+        self.assertFalse(_snapshot_cache_path("mes", "2026-01-05", "work_orders.json").exists())
+
+
+@override_settings(MOCK_API_BASE="http://mock.invalid")
+class IngestSnapshotFailureTests(TestCase):
+    """Snapshot z plikiem, którego nie udało się pobrać, nie jest oznaczany jako załadowany."""
+
+    def test_failed_file_leaves_snapshot_not_ingested(self):
+        snapshot = ErpMesSnapshot.objects.create(
+            stream="erp", version_date=datetime.date(2026, 1, 5),
+            files=[{"name": "work_orders.json"}, {"name": "bom.json"}],
+        )
+
+        def fake_get(stream, date, name, client=None):
+            if name == "bom.json":
+                raise requests.ConnectionError("mock down")
+            return [{"id": 1}], "etag", True
+
+        with mock.patch("erp_mes.services.prefetch_snapshot_files", return_value={}), \
+                mock.patch("erp_mes.services.get_snapshot_json", side_effect=fake_get):
+            with self.assertRaises(SnapshotLoadError) as ctx:
+                ingest_snapshot_task(snapshot.id)
+
+        self.assertEqual(list(ctx.exception.failed), ["bom.json"])
+        snapshot.refresh_from_db()
+        self.assertIsNone(snapshot.records_ingested_at)
@@ -5,7 +5,10 @@ from .views import (
     ErpMesStreamSnapshotListView,
     ErpMesSnapshotDetailView,
     ErpMesSyncView,
+    SnapshotKpiListView,
+    SnapshotRecordListView,
     erp_mes_json_file_view,
+    erp_mes_snapshot_diff_view,
 )
 
 urlpatterns = [
@@ -15,12 +18,21 @@ urlpatterns = [
     # Sync (admin)
     path("snapshots/sync/", ErpMesSyncView.as_view(), name="erp-mes-sync"),
 
+    # Rekordy snapshotów z tabel relacyjnych (filtrowanie/paginacja w SQL)
+    path("records/<str:dataset>/", SnapshotRecordListView.as_view(), name="erp-mes-records"),
+
     # Snapshoty dla konkretnego streamu
     path("<str:stream>/snapshots/", ErpMesStreamSnapshotListView.as_view(), name="erp-mes-stream-snapshots"),
 
     # Files listing (snapshot detail)
     path("<str:stream>/snapshots/<str:date>/files/", ErpMesSnapshotDetailView.as_view(), name="erp-mes-snapshot-detail"),
 
+    # Prekomputowane KPI snapshotu (?dimension=line|product|shift|downtime_cause|total)
+    path("<str:stream>/snapshots/<str:date>/kpis/", SnapshotKpiListView.as_view(), name="erp-mes-snapshot-kpis"),
+
+    # Diff rekordów między snapshotami (?from=&to=)
+    path("<str:stream>/diff/", erp_mes_snapshot_diff_view, name="erp-mes-snapshot-diff"),
+
     # JSON file content
     path("<str:stream>/snapshots/<str:date>/json/<str:filename>/", erp_mes_json_file_view, name="erp-mes-json-file"),
 ]
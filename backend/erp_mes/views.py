@@ -1,18 +1,80 @@
 from __future__ import annotations
 
 import datetime
+import hashlib
 import json
 
+import requests
+from django.http import Http404
 from django.utils.dateparse import parse_date
 
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .models import ErpMesSnapshot, SnapshotSyncLog
-from .serializers import ErpMesSnapshotSerializer, ErpMesSnapshotListSerializer
-from .services import MockErpMesClient
+from .models import ErpMesSnapshot, SnapshotSyncLog, SnapshotKpi
+from .serializers import (
+    ErpMesSnapshotSerializer,
+    ErpMesSnapshotListSerializer,
+    SnapshotKpiSerializer,
+    SnapshotRecordSerializer,
+)
+from .services import (
+    MockErpMesClient,
+    diff_snapshots,
+    summarize_snapshot_diff,
+    get_snapshot_json,
+    is_safe_snapshot_filename,
+    project_records,
+    SNAPSHOT_RECORD_TABLES,
+)
+from .tasks import ingest_snapshot_task
+
+
+# Stronicowanie list rekordów w odpowiedzi diffu (per zbiór i per rodzaj zmiany)
+DIFF_PAGE_SIZE = 100
+DIFF_MAX_PAGE_SIZE = 1000
+
+
+def parse_date_param(value: str, name: str = "date") -> datetime.date:
+    """
+    Data YYYY-MM-DD z URL / query string albo 400. parse_date zwraca None dla złego formatu,
+    a dla nieistniejącej daty (np. 2026-02-30) rzuca ValueError.
+    """
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: "Invalid date, expected YYYY-MM-DD"})
+    return parsed
+
+
+def upstream_error_response(exc: requests.RequestException) -> Response:
+    """
+    Błąd zapytania do mocka ERP/MES -> odpowiedź API. 4xx mocka wynika z parametrów klienta
+    (np. pliku nie ma w snapshocie) i przekazujemy go dalej; niedostępny mock / 5xx / timeout to 502.
+    Wyjątki spoza requests (błędy w kodzie) nie są tu łapane – lecą jako 500.
+    """
+    upstream = getattr(exc.response, "status_code", None)
+    if upstream == 404:
+        return Response({"detail": "File not found in snapshot"}, status=status.HTTP_404_NOT_FOUND)
+    if upstream is not None and 400 <= upstream < 500:
+        return Response({"detail": f"Invalid request: {exc}"}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({"detail": f"Error fetching file: {exc}"}, status=status.HTTP_502_BAD_GATEWAY)
+
+
+def parse_int_param(request, name: str, default: int, minimum: int, maximum: int | None = None) -> int:
+    """Liczba całkowita z query string (przycięta do [minimum, maximum]) albo 400."""
+    try:
+        value = int(request.query_params.get(name, default))
+    except ValueError:
+        raise ValidationError({name: "Invalid integer"})
+    value = max(value, minimum)
+    return min(value, maximum) if maximum is not None else value
 
 
 class ErpMesSnapshotListView(generics.ListAPIView):
@@ -54,12 +116,75 @@ class ErpMesSnapshotDetailView(generics.RetrieveAPIView):
     def get_object(self):       # type: ignore
         stream = self.kwargs["stream"]
         date_str = self.kwargs["date"]
-        date_obj = parse_date(date_str)
-        if not date_obj:
-            raise ValueError("Invalid date format, expected YYYY-MM-DD")
+        date_obj = parse_date_param(date_str)
         return ErpMesSnapshot.objects.get(stream=stream, version_date=date_obj)
 
 
+class SnapshotKpiListView(generics.ListAPIView):
+    """
+    GET /api/erp-mes/{stream}/snapshots/{date}/kpis/?dimension=line
+    Prekomputowane KPI snapshotu (SnapshotKpi) – bez pobierania plików z mocka.
+    """
+    serializer_class = SnapshotKpiSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):     # type: ignore
+        qs = SnapshotKpi.objects.filter(
+            snapshot__stream=self.kwargs["stream"],
+            snapshot__version_date=parse_date_param(self.kwargs["date"]),
+        )
+        dimension = self.request.query_params.get("dimension")
+        if dimension:
+            qs = qs.filter(dimension=dimension)
+        return qs
+
+
+class SnapshotRecordPagination(PageNumberPagination):
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+
+class SnapshotRecordListView(generics.ListAPIView):
+    """
+    GET /api/erp-mes/records/{dataset}/?date=YYYY-MM-DD&status=completed&page=2
+
+    Rekordy snapshotów z tabel relacyjnych (po ingestii) – filtrowanie i paginacja w SQL.
+    dataset: work_orders | bom | machines | production_batches | quality_checks | downtime_log
+    Parametry:
+      - date / date_from / date_to – zakres snapshotów (brak = wszystkie, zapytania cross-snapshot),
+      - latest=1 – tylko najnowszy snapshot,
+      - pola z FILTER_FIELDS modelu (np. line_id, status, product_id).
+    """
+    serializer_class = SnapshotRecordSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = SnapshotRecordPagination
+
+    def get_queryset(self):     # type: ignore
+        table = SNAPSHOT_RECORD_TABLES.get(self.kwargs["dataset"])
+        if table is None:
+            raise Http404("Unknown dataset")
+        model = table[0]
+        params = self.request.query_params
+
+        qs = model.objects.select_related("snapshot")
+        if params.get("date"):
+            qs = qs.filter(snapshot__version_date=parse_date_param(params["date"]))
+        if params.get("date_from"):
+            qs = qs.filter(snapshot__version_date__gte=parse_date_param(params["date_from"], "date_from"))
+        if params.get("date_to"):
+            qs = qs.filter(snapshot__version_date__lte=parse_date_param(params["date_to"], "date_to"))
+        if params.get("latest") in ("1", "true"):
+            qs = qs.filter(snapshot__is_latest=True)
+
+        for field in model.FILTER_FIELDS:
+            value = params.get(field)
+            if value:
+                qs = qs.filter(**{field: value})
+
+        return qs.order_by("snapshot__version_date", "pk")
+
+
 class ErpMesSyncView(APIView):
     """
     POST /api/erp-mes/snapshots/sync/
@@ -99,6 +224,9 @@ class ErpMesSyncView(APIView):
                 snapshot.files = files
                 snapshot.save()
 
+                if snapshot.records_ingested_at is None:
+                    ingest_snapshot_task.delay(snapshot.id)                            # type: ignore[attr-defined]
+
                 # prosty log
                 SnapshotSyncLog.objects.create(
                     stream=stream,
@@ -116,17 +244,123 @@ def erp_mes_json_file_view(request, stream: str, date: str, filename: str):
     """
     GET /api/erp-mes/{stream}/snapshots/{date}/json/{filename}/
 
-    Zwraca zawartość pliku JSON ze snapshotu ERP/MES.
+    Zwraca zawartość pliku JSON ze snapshotu ERP/MES (z lokalnego cache – snapshoty są niezmienne).
+    Opcjonalne parametry (dla plików będących listą rekordów):
+      - ?filter=status:completed (można powtarzać, AND),
+      - ?fields=id,status,line_id,
+      - ?page=2&page_size=50 – zwraca kopertę {count, page, page_size, results}.
+    Bez parametrów – cały plik, jak dotychczas.
     """
-    client = MockErpMesClient()
     # backend dba, że stream to "erp" lub "mes"
     if stream not in ("erp", "mes"):
         return Response({"detail": "Invalid stream"}, status=status.HTTP_400_BAD_REQUEST)
 
+    if not is_safe_snapshot_filename(filename):
+        return Response({"detail": "Invalid filename"}, status=status.HTTP_400_BAD_REQUEST)
+    parse_date_param(date)
+
+    try:
+        data, file_etag, immutable = get_snapshot_json(stream, date, filename)
+    except ValueError as exc:
+        # plik nie jest poprawnym JSON-em (orjson.JSONDecodeError) albo zła nazwa
+        return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    except requests.RequestException as exc:
+        return upstream_error_response(exc)
+
+    # ETag zależy od pliku i parametrów (inna projekcja = inna reprezentacja)
+    query = request.META.get("QUERY_STRING", "")
+    etag = f'"{file_etag}-{hashlib.sha1(query.encode()).hexdigest()[:12]}"' if query else f'"{file_etag}"'
+    cache_headers = {"ETag": etag}
+    if immutable:
+        cache_headers["Cache-Control"] = "private, max-age=31536000, immutable"
+
+    if etag in (request.META.get("HTTP_IF_NONE_MATCH") or ""):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+
+    fields = [f for f in request.query_params.get("fields", "").split(",") if f]
+    filters = [
+        tuple(item.split(":", 1)) for item in request.query_params.getlist("filter") if ":" in item
+    ]
+    data = project_records(data, fields=fields or None, filters=filters or None)      # type: ignore[arg-type]
+
+    page_param = request.query_params.get("page")
+    if page_param and isinstance(data, list):
+        try:
+            page = max(int(page_param), 1)
+            page_size = min(max(int(request.query_params.get("page_size", 100)), 1), 1000)
+        except ValueError:
+            return Response({"detail": "Invalid page / page_size"}, status=status.HTTP_400_BAD_REQUEST)
+        offset = (page - 1) * page_size
+        data = {
+            "count": len(data),
+            "page": page,
+            "page_size": page_size,
+            "results": data[offset:offset + page_size],
+        }
+
+    return Response(data, status=status.HTTP_200_OK, headers=cache_headers)
+
+
+@api_view(["GET"])
+@permission_classes([permissions.IsAuthenticated])
+def erp_mes_snapshot_diff_view(request, stream: str):
+    """
+    GET /api/erp-mes/{stream}/diff/?from=YYYY-MM-DD&to=YYYY-MM-DD
+
+    Diff rekordów (po kluczach ID) między dwoma snapshotami streamu.
+    Brak `to` -> najnowszy snapshot, brak `from` -> snapshot poprzedzający `to`.
+    Listy added / removed / changed są stronicowane per zbiór: ?limit= (domyślnie 100, max 1000)
+    i ?offset=; pełne liczniki są w "summary". ?dataset=work_orders – tylko jeden zbiór.
+    """
+    if stream not in ("erp", "mes"):
+        return Response({"detail": "Invalid stream"}, status=status.HTTP_400_BAD_REQUEST)
+    limit = parse_int_param(request, "limit", DIFF_PAGE_SIZE, 1, DIFF_MAX_PAGE_SIZE)
+    offset = parse_int_param(request, "offset", 0, 0)
+    dataset = request.query_params.get("dataset")
+
+    to_str = request.query_params.get("to")
+    from_str = request.query_params.get("from")
+    to_date = parse_date_param(to_str, "to") if to_str else None
+    from_date = parse_date_param(from_str, "from") if from_str else None
+
+    qs = ErpMesSnapshot.objects.filter(stream=stream)
+    if to_date:
+        new_snapshot = qs.filter(version_date=to_date).first()
+    else:
+        new_snapshot = qs.order_by("-version_date").first()
+    if new_snapshot is None:
+        return Response({"detail": "Snapshot not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    if from_date:
+        old_snapshot = qs.filter(version_date=from_date).first()
+        if old_snapshot is None:
+            return Response({"detail": "Snapshot not found"}, status=status.HTTP_404_NOT_FOUND)
+    else:
+        old_snapshot = new_snapshot.get_previous()
+
     try:
-        content_bytes = client.get_file_bytes(stream=stream, name=filename, date=date)
-        data = json.loads(content_bytes.decode("utf-8"))
-    except Exception as exc:
-        return Response({"detail": f"Error fetching file: {exc}"}, status=status.HTTP_502_BAD_GATEWAY)
+        diff = diff_snapshots(stream, old_snapshot, new_snapshot)
+    except requests.RequestException as exc:
+        return upstream_error_response(exc)
+
+    if dataset:
+        if dataset not in diff:
+            return Response({"detail": "Dataset not found"}, status=status.HTTP_404_NOT_FOUND)
+        diff = {dataset: diff[dataset]}
+    summary = summarize_snapshot_diff(diff)
+    for d in diff.values():
+        for part in ("added", "removed", "changed"):
+            d[part] = d[part][offset:offset + limit]
 
-    return Response(data, status=status.HTTP_200_OK)
+    return Response(
+        {
+            "stream": stream,
+            "from": old_snapshot.version_date.isoformat() if old_snapshot else None,
+            "to": new_snapshot.version_date.isoformat(),
+            "limit": limit,
+            "offset": offset,
+            "summary": summary,
+            "datasets": diff,
+        },
+        status=status.HTTP_200_OK,
+    )
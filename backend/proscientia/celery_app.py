@@ -12,5 +12,9 @@ app.config_from_object("django.conf:settings", namespace="CELERY")
 # Automatyczne wykrywanie tasków z INSTALLED_APPS
 app.autodiscover_tasks()
 
+# Metryki Prometheusa i tracing – rejestrują sygnały Celery (czasy tasków, serwer /metrics workera,
+# kontekst trace w nagłówkach wiadomości)
+from proscientia import metrics, tracing  # noqa: E402,F401
+
 # Alias – jakbyś chciał używać nazwy celery_app w kodzie
 celery_app = app
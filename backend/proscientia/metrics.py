@@ -0,0 +1,204 @@
+"""
+Metryki Prometheusa dla backendu (Django) i workerów Celery.
+
+  - czasy tasków Celery (sygnały task_prerun/task_postrun) i etapów pipeline'ów (stage_timer – także span
+    i wpis w StageTimings taska, patrz proscientia/tracing.py),
+  - wywołania OpenAI: czas, tokeny wejście/wyjście, koszt (llm_call + settings.OPENAI_PRICING),
+  - wyszukiwanie wektorowe, żądania MockErpMesClient i trafienia cache, publikacja do channel layer.
+
+Tryb wieloprocesowy (prefork Celery, kilka procesów serwera): PROMETHEUS_MULTIPROC_DIR wskazuje pusty katalog
+wspólny dla procesów (czyszczony przy starcie) – każdy proces zapisuje wartości do plików, a odczyt je sumuje.
+Bez tej zmiennej metryki żyją w pamięci procesu (runserver, testy).
+
+Odczyt:
+    curl localhost:8000/metrics                      # Django (endpoint /metrics; DEBUG, staff albo METRICS_ALLOWED_IPS)
+    CELERY_METRICS_PORT=9808 celery -A proscientia worker  # worker: osobny serwer HTTP w procesie głównym
+"""
+from __future__ import annotations
+
+import ipaddress
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from celery.signals import task_postrun, task_prerun, worker_process_shutdown, worker_ready
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from opentelemetry.trace import SpanKind
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+
+from proscientia.tracing import record_stage, span
+
+# wywołania sieciowe i LLM trwają od ms do minut – domyślne kubełki (do 10 s) są za krótkie
+SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+TASK_SECONDS = Histogram(
+    "proscientia_celery_task_duration_seconds", "Czas wykonania taska Celery",
+    ["task", "state"], buckets=SLOW_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "proscientia_stage_duration_seconds", "Czas etapu pipeline'u (ekstrakcja, chunking, embeddingi, ...)",
+    ["pipeline", "stage"], buckets=SLOW_BUCKETS,
+)
+LLM_SECONDS = Histogram(
+    "proscientia_llm_request_duration_seconds", "Czas wywołania API OpenAI",
+    ["operation", "model", "outcome"], buckets=SLOW_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "proscientia_llm_tokens", "Tokeny wysłane / otrzymane z API OpenAI",
+    ["operation", "model", "direction"],
+)
+LLM_COST = Counter(
+    "proscientia_llm_cost_usd", "Szacowany koszt wywołań OpenAI (wg settings.OPENAI_PRICING)",
+    ["operation", "model"],
+)
+VECTOR_SEARCH_SECONDS = Histogram(
+    "proscientia_vector_search_duration_seconds", "Czas zapytania wektorowego (pgvector)",
+    buckets=FAST_BUCKETS,
+)
+MOCK_REQUEST_SECONDS = Histogram(
+    "proscientia_mock_request_duration_seconds", "Czas żądania MockErpMesClient (do nagłówków odpowiedzi)",
+    ["endpoint", "status"], buckets=SLOW_BUCKETS,
+)
+CACHE_LOOKUPS = Counter(
+    "proscientia_cache_lookups", "Odczyty cache (hit/miss)",
+    ["cache", "result"],
+)
+CHANNEL_PUBLISH_SECONDS = Histogram(
+    "proscientia_channel_publish_duration_seconds", "Czas group_send do channel layer",
+    ["group"], buckets=FAST_BUCKETS,
+)
+
+
+def multiprocess_enabled() -> bool:
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def collect_registry() -> CollectorRegistry:
+    """Rejestr do odczytu: w trybie wieloprocesowym suma plików wszystkich procesów."""
+    if not multiprocess_enabled():
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_allowed(request) -> bool:
+    """DEBUG, zalogowany staff albo adres klienta (REMOTE_ADDR, bez X-Forwarded-For) z METRICS_ALLOWED_IPS."""
+    if settings.DEBUG:
+        return True
+    user = getattr(request, "user", None)
+    if user is not None and user.is_staff:
+        return True
+    try:
+        addr = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return any(addr in network for network in settings.METRICS_ALLOWED_NETWORKS)
+
+
+def metrics_view(request) -> HttpResponse:
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(generate_latest(collect_registry()), content_type=CONTENT_TYPE_LATEST)
+
+
+@contextmanager
+def stage_timer(pipeline: str, stage: str) -> Iterator[None]:
+    """`with stage_timer("indexing", "extract"): ...` – histogram, span i czas etapu w metadanych taska."""
+    started = time.perf_counter()
+    try:
+        with span(f"{pipeline}.{stage}"):
+            yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(pipeline, stage).observe(elapsed)
+        record_stage(stage, elapsed)
+
+
+def cache_lookup(cache_name: str, hit: bool) -> None:
+    CACHE_LOOKUPS.labels(cache_name, "hit" if hit else "miss").inc()
+
+
+class LlmCall:
+    """Wynik wywołania dla llm_call: ustaw `usage` z odpowiedzi API, żeby policzyć tokeny i koszt."""
+
+    usage: Any = None
+
+
+@contextmanager
+def llm_call(operation: str, model: str) -> Iterator[LlmCall]:
+    """
+    with llm_call("chat", model) as call:
+        response = client.chat.completions.create(...)
+        call.usage = response.usage
+    """
+    call = LlmCall()
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        with span(f"openai.{operation}", SpanKind.CLIENT, **{"gen_ai.request.model": model}) as current:
+            yield call
+            if call.usage is not None:
+                current.set_attribute("gen_ai.usage.input_tokens", getattr(call.usage, "prompt_tokens", 0) or 0)
+                current.set_attribute("gen_ai.usage.output_tokens", getattr(call.usage, "completion_tokens", 0) or 0)
+        outcome = "ok"
+    finally:
+        LLM_SECONDS.labels(operation, model, outcome).observe(time.perf_counter() - started)
+        if call.usage is not None:
+            record_llm_usage(operation, model, call.usage)
+
+
+def record_llm_usage(operation: str, model: str, usage: Any) -> None:
+    prompt = getattr(usage, "prompt_tokens", 0) or 0
+    completion = getattr(usage, "completion_tokens", 0) or 0
+    LLM_TOKENS.labels(operation, model, "in").inc(prompt)
+    LLM_TOKENS.labels(operation, model, "out").inc(completion)
+    LLM_COST.labels(operation, model).inc(llm_cost_usd(model, prompt, completion))
+
+
+def llm_cost_usd(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    price_in, price_out = settings.OPENAI_PRICING.get(model, (0.0, 0.0))
+    return (prompt_tokens * price_in + completion_tokens * price_out) / 1_000_000
+
+
+# --- Celery ---
+
+_task_started: dict[str, float] = {}
+
+
+@task_prerun.connect
+def _on_task_prerun(task_id=None, **kwargs) -> None:
+    _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def _on_task_postrun(task_id=None, task=None, state=None, **kwargs) -> None:
+    started = _task_started.pop(task_id, None)
+    if started is not None and task is not None:
+        TASK_SECONDS.labels(task.name, state or "UNKNOWN").observe(time.perf_counter() - started)
+
+
+@worker_ready.connect
+def _serve_worker_metrics(**kwargs) -> None:
+    # proces główny workera wystawia sumę metryk dzieci (prefork) – scrape na CELERY_METRICS_PORT
+    port = os.environ.get("CELERY_METRICS_PORT")
+    if port:
+        start_http_server(int(port), registry=collect_registry())
+
+
+@worker_process_shutdown.connect
+def _mark_process_dead(pid=None, **kwargs) -> None:
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(pid or os.getpid())
@@ -0,0 +1,23 @@
+"""
+Paginacja list API.
+
+OptionalCursorPagination – paginacja kursorowa (stały koszt niezależnie od numeru strony,
+brak COUNT(*)) włączana tylko, gdy klient o nią poprosi (?cursor= lub ?page_size=).
+Bez tych parametrów endpoint zwraca pełną listę jak dotychczas – frontend nie musi się zmieniać.
+"""
+from __future__ import annotations
+
+from rest_framework.pagination import CursorPagination
+
+
+class OptionalCursorPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    ordering = ("-created_at", "-id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
@@ -0,0 +1,79 @@
+"""
+Szybkie (orjson) renderowanie i parsowanie JSON-a dla DRF oraz helpery
+fast_loads / fast_dumps używane w kodzie backendu (np. MockErpMesClient).
+
+orjson jest ~5-10x szybszy od stdlib json przy dużych odpowiedziach
+(pliki snapshotów ERP/MES, listy artefaktów z metadata, listy dokumentów).
+Benchmark: python -m benchmarks.bench_json_render
+"""
+from __future__ import annotations
+
+from typing import Any
+
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_drf_encoder = JSONEncoder()
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(obj: Any) -> Any:
+    # Typy nieobsługiwane przez orjson (Decimal, lazy strings, QuerySet, timedelta...)
+    # oddajemy do enkodera DRF – wynik zgodny z JSONRenderer.
+    return _drf_encoder.default(obj)
+
+
+def fast_dumps(data: Any, indent: bool = False) -> bytes:
+    option = ORJSON_OPTIONS | (orjson.OPT_INDENT_2 if indent else 0)
+    return orjson.dumps(data, default=_default, option=option)
+
+
+def fast_loads(data: bytes | bytearray | memoryview | str) -> Any:
+    return orjson.loads(data)
+
+
+# JSONRenderer DRF escapuje U+2028 / U+2029 (poprawne w JSON, ale nie w JavaScripcie) – orjson nie
+_JS_LINE_SEPARATORS = ((b"\xe2\x80\xa8", b"\\u2028"), (b"\xe2\x80\xa9", b"\\u2029"))
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Drop-in zamiennik rest_framework.renderers.JSONRenderer oparty o orjson – bajt w bajt ten sam
+    wynik (zwarty JSON, UTF-8, escapowane U+2028/U+2029). Poza szybką ścieżką zostają:
+      - odpowiedź z wcięciem (`Accept: application/json; indent=4`, BrowsableAPI) – orjson zna tylko 2 spacje,
+      - dane, których orjson nie zakoduje (np. int > 64 bity) – oddajemy je JSONRenderer.
+    Różnice: NaN / Infinity orjson zapisuje jako null (JSONRenderer rzuca ValueError), a bardzo małe / duże
+    floaty w zapisie wykładniczym bez zera w wykładniku (1e-7 zamiast 1e-07) – ta sama wartość po sparsowaniu.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = fast_dumps(data)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        for raw, escaped in _JS_LINE_SEPARATORS:
+            if raw in ret:
+                ret = ret.replace(raw, escaped)
+        return ret
+
+
+class ORJSONParser(BaseParser):
+    """Parser application/json oparty o orjson."""
+
+    media_type = "application/json"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return fast_loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
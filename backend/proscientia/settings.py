@@ -11,9 +11,13 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import ipaddress
+import json
 import os
+import warnings
 from datetime import timedelta
 from celery.schedules import crontab
+from kombu import Queue
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -34,6 +38,35 @@ def env_list(name: str, default: str = "") -> list[str]:
     raw = os.getenv(name, default)
     return [x.strip() for x in raw.split(",") if x.strip()]
 
+def env_json_dict(name: str, convert) -> dict:
+    """
+    Nadpisania w formacie JSON {"klucz": wartość}; każda wartość przechodzi przez convert().
+    Błędny JSON/wartość nie wywraca importu settings – ostrzeżenie i brak nadpisań (zostają domyślne).
+    """
+    raw = os.getenv(name) or "{}"
+    try:
+        data = json.loads(raw)
+        if not isinstance(data, dict):
+            raise ValueError("expected a JSON object")
+        return {str(key): convert(value) for key, value in data.items()}
+    except (ValueError, TypeError) as exc:
+        warnings.warn(f"Ignoring invalid {name}={raw!r}: {exc}", RuntimeWarning)
+        return {}
+
+def env_networks(name: str, default: str = "") -> list:
+    """Lista adresów/sieci IP (np. 127.0.0.1,10.0.0.0/8); błędne wpisy są pomijane z ostrzeżeniem."""
+    networks = []
+    for item in env_list(name, default):
+        try:
+            networks.append(ipaddress.ip_network(item, strict=False))
+        except ValueError:
+            warnings.warn(f"Ignoring invalid address in {name}: {item!r}", RuntimeWarning)
+    return networks
+
+def _price_pair(prices) -> tuple[float, float]:
+    prompt_price, completion_price = (float(p) for p in prices)
+    return prompt_price, completion_price
+
 SECRET_KEY = os.getenv("SECRET_KEY")
 DEBUG = env_bool("DEBUG", True)
 ALLOWED_HOSTS = env_list("ALLOWED_HOSTS", "*")
@@ -42,6 +75,11 @@ ALLOWED_HOSTS = env_list("ALLOWED_HOSTS", "*")
 
 MOCK_API_BASE = os.getenv("MOCK_API_BASE")
 
+# Lokalna kopia plików JSON snapshotów ERP/MES (snapshoty są niezmienne)
+ERP_MES_FILE_CACHE_DIR = Path(os.getenv("ERP_MES_FILE_CACHE_DIR", BASE_DIR / "cache" / "erp_mes"))
+# budżet LRU sparsowanych plików snapshotów w pamięci procesu (przybliżony, w bajtach)
+ERP_MES_FILE_CACHE_MAX_BYTES = int(os.getenv("ERP_MES_FILE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
 
 
 # Application definition
@@ -65,6 +103,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "proscientia.tracing.TracingMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -179,9 +218,15 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.AllowAny",
         "rest_framework.permissions.IsAuthenticated",
     ],
-    "DEFAULT_RENDER_CLASSES": [
-        "rest_framework.renderers.JSONRenderer"
-    ]
+    "DEFAULT_RENDERER_CLASSES": [
+        "proscientia.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "proscientia.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
 }
 
 SIMPLE_JWT = {
@@ -196,6 +241,30 @@ CSRF_TRUSTED_ORIGINS = env_list("CSRF_TRUSTED_ORIGINS", "http://localhost:5173")
 
 
 
+# Cache współdzielony przez procesy web i workery (blokady single-flight zadań,
+# cache manifestu mocka). Redis z CACHE_REDIS_URL / REDIS_URL, osobny prefiks kluczy.
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL") or os.getenv("REDIS_URL")
+if CACHE_REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_REDIS_URL,
+            "KEY_PREFIX": "proscientia",
+        }
+    }
+else:
+    # Jak przy bazie: bez Redisa (runserver + SQLite) fallback do pamięci procesu –
+    # deduplikacja zadań działa wtedy tylko w obrębie jednego procesu
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "KEY_PREFIX": "proscientia",
+        }
+    }
+
+# Jak długo klucz deduplikacji zadania (indeksowanie, streszczenie) blokuje duplikaty
+JOB_DEDUP_TTL = int(os.getenv("JOB_DEDUP_TTL", "1800"))
+
 # Broker/results – korzystamy z REDIS_URL z .env
 CELERY_BROKER_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
 CELERY_RESULT_BACKEND = CELERY_BROKER_URL
@@ -210,6 +279,51 @@ CELERY_TIMEZONE = TIME_ZONE
 # Opcjonalnie: logowanie czasu rozpoczęcia zadań
 CELERY_TASK_TRACK_STARTED = True
 
+# Kolejki – osobne pule workerów dla pracy CPU i I/O (patrz docker/celery/entrypoint.sh):
+#   cpu  – ekstrakcja PDF, chunking, ingest/KPI snapshotów (prefork, concurrency = liczba rdzeni)
+#   llm  – wywołania OpenAI (streszczenia, raporty) – czekanie na sieć, pula wątków
+#   io   – pobieranie plików z mocka (krótkie, pula wątków)
+#   sync – synchronizacja ERP/MES z Celery Beat (nie czeka za ciężkimi zadaniami)
+CELERY_TASK_DEFAULT_QUEUE = "default"
+CELERY_TASK_QUEUES = (
+    Queue("default"),
+    Queue("cpu"),
+    Queue("llm"),
+    Queue("io"),
+    Queue("sync"),
+)
+CELERY_TASK_ROUTES = {
+    "documents.tasks.parse_document_task": {"queue": "cpu"},
+    "ai_agents.tasks.process_document_indexing_task": {"queue": "cpu"},
+    "ai_agents.tasks.embed_chunks_batch_task": {"queue": "llm"},
+    "ai_agents.tasks.store_document_chunks_task": {"queue": "cpu"},
+    "ai_agents.tasks.index_mock_corpus_task": {"queue": "cpu"},
+    "ai_agents.tasks.index_documents_batch_task": {"queue": "default"},
+    "erp_mes.tasks.ingest_snapshot_task": {"queue": "cpu"},
+    "ai_agents.tasks.generate_summary_task": {"queue": "llm"},
+    "ai_agents.tasks.generate_erp_mes_latest_report_task": {"queue": "llm"},
+    "documents.tasks.fetch_and_store_file_task": {"queue": "io"},
+    "erp_mes.tasks.fetch_erp_mes_json_file_task": {"queue": "io"},
+    "erp_mes.tasks.sync_erp_mes_snapshots_task": {"queue": "sync"},
+}
+
+# Długie zadania: prefetch 1 (worker nie rezerwuje zadań, których nie zdąży zacząć),
+# ack po wykonaniu (restart workera nie gubi zadania). Prefetch per kolejka – flagi workera.
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TASK_ACKS_LATE = True
+CELERY_TASK_REJECT_ON_WORKER_LOST = True
+
+# Limity czasu (soft -> SoftTimeLimitExceeded w tasku, hard -> zabicie procesu potomnego).
+# Celery egzekwuje je tylko w puli prefork (worker-cpu: kolejki cpu, default). Pula threads (worker-llm,
+# worker-io, dev-owy "worker") ich nie stosuje – tam czas zadania ograniczają timeouty klientów:
+# OPENAI_TIMEOUT na żądanie (z OPENAI_MAX_RETRIES ponowieniami) i timeout MockErpMesClient (10 s na żądanie/odczyt).
+CELERY_TASK_SOFT_TIME_LIMIT = 600
+CELERY_TASK_TIME_LIMIT = 660
+CELERY_TASK_ANNOTATIONS = {
+    "ai_agents.tasks.process_document_indexing_task": {"soft_time_limit": 1800, "time_limit": 1860},
+    "erp_mes.tasks.ingest_snapshot_task": {"soft_time_limit": 1200, "time_limit": 1260},
+}
+
 # Przykładowy harmonogram dla automatycznego SYNC ERP/MES (Celery Beat)
 CELERY_BEAT_SCHEDULE = {
     "sync-erp-mes-snapshots-every-15-min": {
@@ -220,4 +334,65 @@ CELERY_BEAT_SCHEDULE = {
 
 # Konfiguracja OpenAI
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_MODEL_NAME = os.getenv("OPENAI_MODEL_NAME", "gpt-4o-mini")
\ No newline at end of file
+OPENAI_MODEL_NAME = os.getenv("OPENAI_MODEL_NAME", "gpt-4o-mini")
+# Inny endpoint zgodny z API OpenAI, np. lokalna atrapa do testów obciążeniowych (mock/fake_openai):
+# OPENAI_BASE_URL=http://fake-openai:8002/v1 (puste = api.openai.com)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+# Cennik do metryki kosztu (USD za 1M tokenów: wejście, wyjście); nadpisanie: OPENAI_PRICING='{"model": [in, out]}'
+OPENAI_PRICING = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "text-embedding-3-small": (0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.0),
+    **env_json_dict("OPENAI_PRICING", _price_pair),
+}
+# Okna kontekstu modeli (tokeny) – twardy limit budżetów promptu; nadpisanie: OPENAI_CONTEXT_WINDOWS='{"model": 32000}'
+OPENAI_CONTEXT_WINDOWS = {
+    "gpt-4o-mini": 128_000,
+    "gpt-4o": 128_000,
+    "gpt-4.1-mini": 1_047_576,
+    "gpt-4.1": 1_047_576,
+    **env_json_dict("OPENAI_CONTEXT_WINDOWS", int),
+}
+OPENAI_DEFAULT_CONTEXT_WINDOW = int(os.getenv("OPENAI_DEFAULT_CONTEXT_WINDOW", "16000"))
+# Tokeny zostawiane w oknie na odpowiedź modelu
+OPENAI_RESPONSE_RESERVE_TOKENS = int(os.getenv("OPENAI_RESPONSE_RESERVE_TOKENS", "2000"))
+# Docelowa liczba tokenów danych w prompcie (tokenizer modelu, nie znaki):
+# streszczenie dokumentu (wcześniej 20000 znaków) i raport ERP/MES (dzielony po równo między snapshoty)
+SUMMARY_INPUT_MAX_TOKENS = int(os.getenv("SUMMARY_INPUT_MAX_TOKENS", "6000"))
+REPORT_INPUT_MAX_TOKENS = int(os.getenv("REPORT_INPUT_MAX_TOKENS", "8000"))
+
+# Endpoint /metrics (proscientia/metrics.py): poza DEBUG tylko dla staffu i adresów z tej listy (adres lub sieć,
+# np. sieć dockera, z której scrapuje Prometheus: METRICS_ALLOWED_IPS=127.0.0.1,::1,172.16.0.0/12)
+METRICS_ALLOWED_NETWORKS = env_networks("METRICS_ALLOWED_IPS", "127.0.0.1,::1")
+
+# Tracing (proscientia/tracing.py): none | file | console | otlp (OTEL_EXPORTER_OTLP_ENDPOINT)
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()
+TRACING_FILE = os.getenv("TRACING_FILE", str(BASE_DIR / "traces.jsonl"))
+TRACING_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "proscientia-backend")
+TRACING_SAMPLE_RATIO = float(os.getenv("TRACING_SAMPLE_RATIO", "1.0"))
+# span na każde zapytanie SQL (przy ingestii snapshotów to tysiące spanów)
+TRACING_DB_SPANS = os.getenv("TRACING_DB_SPANS", "1").lower() in ("1", "true", "yes")
+
+# Agent wiedzy (RAG) – ile trafień wektorowych, ilu sąsiadów dokładamy
+# i jaki budżet tokenów ma kontekst wysyłany do modelu. Domyślnie bez sąsiadów i z budżetem
+# nie większym niż dawny kontekst (5 trafień × 1000 znaków ≈ 1,2-1,5 tys. tokenów) – sklejanie
+# overlapu ma zmniejszać prompt, a nie go powiększać; sąsiadów włącza się świadomie.
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "5"))
+RAG_NEIGHBOUR_RADIUS = int(os.getenv("RAG_NEIGHBOUR_RADIUS", "0"))
+RAG_CONTEXT_MAX_TOKENS = int(os.getenv("RAG_CONTEXT_MAX_TOKENS", "1200"))
+# Rozmiar chunka i overlap w tokenach tokenizera modelu embeddingów (wcześniej 1000 / 200 znaków)
+RAG_CHUNK_TOKENS = int(os.getenv("RAG_CHUNK_TOKENS", "256"))
+RAG_CHUNK_OVERLAP_TOKENS = int(os.getenv("RAG_CHUNK_OVERLAP_TOKENS", "50"))
+# Ile chunków na jedno wywołanie embeddings (= jeden task w chordzie indeksowania)
+RAG_EMBED_BATCH_SIZE = int(os.getenv("RAG_EMBED_BATCH_SIZE", "64"))
+# Ile nowych dokumentów trafia do jednego zadania harmonogramu indeksowania
+INDEXING_BATCH_SIZE = int(os.getenv("INDEXING_BATCH_SIZE", "50"))
+# Cena embeddingów (USD / 1M tokenów) – do szacowania kosztu masowego indeksowania
+EMBEDDING_PRICE_PER_1M_TOKENS = float(os.getenv("EMBEDDING_PRICE_PER_1M_TOKENS", "0.02"))
+
+# Limity użytkowników bez roli (dla ról: Role.max_uploads / Role.max_summaries_per_document)
+USER_UPLOAD_LIMIT = int(os.getenv("USER_UPLOAD_LIMIT", "5"))
+USER_SUMMARY_LIMIT = int(os.getenv("USER_SUMMARY_LIMIT", "3"))
@@ -0,0 +1,141 @@
+import datetime
+import decimal
+import io
+import ipaddress
+import os
+import uuid
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from erp_mes.models import ErpMesSnapshot
+
+from .renderers import ORJSONParser, ORJSONRenderer
+from .settings import env_json_dict, _price_pair
+
+
+class MetricsAccessTests(TestCase):
+    """/metrics poza DEBUG tylko dla staffu i adresów z METRICS_ALLOWED_IPS."""
+
+    def test_anonymous_client_from_outside_is_forbidden(self):
+        resp = self.client.get(reverse("metrics"), REMOTE_ADDR="203.0.113.7")
+        self.assertEqual(resp.status_code, 403)
+
+    @override_settings(METRICS_ALLOWED_NETWORKS=[ipaddress.ip_network("172.16.0.0/12")])
+    def test_allowed_network_can_scrape(self):
+        resp = self.client.get(reverse("metrics"), REMOTE_ADDR="172.18.0.5")
+        self.assertEqual(resp.status_code, 200)
+
+    def test_staff_user_can_read(self):
+        staff = get_user_model().objects.create_user(email="ops@example.com", password="x", is_staff=True)
+        self.client.force_login(staff)
+        resp = self.client.get(reverse("metrics"), REMOTE_ADDR="203.0.113.7")
+        self.assertEqual(resp.status_code, 200)
+
+
+class EnvJsonDictTests(TestCase):
+    """Błędne nadpisania JSON w zmiennych środowiskowych nie wywracają settings."""
+
+    def test_valid_pricing_override(self):
+        with mock.patch.dict(os.environ, {"OPENAI_PRICING": '{"gpt-x": [1, 2.5]}'}):
+            self.assertEqual(env_json_dict("OPENAI_PRICING", _price_pair), {"gpt-x": (1.0, 2.5)})
+
+    def test_invalid_values_are_ignored_with_warning(self):
+        for raw in ('{"gpt-x": [1, 2', '["gpt-x"]', '{"gpt-x": [1]}', '{"gpt-x": "cheap"}'):
+            with self.subTest(raw=raw), mock.patch.dict(os.environ, {"OPENAI_PRICING": raw}):
+                with self.assertWarns(RuntimeWarning):
+                    self.assertEqual(env_json_dict("OPENAI_PRICING", _price_pair), {})
+
+
+class ORJSONRendererTests(TestCase):
+    """ORJSONRenderer daje bajt w bajt to samo co JSONRenderer DRF (poprzedni domyślny renderer)."""
+
+    PAYLOAD = {
+        "created_at": datetime.datetime(2026, 1, 5, 6, 0, 0, 123456, tzinfo=datetime.timezone.utc),
+        "local": datetime.datetime(2026, 1, 5, 7, 0, tzinfo=datetime.timezone(datetime.timedelta(hours=1))),
+        "naive": datetime.datetime(2026, 1, 5, 6, 0),
+        "date": datetime.date(2026, 1, 5),
+        "time": datetime.time(6, 30, 1, 500),
+        "duration": datetime.timedelta(minutes=90),
+        "price": decimal.Decimal("12.50"),
+        "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+        "text": "zażółć „cytat” \u2028\u2029 </script>",
+        "numbers": [1, 2.5, 0.001, -0.0, 1234567.891, None, True],
+        "nested": {"a": {"b": []}, 1: "klucz int"},
+    }
+
+    def render_both(self, data, media_type=None):
+        return JSONRenderer().render(data, media_type), ORJSONRenderer().render(data, media_type)
+
+    def test_datetime_decimal_uuid(self):
+        body = ORJSONRenderer().render({k: self.PAYLOAD[k] for k in ("created_at", "local", "price", "id")})
+        self.assertEqual(
+            body,
+            b'{"created_at":"2026-01-05T06:00:00.123456Z","local":"2026-01-05T07:00:00+01:00",'
+            b'"price":12.5,"id":"12345678-1234-5678-1234-567812345678"}',
+        )
+
+    def test_matches_drf_renderer_byte_for_byte(self):
+        old, new = self.render_both(self.PAYLOAD)
+        self.assertEqual(new, old)
+        self.assertIn(b"\\u2028\\u2029", new)
+
+    def test_indent_and_big_int_fall_back_to_drf(self):
+        old, new = self.render_both(self.PAYLOAD, "application/json; indent=4")
+        self.assertEqual(new, old)
+        old, new = self.render_both({"big": 10**20})
+        self.assertEqual(new, old)
+
+    def test_exponent_floats_keep_value(self):
+        old, new = self.render_both({"v": [1e-7, 1.5e20]})
+        self.assertEqual((old, new), (b'{"v":[1e-07,1.5e+20]}', b'{"v":[1e-7,1.5e+20]}'))
+        self.assertEqual(JSONParser().parse(io.BytesIO(new)), JSONParser().parse(io.BytesIO(old)))
+
+    def test_nan_is_rendered_as_null(self):
+        # JSONRenderer (STRICT_JSON) rzuca tu ValueError – orjson zapisuje null
+        self.assertEqual(ORJSONRenderer().render({"v": float("nan")}), b'{"v":null}')
+        self.assertEqual(ORJSONRenderer().render(None), b"")
+
+    def test_api_response_matches_drf_renderer(self):
+        ErpMesSnapshot.objects.create(
+            stream="mes", version_date=datetime.date(2026, 1, 5), files=[{"name": "machines.json", "size": 10}],
+        )
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(email="json@example.com", password="x"))
+
+        resp = client.get(reverse("erp-mes-snapshots"))
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Content-Type"], "application/json")
+        self.assertEqual(resp.content, JSONRenderer().render(resp.data))
+
+
+class ORJSONParserTests(TestCase):
+    """ORJSONParser akceptuje to samo co JSONParser i zamienia błędy na ParseError (400)."""
+
+    def parse(self, raw: bytes):
+        return ORJSONParser().parse(io.BytesIO(raw))
+
+    def test_parses_like_drf_parser(self):
+        raw = '{"a": [1, 2.5, null], "b": "zażółć", "c": {"d": true}}'.encode()
+        self.assertEqual(self.parse(raw), JSONParser().parse(io.BytesIO(raw)))
+
+    def test_invalid_input_raises_parse_error(self):
+        for raw in (b'{"a": 1', b"", b"{'a': 1}", b'{"a": NaN}', b'"\xff"'):
+            with self.subTest(raw=raw):
+                with self.assertRaises(ParseError) as ctx:
+                    self.parse(raw)
+                self.assertTrue(str(ctx.exception.detail).startswith("JSON parse error - "))
+
+    def test_malformed_body_is_400(self):
+        resp = APIClient().post(
+            reverse("auth-login"), data=b'{"email": "x@example.com", "password": ', content_type="application/json",
+        )
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("JSON parse error", resp.json()["detail"])
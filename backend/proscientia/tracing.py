@@ -0,0 +1,221 @@
+"""
+Śledzenie (OpenTelemetry): żądanie HTTP -> task Celery -> etapy -> OpenAI / mock ERP/MES -> baza danych.
+
+TRACING_EXPORTER:
+  none    – domyślnie; span() i middleware nic nie robią (bez narzutu),
+  file    – JSON lines do TRACING_FILE (jeden span na linię, można grepować po trace_id),
+  console – stdout,
+  otlp    – OTLP/HTTP na OTEL_EXPORTER_OTLP_ENDPOINT (Jaeger, Tempo, otel-collector).
+
+Kontekst trace przechodzi do Celery w nagłówkach wiadomości (traceparent), do mocka ERP/MES w nagłówkach HTTP.
+Czasy etapów taska (kolejka, ekstrakcja, LLM, zapis...) zbiera StageTimings – taski zapisują je
+w AiArtifact.metadata["timings"].
+
+Podgląd lokalnie:
+    TRACING_EXPORTER=file TRACING_FILE=/tmp/traces.jsonl python manage.py runserver
+    grep <trace_id> /tmp/traces.jsonl
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+
+from celery.signals import before_task_publish, task_postrun, task_prerun
+from django.conf import settings
+from django.db import connection
+from opentelemetry import propagate, trace
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+# nagłówek z czasem wysłania taska – różnica przy starcie to czas oczekiwania w kolejce
+ENQUEUED_AT_HEADER = "trace_enqueued_at"
+
+_state: dict[str, Any] = {"pid": None, "tracer": None}
+_state_lock = threading.Lock()
+
+
+def tracing_enabled() -> bool:
+    return settings.TRACING_EXPORTER != "none"
+
+
+def get_tracer() -> trace.Tracer:
+    """
+    Tracer procesu. Provider tworzony leniwie i ponownie po fork() (prefork Celery) –
+    wątek BatchSpanProcessor nie przeżywa forka.
+    """
+    pid = os.getpid()
+    if _state["pid"] == pid:
+        return _state["tracer"]
+    with _state_lock:
+        if _state["pid"] != pid:
+            if tracing_enabled():
+                # SDK tylko przy włączonym eksporcie – bez tego wystarcza lekkie API (start procesu)
+                from proscientia.tracing_export import build_tracer_provider
+
+                _state["tracer"] = build_tracer_provider().get_tracer("proscientia")
+            else:
+                _state["tracer"] = trace.NoOpTracer()
+            _state["pid"] = pid
+    return _state["tracer"]
+
+
+@contextmanager
+def span(name: str, kind: SpanKind = SpanKind.INTERNAL, **attributes: Any) -> Iterator[trace.Span]:
+    """Span jako bieżący kontekst; wyjątek oznacza span jako błąd (i leci dalej)."""
+    with get_tracer().start_as_current_span(name, kind=kind, attributes=attributes or None) as current:
+        yield current
+
+
+def inject_headers(headers: dict[str, str]) -> dict[str, str]:
+    """Dopisuje traceparent bieżącego spanu do nagłówków wychodzącego żądania."""
+    if tracing_enabled():
+        propagate.inject(headers)
+    return headers
+
+
+def current_trace_id() -> str | None:
+    ctx = trace.get_current_span().get_span_context()
+    return format(ctx.trace_id, "032x") if ctx.is_valid else None
+
+
+# --- Czasy etapów (per task / żądanie) ---
+
+class StageTimings:
+    """Suma czasów etapów w ms (etap powtarzany, np. kolejne batche, się sumuje)."""
+
+    def __init__(self) -> None:
+        self.stages: dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = round(self.stages.get(stage, 0.0) + seconds * 1000, 2)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"trace_id": current_trace_id(), "stages_ms": dict(self.stages)}
+
+
+_current_timings: ContextVar[StageTimings | None] = ContextVar("stage_timings", default=None)
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+def current_stage_timings() -> StageTimings | None:
+    return _current_timings.get()
+
+
+@contextmanager
+def collect_stage_timings() -> Iterator[StageTimings]:
+    timings = StageTimings()
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+# --- Django ---
+
+def _db_span(execute, sql, params, many, context):
+    with span("db.query", SpanKind.CLIENT, **{
+        "db.system": context["connection"].vendor,
+        "db.statement": sql[:500],
+    }):
+        return execute(sql, params, many, context)
+
+
+class TracingMiddleware:
+    """Span SERVER dla żądania HTTP (kontekst z nagłówka traceparent, jeśli klient go przysłał)."""
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not tracing_enabled():
+            return self.get_response(request)
+
+        parent = propagate.extract(request.headers)
+        with ExitStack() as stack:
+            current = stack.enter_context(get_tracer().start_as_current_span(
+                f"{request.method} {request.path}", context=parent, kind=SpanKind.SERVER,
+                attributes={"http.request.method": request.method, "url.path": request.path},
+            ))
+            if settings.TRACING_DB_SPANS:
+                stack.enter_context(connection.execute_wrapper(_db_span))
+            response = self.get_response(request)
+            match = getattr(request, "resolver_match", None)
+            if match is not None and match.route:
+                current.update_name(f"{request.method} {match.route}")
+            current.set_attribute("http.response.status_code", response.status_code)
+            if response.status_code >= 500:
+                current.set_status(Status(StatusCode.ERROR))
+        return response
+
+
+# --- Celery ---
+
+@before_task_publish.connect
+def _inject_task_context(headers=None, **kwargs) -> None:
+    if headers is None:
+        return
+    # czas w kolejce trafia do metadanych artefaktu także bez eksportu spanów
+    headers[ENQUEUED_AT_HEADER] = time.time()
+    if tracing_enabled():
+        propagate.inject(headers)
+
+
+def _request_header(request, key: str):
+    # nagłówki własne trafiają jako atrybuty request (protokół 2) albo do request.headers
+    value = getattr(request, key, None)
+    if value is None:
+        value = (getattr(request, "headers", None) or {}).get(key)
+    return value
+
+
+_running: dict[str, ExitStack] = {}
+
+
+@task_prerun.connect
+def _start_task_span(task_id=None, task=None, **kwargs) -> None:
+    if task is None:
+        return
+    stack = ExitStack()
+    timings = stack.enter_context(collect_stage_timings())
+    enqueued_at = _request_header(task.request, ENQUEUED_AT_HEADER)
+    if enqueued_at:
+        timings.add("queue_wait", max(0.0, time.time() - float(enqueued_at)))
+
+    if tracing_enabled():
+        carrier = {
+            key: value for key in ("traceparent", "tracestate")
+            if (value := _request_header(task.request, key)) is not None
+        }
+        # bez traceparent (np. tryb eager) task dziedziczy bieżący kontekst wątku
+        parent = propagate.extract(carrier) if carrier else None
+        current = stack.enter_context(get_tracer().start_as_current_span(
+            f"celery.task {task.name}", context=parent, kind=SpanKind.CONSUMER,
+            attributes={"celery.task_id": task_id, "celery.task_name": task.name},
+        ))
+        if "queue_wait" in timings.stages:
+            current.set_attribute("celery.queue_wait_ms", timings.stages["queue_wait"])
+        if settings.TRACING_DB_SPANS:
+            stack.enter_context(connection.execute_wrapper(_db_span))
+    _running[task_id] = stack
+
+
+@task_postrun.connect
+def _end_task_span(task_id=None, state=None, **kwargs) -> None:
+    stack = _running.pop(task_id, None)
+    if stack is None:
+        return
+    current = trace.get_current_span()
+    if current.is_recording():
+        current.set_attribute("celery.state", state or "UNKNOWN")
+        if state == "FAILURE":
+            current.set_status(Status(StatusCode.ERROR))
+    stack.close()
@@ -0,0 +1,53 @@
+"""
+Część tracingu zależna od OpenTelemetry SDK (provider, sampler, eksportery).
+Importowana dopiero przez tracing.get_tracer() przy TRACING_EXPORTER != none.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Sequence
+
+from django.conf import settings
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SpanExporter,
+    SpanExportResult,
+)
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Eksport do pliku: jeden span (JSON) na linię, dopisywany przez wszystkie procesy."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = "".join(span.to_json(indent=None) + "\n" for span in spans)
+        with self._lock, open(self.path, "a", encoding="utf-8") as fh:
+            fh.write(lines)
+        return SpanExportResult.SUCCESS
+
+
+def build_exporter(kind: str) -> SpanExporter:
+    if kind == "file":
+        return JsonLinesSpanExporter(str(settings.TRACING_FILE))
+    if kind == "console":
+        return ConsoleSpanExporter()
+    if kind == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()  # endpoint z OTEL_EXPORTER_OTLP_ENDPOINT
+    raise ValueError(f"Unknown TRACING_EXPORTER: {kind!r}")
+
+
+def build_tracer_provider() -> TracerProvider:
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.TRACING_SERVICE_NAME}),
+        sampler=ParentBased(TraceIdRatioBased(settings.TRACING_SAMPLE_RATIO)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(build_exporter(settings.TRACING_EXPORTER)))
+    return provider
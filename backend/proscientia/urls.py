@@ -20,6 +20,8 @@ from django.urls import path, include
 from django.conf import settings             # <--- NOWE
 from django.conf.urls.static import static
 
+from proscientia.metrics import metrics_view
+
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -28,6 +30,7 @@ urlpatterns = [
     path("api/erp-mes/", include("erp_mes.urls")),
     path("api/documents/", include("documents.urls")),
     path('api/agents/', include('ai_agents.urls')),
+    path("metrics", metrics_view, name="metrics"),
 ]
 
 if settings.DEBUG:
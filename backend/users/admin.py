@@ -1,10 +1,10 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, Role
+from .models import User, Role, QuotaCounter
 
 @admin.register(Role)
 class RoleAdmin(admin.ModelAdmin):
-    list_display = ("id", "name", "short_description")
+    list_display = ("id", "name", "max_uploads", "max_summaries_per_document", "short_description")
     search_fields = ("name",)
     
     def short_description(self, obj):
@@ -44,4 +44,11 @@ class UserAdmin(BaseUserAdmin):
     search_fields = ("email", "first_name", "last_name")
 
 
-admin.site.register(User, UserAdmin)
\ No newline at end of file
+admin.site.register(User, UserAdmin)
+
+
+@admin.register(QuotaCounter)
+class QuotaCounterAdmin(admin.ModelAdmin):
+    list_display = ("user", "kind", "object_id", "used", "updated_at")
+    list_filter = ("kind",)
+    search_fields = ("user__email",)
@@ -13,6 +13,10 @@ class Role(models.Model):
     """
     name = models.CharField(max_length=50, unique=True)
     description = models.TextField(blank=True)
+
+    # limity per rola (użytkownik bez roli -> USER_UPLOAD_LIMIT / USER_SUMMARY_LIMIT z settings)
+    max_uploads = models.PositiveIntegerField(default=5)
+    max_summaries_per_document = models.PositiveIntegerField(default=3)
     
     def __str__(self):
         return self.name
@@ -69,4 +73,31 @@ class User(AbstractBaseUser, PermissionsMixin):
     REQUIRED_FIELDS = []
     
     def __str__(self):
-        return f"{self.first_name} {self.last_name} - {self.email}" or f"User {self.pk}"
\ No newline at end of file
+        return f"{self.first_name} {self.last_name} - {self.email}" or f"User {self.pk}"
+
+
+class QuotaCounter(models.Model):
+    """
+    Zdenormalizowany licznik zużycia limitu (uploady, streszczenia).
+    Jeden wiersz na (user, kind, object_id); object_id=0 dla liczników globalnych,
+    id dokumentu dla liczników per dokument.
+    Aktualizowany tylko warunkowym UPDATE z F() – patrz users/services.py.
+    """
+    KIND_UPLOAD = "upload"
+    KIND_SUMMARY = "summary"
+    KIND_CHOICES = [
+        (KIND_UPLOAD, "Uploady plików"),
+        (KIND_SUMMARY, "Streszczenia dokumentu"),
+    ]
+
+    user = models.ForeignKey("users.User", on_delete=models.CASCADE, related_name="quota_counters")
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField(default=0)
+    used = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("user", "kind", "object_id")
+
+    def __str__(self):
+        return f"{self.user_id} {self.kind}:{self.object_id} = {self.used}"      # type: ignore[attr-defined]
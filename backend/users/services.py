@@ -0,0 +1,90 @@
+"""
+Limity użytkowników (uploady, streszczenia) oparte o liczniki QuotaCounter.
+
+Zamiast COUNT(*) przy każdym żądaniu trzymamy licznik per (user, kind, object_id).
+Sprawdzenie i inkrementacja to jeden warunkowy UPDATE:
+
+    UPDATE ... SET used = used + 1 WHERE id = ... AND used < limit
+
+więc dwa równoległe żądania nie przekroczą limitu (baza serializuje UPDATE na wierszu).
+"""
+from __future__ import annotations
+
+from typing import Callable
+
+from django.conf import settings
+from django.db.models import F
+
+from .models import QuotaCounter
+
+
+def get_quota_limit(user, kind: str) -> int:
+    """Limit dla danego rodzaju – z roli użytkownika albo domyślny z settings."""
+    role = getattr(user, "role", None)
+    if kind == QuotaCounter.KIND_UPLOAD:
+        return role.max_uploads if role else settings.USER_UPLOAD_LIMIT
+    if kind == QuotaCounter.KIND_SUMMARY:
+        return role.max_summaries_per_document if role else settings.USER_SUMMARY_LIMIT
+    raise ValueError(f"Nieznany rodzaj limitu: {kind}")
+
+
+def _get_counter(user, kind: str, object_id: int, seed: Callable[[], int] | None) -> QuotaCounter:
+    """
+    Zwraca licznik, tworząc go przy pierwszym użyciu.
+    `seed` (np. dotychczasowy COUNT) wołany jest tylko raz – przy tworzeniu wiersza –
+    żeby istniejące dane były uwzględnione po wdrożeniu liczników.
+    """
+    counter = QuotaCounter.objects.filter(user=user, kind=kind, object_id=object_id).first()
+    if counter is not None:
+        return counter
+    counter, _ = QuotaCounter.objects.get_or_create(
+        user=user,
+        kind=kind,
+        object_id=object_id,
+        defaults={"used": seed() if seed else 0},
+    )
+    return counter
+
+
+def try_consume_quota(
+    user,
+    kind: str,
+    object_id: int = 0,
+    seed: Callable[[], int] | None = None,
+    reconcile: bool = False,
+) -> tuple[bool, int]:
+    """
+    Atomowo zużywa jedną jednostkę limitu.
+    Zwraca (True, limit) gdy się udało, (False, limit) gdy limit jest wyczerpany.
+
+    reconcile=True: licznik to tylko szybka ścieżka – przy odmowie porównujemy go z faktycznym stanem
+    (`seed`, np. COUNT aktywnych dokumentów) i obniżamy, jeśli się rozjechał (zmiany z pominięciem
+    sygnałów, np. queryset.update). Nie dla streszczeń – tam licznik obejmuje też zadania w toku.
+    """
+    limit = get_quota_limit(user, kind)
+    if user.is_anonymous:
+        return False, limit
+
+    counter = _get_counter(user, kind, object_id, seed)
+    updated = QuotaCounter.objects.filter(pk=counter.pk, used__lt=limit).update(used=F("used") + 1)
+    if not updated and reconcile and seed is not None:
+        actual = seed()
+        if QuotaCounter.objects.filter(pk=counter.pk, used__gt=actual).update(used=actual):
+            updated = QuotaCounter.objects.filter(pk=counter.pk, used__lt=limit).update(used=F("used") + 1)
+    return updated == 1, limit
+
+
+def add_quota_usage(user_id: int, kind: str, object_id: int = 0) -> None:
+    """Dolicza jednostkę bez sprawdzania limitu (np. ponowna aktywacja dokumentu w adminie)."""
+    QuotaCounter.objects.filter(user_id=user_id, kind=kind, object_id=object_id).update(used=F("used") + 1)
+
+
+def release_quota(user_id: int, kind: str, object_id: int = 0) -> None:
+    """
+    Zwalnia jedną jednostkę limitu (usunięcie pliku/streszczenia albo nieudany task).
+    Usunięcia i dezaktywacje dokumentów/artefaktów zwalniają limit przez sygnały (ai_agents/signals.py).
+    Nie schodzi poniżej zera.
+    """
+    QuotaCounter.objects.filter(
+        user_id=user_id, kind=kind, object_id=object_id, used__gt=0
+    ).update(used=F("used") - 1)
@@ -1,3 +1,101 @@
-from django.test import TestCase
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from ai_agents.models import AiArtifact
+from documents.models import Document
+from documents.views import count_user_uploaded_documents
+
+from .models import QuotaCounter
+from .services import _get_counter, release_quota, try_consume_quota
+
+
+def used(user, kind=QuotaCounter.KIND_UPLOAD, object_id=0):
+    return QuotaCounter.objects.get(user=user, kind=kind, object_id=object_id).used
+
+
+@override_settings(USER_UPLOAD_LIMIT=2, USER_SUMMARY_LIMIT=1)
+class QuotaCounterTests(TestCase):
+    """Limity: warunkowy UPDATE, zwalnianie i zgodność licznika z faktycznym stanem."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email="quota@example.com", password="x")
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=tmp.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def consume_upload(self):
+        return try_consume_quota(
+            self.user, QuotaCounter.KIND_UPLOAD,
+            seed=lambda: count_user_uploaded_documents(self.user), reconcile=True,
+        )[0]
+
+    def upload(self):
+        self.assertTrue(self.consume_upload())
+        return Document.objects.create(source=Document.SOURCE_USER_UPLOAD, title="f", uploaded_by=self.user)
+
+    def test_limit_is_enforced(self):
+        self.assertEqual(try_consume_quota(self.user, QuotaCounter.KIND_SUMMARY, object_id=7), (True, 1))
+        self.assertEqual(try_consume_quota(self.user, QuotaCounter.KIND_SUMMARY, object_id=7), (False, 1))
+        # inny dokument ma własny licznik
+        self.assertTrue(try_consume_quota(self.user, QuotaCounter.KIND_SUMMARY, object_id=8)[0])
+
+    def test_stale_counter_read_cannot_exceed_limit(self):
+        counter = _get_counter(self.user, QuotaCounter.KIND_SUMMARY, 7, None)
+        QuotaCounter.objects.filter(pk=counter.pk).update(used=1)  # równoległe żądanie wygrało
+        with mock.patch("users.services._get_counter", return_value=counter):
+            self.assertFalse(try_consume_quota(self.user, QuotaCounter.KIND_SUMMARY, object_id=7)[0])
+        self.assertEqual(used(self.user, QuotaCounter.KIND_SUMMARY, 7), 1)
+
+    def test_release_does_not_go_below_zero(self):
+        try_consume_quota(self.user, QuotaCounter.KIND_SUMMARY, object_id=7)
+        release_quota(self.user.id, QuotaCounter.KIND_SUMMARY, 7)
+        release_quota(self.user.id, QuotaCounter.KIND_SUMMARY, 7)
+        self.assertEqual(used(self.user, QuotaCounter.KIND_SUMMARY, 7), 0)
+
+    def test_delete_and_deactivation_free_upload_quota(self):
+        first, second = self.upload(), self.upload()
+        self.assertFalse(self.consume_upload())
+
+        first.delete()
+        self.assertEqual(used(self.user), 1)
+
+        second.is_active = False
+        second.save()
+        self.assertEqual(used(self.user), 0)
+        second.delete()  # już zwolniony przy dezaktywacji
+        self.assertEqual(used(self.user), 0)
+
+    def test_reactivation_counts_again(self):
+        doc = self.upload()
+        doc.is_active = False
+        doc.save()
+        doc.is_active = True
+        doc.save(update_fields=["is_active"])
+        self.assertEqual(used(self.user), 1)
+
+    def test_counter_is_reconciled_after_changes_bypassing_signals(self):
+        self.upload()
+        self.upload()
+        Document.objects.filter(uploaded_by=self.user).update(is_active=False)
+        self.assertEqual(used(self.user), 2)
+
+        self.assertTrue(self.consume_upload())
+        self.assertEqual(used(self.user), 1)
+
+    def test_deleting_summary_artifact_frees_summary_quota(self):
+        doc = Document.objects.create(source=Document.SOURCE_MOCK_DOCS, title="spec")
+        self.assertTrue(try_consume_quota(self.user, QuotaCounter.KIND_SUMMARY, object_id=doc.id)[0])
+        artifact = AiArtifact(owner=self.user, document=doc, artifact_type=AiArtifact.TYPE_SUMMARY, title="s")
+        artifact.file.save("s.txt", ContentFile(b"x"), save=True)
+
+        artifact.delete()
+        self.assertEqual(used(self.user, QuotaCounter.KIND_SUMMARY, doc.id), 0)
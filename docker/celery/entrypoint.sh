@@ -1,7 +1,13 @@
 #!/usr/bin/env bash
 set -e
 
-# ROLE=worker|beat (domyślnie worker)
+# ROLE=worker|worker-cpu|worker-llm|worker-io|beat (domyślnie worker)
+#   worker      – jeden worker na wszystkie kolejki (tryb dev, jak dotychczas)
+#   worker-cpu  – kolejki cpu,default; prefork (procesy), concurrency = liczba rdzeni
+#   worker-llm  – kolejka llm; pula wątków – zadania głównie czekają na OpenAI
+#   worker-io   – kolejki io,sync; pula wątków – pobieranie plików i sync z Beat
+# Pula wątków nie egzekwuje soft/hard time limit Celery (działają tylko w prefork) – czas zadań
+# llm/io ograniczają timeouty klientów (OPENAI_TIMEOUT, timeout MockErpMesClient).
 ROLE="${ROLE:-worker}"
 
 # Ustaw domyślny moduł settings, jeśli nie podano
@@ -15,12 +21,42 @@ echo "[celery] DATABASE: ${DB_NAME:-} @ ${DB_HOST:-}:${DB_PORT:-}"
 
 cd /app
 
-if [ "$ROLE" = "beat" ]; then
-  echo "[celery] Starting Celery Beat..."
-  exec celery -A proscientia.celery_app beat -l INFO
-else
-  echo "[celery] Starting Celery Worker..."
-  exec celery -A proscientia.celery_app worker -l INFO --pool=threads
+# Metryki Prometheusa (proscientia/metrics.py): w trybie wieloprocesowym katalog musi być pusty przy starcie
+if [ -n "${PROMETHEUS_MULTIPROC_DIR:-}" ]; then
+  rm -rf "${PROMETHEUS_MULTIPROC_DIR}"
+  mkdir -p "${PROMETHEUS_MULTIPROC_DIR}"
+  echo "[celery] PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR}, metrics port ${CELERY_METRICS_PORT:-off}"
 fi
 
+case "$ROLE" in
+  beat)
+    echo "[celery] Starting Celery Beat..."
+    exec celery -A proscientia.celery_app beat -l INFO
+    ;;
+  worker-cpu)
+    echo "[celery] Starting CPU worker (prefork)..."
+    exec celery -A proscientia.celery_app worker -l INFO -n cpu@%h \
+      -Q cpu,default --pool=prefork \
+      --concurrency="${CELERY_CPU_CONCURRENCY:-$(nproc)}" \
+      --prefetch-multiplier=1 --max-tasks-per-child="${CELERY_CPU_MAX_TASKS_PER_CHILD:-50}"
+    ;;
+  worker-llm)
+    echo "[celery] Starting LLM worker (threads)..."
+    exec celery -A proscientia.celery_app worker -l INFO -n llm@%h \
+      -Q llm --pool=threads \
+      --concurrency="${CELERY_LLM_CONCURRENCY:-16}" --prefetch-multiplier=1
+    ;;
+  worker-io)
+    echo "[celery] Starting I/O worker (threads)..."
+    exec celery -A proscientia.celery_app worker -l INFO -n io@%h \
+      -Q io,sync --pool=threads \
+      --concurrency="${CELERY_IO_CONCURRENCY:-8}" --prefetch-multiplier=4
+    ;;
+  *)
+    echo "[celery] Starting Celery Worker (all queues)..."
+    exec celery -A proscientia.celery_app worker -l INFO \
+      -Q default,cpu,llm,io,sync --pool=threads
+    ;;
+esac
+
 # fix
\ No newline at end of file
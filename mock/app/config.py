@@ -8,6 +8,9 @@ MOCK_DATA_ROOT = Path(os.getenv("MOCK_DATA_ROOT", BASE_DIR / "data")).resolve()
 MOCK_MANIFEST_PATH = Path(os.getenv("MOCK_MANIFEST_PATH", MOCK_DATA_ROOT / "manifest.json")).resolve()
 DOCS_DIR = MOCK_DATA_ROOT / "docs"
 
+# Indeks listingów w pamięci: dodatkowo obserwuj zmiany plików (wymaga pakietu watchfiles)
+MOCK_INDEX_WATCH = os.getenv("MOCK_INDEX_WATCH", "0").lower() in ("1", "true", "yes")
+
 # Proste parse date (YYYY-MM-DD), bez twardej walidacji na razie
 def normalize_date(date: str | None) -> str | None:
     return date.strip() if date else None
@@ -1,13 +1,15 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from .config import DOCS_DIR
+from .config import DOCS_DIR, MOCK_INDEX_WATCH
 from .routers import erp as erp_router
 from .routers import mes as mes_router
 from .routers import files as files_router
 from .routers import manifest as manifest_router
+from .utils.index import mock_index
+from .utils.responses import ORJSONResponse
 
-app = FastAPI(title="Mock ERP/MES API", version="0.1.0")
+app = FastAPI(title="Mock ERP/MES API", version="0.1.0", default_response_class=ORJSONResponse)
 
 # w razie potrzeb można zawęzić - do projektu pokazowego może być '*'
 app.add_middleware(
@@ -18,6 +20,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if MOCK_INDEX_WATCH:
+    mock_index.start_watcher()
+
 # Healthcheck
 @app.get("/health", tags=["meta"])
 def health():
@@ -1,12 +1,17 @@
-from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import FileResponse
+import mimetypes
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response
 from pathlib import Path
 from ..config import MOCK_DATA_ROOT, DOCS_DIR
+from ..utils.compression import choose_encoding, compressed_file, is_compressible
+from ..utils.index import mock_index
 
 router = APIRouter(prefix="/files", tags=["files"])
 
 @router.get("")
 def get_single_file(
+    request: Request,
     name: str = Query(..., description="Nazwa pliku (np. instrukcja_montazu_v2.pdf)"),
     date: str | None = Query(default=None, description="YYYY-MM-DD (dla plików w erp/mes)"),
     stream: str | None = Query(default=None, description="erp | mes | docs"),
@@ -15,6 +20,11 @@ def get_single_file(
     Zwraca pojedynczy plik:
       - stream=docs -> szuka w data/docs/{name}
       - stream=erp/mes -> szuka w data/{stream}/{date}/{name}
+
+    Transfer:
+      - nagłówek Range -> 206 z fragmentem pliku (bez kompresji, zakres dotyczy oryginalnych bajtów),
+      - pliki tekstowe (JSON/TXT/CSV...) -> gzip/br wg Accept-Encoding; najpierw prekompresowany
+        plik obok oryginału (orders.json.br / .gz); brakujący jest tworzony przy pierwszym żądaniu.
     """
     if stream not in {"erp", "mes", "docs"}:
         raise HTTPException(status_code=400, detail="Invalid 'stream' (erp|mes|docs)")
@@ -29,8 +39,26 @@ def get_single_file(
     if not path.exists() or not path.is_file():
         raise HTTPException(status_code=404, detail=f"File not found: {path.name}")
 
-    # FastAPI/Starlette ustawi Content-Type na podstawie rozszerzenia
-    return FileResponse(path)
+    # FastAPI/Starlette ustawi Content-Type na podstawie rozszerzenia i obsłuży Range (206/416)
+    if not is_compressible(path):
+        return FileResponse(path)
+
+    headers = {"Vary": "Accept-Encoding"}
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    if encoding is None or "range" in request.headers:
+        return FileResponse(path, headers=headers)
+
+    media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    headers["Content-Encoding"] = encoding
+
+    body = compressed_file(path, encoding)
+    if body is None:
+        # plik za mały na kompresję
+        del headers["Content-Encoding"]
+        return FileResponse(path, headers=headers)
+    if isinstance(body, Path):
+        return FileResponse(body, media_type=media_type, headers=headers)
+    return Response(body, media_type=media_type, headers=headers)
 
 
 @router.get("/docs-list")
@@ -42,19 +70,4 @@ def list_docs() -> dict:
     zwracamy ścieżkę względną względem DOCS_DIR:
       - "ventilator_pb560/spec_pb560_requirements.pdf"
     """
-    if not DOCS_DIR.exists():
-        return {"files": []}
-
-    files: list[dict] = []
-    for p in DOCS_DIR.rglob("*"):
-        if p.is_file():
-            rel_path = p.relative_to(DOCS_DIR).as_posix()
-            files.append(
-                {
-                    "name": rel_path,
-                    "size": p.stat().st_size,
-                }
-            )
-
-    files_sorted = sorted(files, key=lambda x: x["name"])
-    return {"files": files_sorted}
\ No newline at end of file
+    return {"files": mock_index.docs_tree()}
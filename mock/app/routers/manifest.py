@@ -1,6 +1,5 @@
 from fastapi import APIRouter
-from ..config import MOCK_MANIFEST_PATH
-from ..utils.manifest import read_manifest
+from ..utils.index import mock_index
 
 router = APIRouter(tags=["manifest"])
 
@@ -21,5 +20,4 @@ def get_manifest():
       }
     }
     """
-    manifest = read_manifest(MOCK_MANIFEST_PATH)
-    return manifest
+    return mock_index.manifest()
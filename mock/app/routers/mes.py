@@ -1,23 +1,28 @@
-from fastapi import APIRouter, HTTPException, Query
-from pathlib import Path
-from ..config import MOCK_DATA_ROOT
-from ..utils.manifest import read_manifest, latest_for
+from fastapi import APIRouter, HTTPException, Query, Request
+from ..utils.bundle import snapshot_bundle_response
+from ..utils.index import mock_index
 
 router = APIRouter(prefix="/mes", tags=["mes"])
 
 @router.get("")
 def get_mes_listing(date: str | None = Query(default=None, description="YYYY-MM-DD (brak = latest)")):
-    manifest = read_manifest(MOCK_DATA_ROOT / "manifest.json")
-    target_date = date or latest_for("mes", manifest)
+    # manifest i listing z indeksu w pamięci (unieważnianego po mtime) – bez czytania dysku przy każdym żądaniu
+    target_date = date or mock_index.latest_for("mes")
     if not target_date:
         return {"date": None, "files": []}
 
-    folder = MOCK_DATA_ROOT / "mes" / target_date
-    if not folder.exists():
+    files = mock_index.snapshot_listing("mes", target_date)
+    if files is None:
         raise HTTPException(status_code=404, detail=f"MES snapshot for {target_date} not found")
 
-    files = []
-    for p in folder.iterdir():
-        if p.is_file():
-            files.append({"name": p.name, "size": p.stat().st_size})
-    return {"date": target_date, "files": sorted(files, key=lambda x: x["name"])}
\ No newline at end of file
+    return {"date": target_date, "files": files}
+
+
+@router.get("/bundle")
+def get_mes_bundle(
+    request: Request,
+    date: str | None = Query(default=None, description="YYYY-MM-DD (brak = latest)"),
+    names: str | None = Query(default=None, description="Opcjonalnie: lista plików po przecinku"),
+):
+    # cały snapshot jednym żądaniem (strumieniowy tar) zamiast N zapytań do /files
+    return snapshot_bundle_response("mes", date, names, request)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import tarfile
+import zlib
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from ..config import MOCK_DATA_ROOT
+from .compression import choose_encoding
+from .index import mock_index
+
+CHUNK_SIZE = 256 * 1024
+BLOCK = tarfile.BLOCKSIZE
+
+
+def iter_tar(folder: Path, names: Iterable[str]) -> Iterator[bytes]:
+    """
+    Strumieniowy tar (ustar/pax) z plików folderu – nagłówek + treść w kawałkach po CHUNK_SIZE,
+    bez budowania całego archiwum w pamięci (tarfile.addfile buforowałby cały plik).
+    """
+    for name in names:
+        path = folder / name
+        st = path.stat()
+        info = tarfile.TarInfo(name)
+        info.size = st.st_size
+        info.mtime = int(st.st_mtime)
+        info.mode = 0o644
+        yield info.tobuf(format=tarfile.PAX_FORMAT)
+
+        remaining = info.size
+        with open(path, "rb") as f:
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        # plik skrócony w trakcie odczytu – dopełniamy, żeby nie rozjechać archiwum
+        if remaining:
+            yield b"\0" * remaining
+        pad = -info.size % BLOCK
+        if pad:
+            yield b"\0" * pad
+    # koniec archiwum: dwa puste bloki
+    yield b"\0" * (2 * BLOCK)
+
+
+def iter_gzip(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # nagłówek gzip
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def snapshot_bundle_response(stream: str, date: str | None, names: str | None, request: Request) -> StreamingResponse:
+    """
+    Cały snapshot (albo wybrane pliki: names=a.json,b.json) jako jeden strumieniowy tar.
+    Przy Accept-Encoding: gzip strumień jest kompresowany w locie (tar.gz).
+    """
+    target_date = date or mock_index.latest_for(stream)
+    if not target_date:
+        raise HTTPException(status_code=404, detail=f"No {stream.upper()} snapshots")
+
+    files = mock_index.snapshot_listing(stream, target_date)
+    if files is None:
+        raise HTTPException(status_code=404, detail=f"{stream.upper()} snapshot for {target_date} not found")
+
+    selected = [f["name"] for f in files]
+    if names:
+        wanted = {n.strip() for n in names.split(",") if n.strip()}
+        selected = [n for n in selected if n in wanted]
+
+    body: Iterator[bytes] = iter_tar(MOCK_DATA_ROOT / stream / target_date, selected)
+    headers = {
+        "Content-Disposition": f'attachment; filename="{stream}_{target_date}.tar"',
+        "X-Snapshot-Date": target_date,
+        "Vary": "Accept-Encoding",
+    }
+    # bundle kompresujemy strumieniowo zlib-em (gzip) – bez zależności od pakietu brotli
+    if choose_encoding(request.headers.get("accept-encoding"), ("gzip",)):
+        body = iter_gzip(body)
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(body, media_type="application/x-tar", headers=headers)
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import gzip
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:  # brotli opcjonalny – bez niego serwujemy tylko gzip
+    brotli = None
+
+# Pliki tekstowe, które opłaca się kompresować (PDF/obrazy są już skompresowane)
+COMPRESSIBLE_SUFFIXES = {".json", ".txt", ".csv", ".md", ".xml", ".yaml", ".yml"}
+
+# Sufiksy prekompresowanych plików obok oryginału: orders.json.br / orders.json.gz
+SIDECAR_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+# Małych plików nie kompresujemy – narzut nagłówków gzip zjada zysk
+MIN_COMPRESS_SIZE = 1024
+
+
+def is_compressible(path: Path) -> bool:
+    return path.suffix.lower() in COMPRESSIBLE_SUFFIXES
+
+
+# Plik tymczasowy w trakcie zapisu pliku pomocniczego: .orders.json.br.XXXX.tmp
+_SIDECAR_TMP_PREFIX = "."
+_SIDECAR_TMP_SUFFIX = ".tmp"
+
+
+def is_sidecar(name: str) -> bool:
+    """True dla prekompresowanego pliku pomocniczego (nie pokazujemy go w listingach)."""
+    if name.startswith(_SIDECAR_TMP_PREFIX) and name.endswith(_SIDECAR_TMP_SUFFIX):
+        return True
+    p = Path(name)
+    return p.suffix in SIDECAR_SUFFIXES.values() and is_compressible(p.with_suffix(""))
+
+
+def supported_encodings() -> tuple[str, ...]:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(accept_encoding: str | None, supported: tuple[str, ...] | None = None) -> str | None:
+    """
+    Wybiera kodowanie z nagłówka Accept-Encoding (kolejność wg supported, domyślnie br > gzip), pomijając q=0.
+    Zwraca None, gdy klient nie akceptuje żadnego z obsługiwanych.
+    """
+    if not accept_encoding:
+        return None
+
+    accepted: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+
+    for encoding in supported or supported_encodings():
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > 0:
+            return encoding
+    return None
+
+
+def fresh_sidecar(path: Path, encoding: str) -> Path | None:
+    """Prekompresowany plik obok oryginału – tylko jeśli nie jest starszy od oryginału."""
+    sidecar = path.with_name(path.name + SIDECAR_SUFFIXES[encoding])
+    try:
+        if sidecar.stat().st_mtime_ns >= path.stat().st_mtime_ns:
+            return sidecar
+    except FileNotFoundError:
+        pass
+    return None
+
+
+def compress_bytes(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def write_sidecar(path: Path, encoding: str, data: bytes | None = None) -> Path:
+    """
+    Kompresuje plik i zapisuje wynik obok oryginału (orders.json.br / .gz) – atomowo przez plik tymczasowy,
+    więc równoległe żądania nie zobaczą połowy pliku. Jeśli oryginał zmienił się w trakcie kompresji,
+    plik pomocniczy jest usuwany (byłby świeższy od oryginału, ale z nieaktualną treścią).
+    """
+    before = path.stat()
+    if data is None:
+        data = path.read_bytes()
+    sidecar = path.with_name(path.name + SIDECAR_SUFFIXES[encoding])
+    fd, tmp = tempfile.mkstemp(
+        dir=path.parent, prefix=_SIDECAR_TMP_PREFIX + sidecar.name + ".", suffix=_SIDECAR_TMP_SUFFIX,
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(compress_bytes(data, encoding))
+        os.replace(tmp, sidecar)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    after = path.stat()
+    if (after.st_mtime_ns, after.st_size) != (before.st_mtime_ns, before.st_size):
+        sidecar.unlink(missing_ok=True)
+        raise FileNotFoundError(f"{path} changed while compressing")
+    return sidecar
+
+
+def compressed_file(path: Path, encoding: str) -> Path | bytes | None:
+    """
+    Skompresowana zawartość pliku do wysłania:
+      - Path – plik pomocniczy na dysku (istniejący albo zapisany teraz; kolejne żądania czytają go z dysku,
+        proces nie trzyma skompresowanych plików w pamięci),
+      - bytes – kompresja tylko dla tego żądania, gdy katalogu danych nie da się zapisać,
+      - None, gdy plik jest za mały, żeby kompresja miała sens.
+    """
+    if path.stat().st_size < MIN_COMPRESS_SIZE:
+        return None
+    sidecar = fresh_sidecar(path, encoding)
+    if sidecar is not None:
+        return sidecar
+    data = path.read_bytes()
+    try:
+        return write_sidecar(path, encoding, data)
+    except OSError as exc:
+        # np. dane zamontowane tylko do odczytu – wtedy warto odpalić precompress_tree przy budowie obrazu
+        logger.warning("Cannot write compressed copy of %s (%s), compressing per request", path, exc)
+        return compress_bytes(data, encoding)
+
+
+def precompress_tree(root: Path, encodings: tuple[str, ...] | None = None) -> int:
+    """Zapisuje pliki .gz/.br obok kompresowalnych plików w root. Zwraca liczbę zapisanych plików."""
+    written = 0
+    for dirpath, _dirnames, filenames in os.walk(root):
+        for name in filenames:
+            path = Path(dirpath) / name
+            if not is_compressible(path) or path.stat().st_size < MIN_COMPRESS_SIZE:
+                continue
+            data = path.read_bytes()
+            for encoding in encodings or supported_encodings():
+                if fresh_sidecar(path, encoding) is not None:
+                    continue
+                sidecar = write_sidecar(path, encoding, data)
+                written += 1
+                logger.info("precompressed %s (%s)", sidecar, encoding)
+    return written
+
+
+if __name__ == "__main__":
+    # python -m app.utils.compression  (z katalogu mock/)
+    from ..config import MOCK_DATA_ROOT
+
+    logging.basicConfig(level=logging.INFO)
+    print(f"Zapisano {precompress_tree(MOCK_DATA_ROOT)} plików prekompresowanych w {MOCK_DATA_ROOT}")
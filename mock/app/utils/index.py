@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable
+
+from ..config import DOCS_DIR, MOCK_DATA_ROOT, MOCK_MANIFEST_PATH
+from .compression import is_sidecar
+from .manifest import read_manifest
+
+logger = logging.getLogger(__name__)
+
+
+def _stat_signature(path: Path) -> tuple[int, int] | None:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _folder_signature(folder: Path) -> tuple | None:
+    """
+    Sygnatura katalogu: mtime/rozmiar samego katalogu (dodanie/usunięcie/zmiana nazwy pliku) oraz
+    (nazwa, mtime, rozmiar) każdego pliku – nadpisanie pliku w miejscu nie zmienia mtime katalogu.
+    Pliki pomocnicze (.gz/.br) pomijamy, więc ich zapis nie unieważnia listingu.
+    """
+    sig = _stat_signature(folder)
+    if sig is None:
+        return None
+    files = []
+    try:
+        with os.scandir(folder) as it:
+            for entry in it:
+                if entry.is_file() and not is_sidecar(entry.name):
+                    st = entry.stat()
+                    files.append((entry.name, st.st_mtime_ns, st.st_size))
+    except FileNotFoundError:
+        return None
+    return sig, tuple(sorted(files))
+
+
+class MockIndex:
+    """
+    Indeks w pamięci: manifest, listingi snapshotów ERP/MES i drzewo data/docs
+    (bez prekompresowanych plików .gz/.br – to tylko inna reprezentacja oryginału).
+
+    Unieważnianie:
+      - zawsze: sygnatura ze statów – plik manifestu, a dla katalogu snapshotu / katalogów drzewa docs
+        mtime katalogu plus (nazwa, mtime, rozmiar) jego plików (_folder_signature); scandir + staty
+        zamiast ponownego czytania i budowania listingu przy każdym żądaniu,
+      - opcjonalnie: watchfiles (MOCK_INDEX_WATCH=1) – zmiana w MOCK_DATA_ROOT czyści cały indeks.
+
+    Sygnatura plików wykrywa też nadpisanie pliku w miejscu (ta sama nazwa, inny rozmiar / mtime),
+    którego mtime katalogu nie pokazuje – watcher nie jest do tego potrzebny.
+    """
+
+    def __init__(self, data_root: Path, manifest_path: Path, docs_dir: Path) -> None:
+        self.data_root = data_root
+        self.manifest_path = manifest_path
+        self.docs_dir = docs_dir
+        self._lock = threading.Lock()
+        # klucz -> (sygnatura, wartość)
+        self._entries: dict[Any, tuple[Any, Any]] = {}
+
+    def _cached(self, key: Any, signature: Callable[[], Any], build: Callable[[], tuple[Any, Any]]) -> Any:
+        """
+        build() zwraca (wartość, sygnatura_po_budowie) – sygnatura liczona razem z budową,
+        żeby zmiana w trakcie skanowania nie została przeoczona.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] == signature():
+            return entry[1]
+
+        value, sig = build()
+        with self._lock:
+            self._entries[key] = (sig, value)
+        return value
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    # --- manifest ---
+
+    def manifest(self) -> dict[str, Any]:
+        def build():
+            sig = _stat_signature(self.manifest_path)
+            return read_manifest(self.manifest_path), sig
+
+        return self._cached("manifest", lambda: _stat_signature(self.manifest_path), build)
+
+    def latest_for(self, stream: str) -> str | None:
+        node = self.manifest().get(stream)
+        if isinstance(node, dict):
+            return node.get("latest")
+        return None
+
+    # --- listingi snapshotów ---
+
+    def snapshot_listing(self, stream: str, date: str) -> list[dict] | None:
+        """Lista plików snapshotu [{name, size}] albo None, gdy katalog nie istnieje."""
+        folder = self.data_root / stream / date
+
+        def build():
+            sig = _folder_signature(folder)
+            if sig is None:
+                return None, None
+            files = [{"name": name, "size": size} for name, _mtime, size in sig[1]]
+            return files, sig
+
+        return self._cached(("listing", stream, date), lambda: _folder_signature(folder), build)
+
+    # --- drzewo dokumentów ---
+
+    def docs_tree(self) -> list[dict]:
+        """Wszystkie pliki w data/docs (ścieżki względne), posortowane po nazwie."""
+
+        def signature():
+            entry = self._entries.get("docs")
+            dirs = entry[0][0] if entry and entry[0] else (self.docs_dir,)
+            return (dirs, tuple(_folder_signature(d) for d in dirs))
+
+        def build():
+            if not self.docs_dir.exists():
+                return [], ((self.docs_dir,), (None,))
+            dirs: list[Path] = []
+            for root, dirnames, _filenames in os.walk(self.docs_dir):
+                dirs.append(Path(root))
+                dirnames.sort()
+            dirs_t = tuple(dirs)
+            sigs = tuple(_folder_signature(d) for d in dirs_t)
+            files = [
+                {"name": (d / name).relative_to(self.docs_dir).as_posix(), "size": size}
+                for d, sig in zip(dirs_t, sigs) if sig is not None
+                for name, _mtime, size in sig[1]
+            ]
+            return sorted(files, key=lambda x: x["name"]), (dirs_t, sigs)
+
+        return self._cached("docs", signature, build)
+
+    # --- watcher ---
+
+    def start_watcher(self) -> bool:
+        """Uruchamia wątek watchfiles (jeśli biblioteka jest dostępna). Zwraca True, gdy działa."""
+        try:
+            from watchfiles import watch
+        except ImportError:
+            logger.info("watchfiles not installed – mock index uses mtime checks only")
+            return False
+
+        def run():
+            for _changes in watch(self.data_root):
+                self.invalidate()
+
+        threading.Thread(target=run, name="mock-index-watcher", daemon=True).start()
+        return True
+
+
+mock_index = MockIndex(MOCK_DATA_ROOT, MOCK_MANIFEST_PATH, DOCS_DIR)
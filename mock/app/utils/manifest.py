@@ -1,13 +1,13 @@
 from __future__ import annotations
 from pathlib import Path
-import json
 from typing import Any
 
+import orjson
+
 def read_manifest(path: Path) -> dict[str, Any]:
     if not path.exists():
         return {}
-    with path.open("r", encoding="utf-8") as f:
-        return json.load(f)
+    return orjson.loads(path.read_bytes())
 
 def latest_for(stream: str, manifest: dict[str, Any]) -> str | None:
     # manifest struktura np. {"erp":{"latest":"2025-11-12"}, "mes":{"latest":"2025-11-12"}}
@@ -0,0 +1,15 @@
+from __future__ import annotations
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSONResponse serializowany przez orjson (szybciej niż stdlib json przy dużych listingach).
+    Własna klasa zamiast fastapi.responses.ORJSONResponse, które jest oznaczone jako deprecated.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
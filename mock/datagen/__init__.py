@@ -0,0 +1,10 @@
+"""
+Generator syntetycznych snapshotów ERP/MES dla mocka (testy wydajności sync / ingestii / raportów).
+
+Dane są spójne referencyjnie (work_orders -> production_batches -> quality_checks, downtime_log -> machines)
+i deterministyczne: rekord zależy tylko od (seed, dzień, numer), więc kolejne snapshoty dzielą rekordy
+ze zmieniającym się statusem (diff snapshotów ma sens), a daty można generować równolegle.
+"""
+from .generator import GeneratorConfig, generate, generate_snapshot, update_manifest
+
+__all__ = ["GeneratorConfig", "generate", "generate_snapshot", "update_manifest"]
@@ -0,0 +1,71 @@
+"""
+Uruchomienie (z katalogu mock/):
+    python -m datagen --out data_synth --dates 200 --interval-days 1 --orders-per-day 500 --workers 8
+    MOCK_DATA_ROOT=data_synth uvicorn app.main:app --port 8001
+
+Skala (jeden snapshot, domyślne okno 30 dni): orders_per_day=500 -> ~15k zleceń, ~37k partii, ~110k kontroli QC.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from datetime import date
+from pathlib import Path
+
+from .generator import GeneratorConfig, generate
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m datagen", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--out", type=Path, required=True, help="katalog danych (jak MOCK_DATA_ROOT)")
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2026, 1, 1), help="data pierwszego snapshotu")
+    parser.add_argument("--dates", type=int, default=4, help="liczba snapshotów")
+    parser.add_argument("--interval-days", type=int, default=7, help="odstęp między snapshotami (dni)")
+    parser.add_argument("--lines", type=int, default=2)
+    parser.add_argument("--products", type=int, default=3)
+    parser.add_argument("--orders-per-day", type=int, default=5)
+    parser.add_argument("--window-days", type=int, default=30, help="ile dni historii zawiera snapshot")
+    parser.add_argument("--max-batches-per-order", type=int, default=4)
+    parser.add_argument("--checks-per-batch", type=int, default=3)
+    parser.add_argument("--bom-change-days", type=int, default=45, help="co ile dni nowa wersja BOM/routingu")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", dest="fmt", choices=("json", "jsonl"), default="json",
+                        help="jsonl nie jest czytany przez backend (load_snapshot_records bierze *.json)")
+    parser.add_argument("--streams", default="erp,mes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="procesy (równolegle po datach)")
+    args = parser.parse_args(argv)
+
+    cfg = GeneratorConfig(
+        start=args.start,
+        dates=args.dates,
+        interval_days=args.interval_days,
+        lines=args.lines,
+        products=args.products,
+        orders_per_day=args.orders_per_day,
+        window_days=args.window_days,
+        max_batches_per_order=args.max_batches_per_order,
+        checks_per_batch=args.checks_per_batch,
+        bom_change_days=args.bom_change_days,
+        seed=args.seed,
+        fmt=args.fmt,
+    )
+    streams = tuple(s.strip() for s in args.streams.split(",") if s.strip() in ("erp", "mes"))
+    if not streams:
+        parser.error("--streams: erp i/lub mes")
+
+    def progress(date_str: str, counts: dict[str, int]) -> None:
+        print(f"[datagen] {date_str}: {sum(counts.values())} rekordów "
+              + " ".join(f"{k.split('/')[1]}={v}" for k, v in counts.items()))
+
+    stats = generate(cfg, args.out, streams=streams, workers=max(1, args.workers), progress=progress)
+    rate = stats["records"] / stats["seconds"] if stats["seconds"] else 0
+    print(f"[datagen] {stats['dates']} snapshotów, {stats['records']} rekordów, "
+          f"{stats['bytes'] / 1e6:.1f} MB w {stats['seconds']} s ({rate:,.0f} rek./s) -> {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
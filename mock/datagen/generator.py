@@ -0,0 +1,575 @@
+from __future__ import annotations
+
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+import orjson
+
+# Stanowiska na każdej linii: (kod, nazwa) -> machine_id "WC-{kod}-{linia:02d}"
+WORKCENTERS = (
+    ("SMT", "SMT Line"),
+    ("MECH", "Mechanical assembly station"),
+    ("TEST", "Electrical safety tester"),
+    ("CAL", "Functional test and calibration bench"),
+    ("PACK", "Final inspection and packing station"),
+)
+
+# Szablon routingu: (operation_id, nazwa, stanowisko, umiejętność, czas std [min])
+OPERATIONS = (
+    ("OP-010", "PCB main board assembly (SMT)", "SMT", "electronics_operator", 15),
+    ("OP-020", "Power board assembly and inspection", "SMT", "electronics_operator", 12),
+    ("OP-030", "Final mechanical assembly", "MECH", "mechanical_assembler", 23),
+    ("OP-040", "Electrical safety test", "TEST", "test_technician", 18),
+    ("OP-050", "Final functional test and calibration", "CAL", "test_technician", 22),
+    ("OP-060", "Final visual inspection and packing", "PACK", "quality_inspector", 10),
+)
+
+COMPONENTS = (
+    ("PCB-MAIN", "Main control board", "pcs", "Acme Electronics"),
+    ("PCB-POWER", "Power supply board", "pcs", "Acme Electronics"),
+    ("TURBINE", "Turbine assembly", "pcs", "Venturi Medical"),
+    ("VALVE-SET", "Valve set (inspiratory/expiratory)", "set", "FlowTech"),
+    ("HOUSING", "Plastic housing set", "set", "PlastiForm"),
+    ("DISPLAY", "Front panel display", "pcs", "VisionDisplay"),
+    ("HARNESS", "Wiring harness kit", "set", "WireWorks"),
+    ("SCREW-KIT", "Mechanical fastening kit", "set", "FastenPro"),
+)
+
+CHECKPOINTS = (
+    "Valve flow pre-check",
+    "Electrical safety test",
+    "Final functional test",
+    "Alarm system test",
+    "Final visual inspection",
+)
+DEFECT_CODES = ("FLOW_DEVIATION", "ALARM_FAIL", "CALIBRATION_DRIFT", "LEAK", "PCB_SOLDER", "COSMETIC")
+DOWNTIME_REASONS = (
+    ("PM_PLANNED", "planned", 30),
+    ("CHANGEOVER", "planned", 20),
+    ("ROUTING_UPDATE", "planned", 5),
+    ("BREAKDOWN", "unplanned", 25),
+    ("MATERIAL_SHORTAGE", "unplanned", 12),
+    ("QUALITY_HOLD", "unplanned", 8),
+)
+CUSTOMERS = (
+    "Krakow University Hospital",
+    "Warsaw Medical Center",
+    "Gdansk Regional Hospital",
+    "National Strategic Reserve",
+    "Poznan Clinical Hospital",
+    "Export – EU distributor",
+)
+PRIORITIES = ("low", "medium", "medium", "high")
+SHIFT_START_HOUR = {"A": 6, "B": 14, "C": 22}  # jak _shift_code_from_time w backendzie
+
+# Przestrzenie nazw ziaren RNG (różne encje nie mogą dzielić sekwencji)
+_NS_ORDER, _NS_CHECKS, _NS_DOWNTIME, _NS_SHIFT, _NS_LINE = range(1, 6)
+
+
+@dataclass(frozen=True)
+class GeneratorConfig:
+    """
+    Parametry skali. Rekordów w jednym snapshocie jest ok.:
+      work_orders ≈ orders_per_day * window_days,
+      production_batches ≈ 2.5 * work_orders (przy max_batches_per_order=4),
+      quality_checks ≈ checks_per_batch * production_batches.
+    """
+
+    start: date
+    dates: int = 4
+    interval_days: int = 7
+    lines: int = 2
+    products: int = 3
+    orders_per_day: int = 5
+    window_days: int = 30
+    max_batches_per_order: int = 4
+    checks_per_batch: int = 3
+    bom_change_days: int = 45
+    seed: int = 0
+    fmt: str = "json"  # json | jsonl
+
+    def snapshot_dates(self) -> list[date]:
+        return [self.start + timedelta(days=i * self.interval_days) for i in range(self.dates)]
+
+    def product_id(self, idx: int) -> str:
+        return "PB560" if idx == 0 else f"PRD-{idx:03d}"
+
+    def line_id(self, idx: int) -> str:
+        return f"LINE-{idx + 1}"
+
+
+def _rng(cfg: GeneratorConfig, *parts: int) -> random.Random:
+    """Deterministyczny RNG dla encji – ten sam (seed, parts) daje te same dane w każdym snapshocie."""
+    h = cfg.seed & 0xFFFFFFFF
+    for p in parts:
+        h = (h * 1_000_003 + p) & 0xFFFFFFFFFFFF
+    return random.Random(h)
+
+
+def _iso(dt: datetime | date | None) -> str | None:
+    return dt.isoformat() if dt is not None else None
+
+
+def _day(cfg: GeneratorConfig, d: date) -> int:
+    return (d - cfg.start).days
+
+
+def _version_index(cfg: GeneratorConfig, day: int) -> int:
+    """Wersja BOM/routingu obowiązująca danego dnia (zmiana co bom_change_days)."""
+    return max(0, day) // max(1, cfg.bom_change_days)
+
+
+# --- ERP: dane podstawowe ---
+
+def iter_bom(cfg: GeneratorConfig, as_of: date) -> Iterator[dict]:
+    last = _version_index(cfg, _day(cfg, as_of))
+    for p in range(cfg.products):
+        product = cfg.product_id(p)
+        for v in range(last + 1):
+            valid_from = cfg.start + timedelta(days=v * cfg.bom_change_days)
+            valid_to = valid_from + timedelta(days=cfg.bom_change_days - 1) if v < last else None
+            yield {
+                "product_id": product,
+                "version": f"v{v + 1}",
+                "valid_from": _iso(valid_from),
+                "valid_to": _iso(valid_to),
+                "description": f"BOM v{v + 1} for {product}.",
+                "components": [
+                    {
+                        "component_id": f"{product}-{code}",
+                        "description": desc,
+                        "uom": uom,
+                        "quantity_per": 1,
+                        "supplier": supplier,
+                    }
+                    for code, desc, uom, supplier in COMPONENTS
+                ],
+            }
+
+
+def iter_routing(cfg: GeneratorConfig, as_of: date) -> Iterator[dict]:
+    last = _version_index(cfg, _day(cfg, as_of))
+    for p in range(cfg.products):
+        product = cfg.product_id(p)
+        for v in range(last + 1):
+            valid_from = cfg.start + timedelta(days=v * cfg.bom_change_days)
+            valid_to = valid_from + timedelta(days=cfg.bom_change_days - 1) if v < last else None
+            yield {
+                "product_id": product,
+                "version": f"v{v + 1}",
+                "valid_from": _iso(valid_from),
+                "valid_to": _iso(valid_to),
+                "description": f"Routing v{v + 1} for {product}.",
+                "operations": [
+                    {
+                        "operation_id": op_id,
+                        "name": name,
+                        "sequence": (i + 1) * 10,
+                        "workcenter_id": f"WC-{wc}-01",
+                        # kolejne wersje routingu są nieco szybsze (optymalizacja procesu)
+                        "std_time_min": max(5, std - v),
+                        "labor_skill": skill,
+                        "is_critical": wc != "PACK",
+                    }
+                    for i, (op_id, name, wc, skill, std) in enumerate(OPERATIONS)
+                ],
+            }
+
+
+def _machine_id(code: str, line: int) -> str:
+    return f"WC-{code}-{line + 1:02d}"
+
+
+def iter_machines(cfg: GeneratorConfig, as_of: date) -> Iterator[dict]:
+    for line in range(cfg.lines):
+        for code, name in WORKCENTERS:
+            yield {
+                "machine_id": _machine_id(code, line),
+                "name": f"{name} {line + 1}",
+                "type": code,
+                "location": f"Plant-1 / Hall-{chr(ord('A') + line % 26)}",
+                "line_id": cfg.line_id(line),
+                "status": "available",
+                "commissioned_at": _iso(cfg.start - timedelta(days=30)),
+                "remarks": None,
+            }
+
+
+def iter_maintenance_plans(cfg: GeneratorConfig, as_of: date) -> Iterator[dict]:
+    for line in range(cfg.lines):
+        for code, _name in WORKCENTERS:
+            machine = _machine_id(code, line)
+            for frequency, every in (("daily", 1), ("weekly", 7), ("monthly", 30)):
+                yield {
+                    "plan_id": f"MP-{code}-{line + 1:02d}-{frequency.upper()}",
+                    "machine_id": machine,
+                    "description": f"{frequency.capitalize()} maintenance of {machine}.",
+                    "frequency": frequency,
+                    "last_performed_date": _iso(as_of - timedelta(days=_day(cfg, as_of) % every)),
+                    "next_due_date": _iso(as_of + timedelta(days=every - _day(cfg, as_of) % every)),
+                    "responsible_role": "maintenance_technician",
+                }
+
+
+# --- Zlecenia i partie (wspólny plan dla ERP i MES) ---
+
+def _order_plan(cfg: GeneratorConfig, day: int, n: int) -> dict:
+    """
+    Niezmienny "plan" zlecenia utworzonego w dniu `day` (n-te zlecenie dnia) z partiami.
+    Stan na datę snapshotu (status, ilości) liczony jest z planu w _order_state.
+    """
+    rng = _rng(cfg, _NS_ORDER, day, n)
+    created = datetime.combine(cfg.start + timedelta(days=day), datetime.min.time()) + timedelta(
+        hours=rng.randint(7, 16), minutes=rng.choice((0, 15, 30, 45))
+    )
+    product_idx = rng.randrange(cfg.products)
+    line = rng.randrange(cfg.lines)
+    quantity = rng.choice((5, 10, 20, 20, 40, 60, 80, 120, 200))
+    version = f"v{_version_index(cfg, day) + 1}"
+    start = created.date() + timedelta(days=rng.randint(1, 5))
+
+    # jakość linii/produktu: stały profil + szum per zlecenie
+    reject_base = _rng(cfg, _NS_LINE, line, product_idx).uniform(0.005, 0.05)
+
+    n_batches = min(quantity, rng.randint(1, cfg.max_batches_per_order))
+    sizes = [quantity // n_batches] * n_batches
+    for i in range(quantity % n_batches):
+        sizes[i] += 1
+
+    stamp = created.strftime("%Y%m%d")
+    order_id = f"WO-{stamp}-{n:05d}"
+    batches = []
+    for i, size in enumerate(sizes):
+        shift = rng.choice(("A", "B", "C"))
+        b_start = datetime.combine(start + timedelta(days=i), datetime.min.time()) + timedelta(
+            hours=SHIFT_START_HOUR[shift], minutes=rng.choice((0, 15, 30))
+        )
+        b_end = b_start + timedelta(minutes=round(size * rng.uniform(18, 30)))
+        reject = min(size, round(size * reject_base * rng.uniform(0, 2)))
+        batches.append({
+            "batch_id": f"B-{stamp}-{n:05d}-{i + 1}",
+            "start": b_start,
+            "end": b_end,
+            "quantity": size,
+            "reject": reject,
+        })
+
+    return {
+        "id": order_id,
+        "day": day,
+        "n": n,
+        "created": created,
+        "product_id": cfg.product_id(product_idx),
+        "version": version,
+        "line_id": cfg.line_id(line),
+        "customer": rng.choice(CUSTOMERS),
+        "priority": rng.choice(PRIORITIES),
+        "quantity": quantity,
+        "start": start,
+        "due": start + timedelta(days=n_batches + rng.randint(2, 14)),
+        "batches": batches,
+    }
+
+
+def _iter_order_plans(cfg: GeneratorConfig, as_of: date) -> Iterator[dict]:
+    """Zlecenia utworzone w oknie (as_of - window_days, as_of]."""
+    last = _day(cfg, as_of)
+    for day in range(last - cfg.window_days + 1, last + 1):
+        for n in range(cfg.orders_per_day):
+            yield _order_plan(cfg, day, n)
+
+
+def _snapshot_moment(as_of: date) -> datetime:
+    # stan na koniec dnia snapshotu
+    return datetime.combine(as_of, datetime.max.time()).replace(microsecond=0)
+
+
+def _work_order_record(plan: dict, moment: datetime) -> dict:
+    started = [b for b in plan["batches"] if b["start"] <= moment]
+    done = [b for b in started if b["end"] <= moment]
+    if not started:
+        status = "planned"
+    elif len(done) == len(plan["batches"]):
+        status = "completed"
+    else:
+        status = "in_progress"
+    return {
+        "id": plan["id"],
+        "product_id": plan["product_id"],
+        "bom_version": plan["version"],
+        "routing_version": plan["version"],
+        "customer": plan["customer"],
+        "priority": plan["priority"],
+        "status": status,
+        "quantity": plan["quantity"],
+        "quantity_completed": sum(b["quantity"] - b["reject"] for b in done),
+        "start_date": _iso(plan["start"]),
+        "due_date": _iso(plan["due"]),
+        "line_id": plan["line_id"],
+        "created_at": _iso(plan["created"]),
+        "closed_at": _iso(done[-1]["end"]) if status == "completed" else None,
+        "notes": None,
+    }
+
+
+def iter_work_orders(cfg: GeneratorConfig, as_of: date) -> Iterator[dict]:
+    moment = _snapshot_moment(as_of)
+    for plan in _iter_order_plans(cfg, as_of):
+        yield _work_order_record(plan, moment)
+
+
+def _batch_record(plan: dict, batch: dict, moment: datetime) -> dict:
+    completed = batch["end"] <= moment
+    return {
+        "batch_id": batch["batch_id"],
+        "work_order_id": plan["id"],
+        "product_id": plan["product_id"],
+        "line_id": plan["line_id"],
+        "quantity_planned": batch["quantity"],
+        "quantity_good": batch["quantity"] - batch["reject"] if completed else 0,
+        "quantity_reject": batch["reject"] if completed else 0,
+        "start_time": _iso(batch["start"]),
+        "end_time": _iso(batch["end"]) if completed else None,
+        "status": "completed" if completed else "in_progress",
+        "remarks": None,
+    }
+
+
+def _quality_checks(cfg: GeneratorConfig, plan: dict, index: int, batch: dict) -> Iterator[dict]:
+    rng = _rng(cfg, _NS_CHECKS, plan["day"], plan["n"], index)
+    fail_p = min(0.9, 3 * batch["reject"] / max(1, batch["quantity"]))
+    for j in range(cfg.checks_per_batch):
+        failed = rng.random() < fail_p
+        yield {
+            "check_id": f"QC-{batch['batch_id'][2:]}-{j + 1}",
+            "batch_id": batch["batch_id"],
+            "product_id": plan["product_id"],
+            "checkpoint": CHECKPOINTS[j % len(CHECKPOINTS)],
+            "result": "fail" if failed else "pass",
+            "defect_code": rng.choice(DEFECT_CODES) if failed else None,
+            "measured_values": {
+                "sample_size": min(5, batch["quantity"]),
+                "max_flow_deviation_percent": round(rng.uniform(4.5, 9.0) if failed else rng.uniform(0.5, 4.0), 1),
+            },
+            "inspector_id": f"OP-{rng.randint(1, 40):03d}",
+            "timestamp": _iso(batch["end"] - timedelta(minutes=rng.randint(5, 60))),
+            "remarks": None,
+        }
+
+
+def iter_downtime(cfg: GeneratorConfig, as_of: date) -> Iterator[dict]:
+    last = _day(cfg, as_of)
+    weights = [w for _, _, w in DOWNTIME_REASONS]
+    for day in range(last - cfg.window_days + 1, last + 1):
+        d = cfg.start + timedelta(days=day)
+        for line in range(cfg.lines):
+            rng = _rng(cfg, _NS_DOWNTIME, day, line)
+            for k in range(rng.choices((0, 1, 2, 3), weights=(50, 30, 15, 5))[0]):
+                code, kind, _w = rng.choices(DOWNTIME_REASONS, weights=weights)[0]
+                start = datetime.combine(d, datetime.min.time()) + timedelta(minutes=rng.randrange(0, 24 * 60, 5))
+                duration = rng.randint(15, 240)
+                machine = _machine_id(rng.choice(WORKCENTERS)[0], line)
+                yield {
+                    "event_id": f"DT-{d.isoformat()}-{line + 1:02d}-{k + 1}",
+                    "machine_id": machine,
+                    "line_id": cfg.line_id(line),
+                    "start_time": _iso(start),
+                    "end_time": _iso(start + timedelta(minutes=duration)),
+                    "duration_min": duration,
+                    "type": kind,
+                    "reason_code": code,
+                    "description": f"{code.replace('_', ' ').capitalize()} on {machine}.",
+                    "reported_by": f"ENG-{rng.randint(1, 12):03d}",
+                }
+
+
+def iter_shift_log(cfg: GeneratorConfig, as_of: date) -> Iterator[dict]:
+    last = _day(cfg, as_of)
+    for day in range(last - cfg.window_days + 1, last + 1):
+        d = cfg.start + timedelta(days=day)
+        for line in range(cfg.lines):
+            rng = _rng(cfg, _NS_SHIFT, day, line)
+            for code in SHIFT_START_HOUR:
+                yield {
+                    "shift_id": f"S-{d.isoformat()}-{line + 1:02d}-{code}",
+                    "date": d.isoformat(),
+                    "shift_code": code,
+                    "line_id": cfg.line_id(line),
+                    "supervisor_id": f"SUP-{rng.randint(1, 8):03d}",
+                    "operator_ids": sorted(f"OP-{i:03d}" for i in rng.sample(range(1, 41), 3)),
+                    "notes": None,
+                }
+
+
+# --- Zapis strumieniowy ---
+
+class RecordWriter:
+    """
+    Zapis rekordów bez trzymania pliku w pamięci: JSON (tablica, rekord po rekordzie) albo JSONL.
+    Plik powstaje jako .tmp i jest podmieniany atomowo – mock nie zaserwuje połowy pliku.
+    """
+
+    def __init__(self, path: Path, fmt: str = "json") -> None:
+        self.path = path
+        self.fmt = fmt
+        self.count = 0
+        self._tmp = path.with_name(path.name + ".tmp")
+        self._f = None
+
+    def __enter__(self) -> "RecordWriter":
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = open(self._tmp, "wb", buffering=1024 * 1024)
+        if self.fmt == "json":
+            self._f.write(b"[")
+        return self
+
+    def write(self, record: dict) -> None:
+        data = orjson.dumps(record)
+        if self.fmt == "json":
+            self._f.write(b",\n" if self.count else b"\n")
+            self._f.write(data)
+        else:
+            self._f.write(data + b"\n")
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self.fmt == "json":
+            self._f.write(b"\n]\n")
+        self._f.close()
+        if exc_type is None:
+            os.replace(self._tmp, self.path)
+        else:
+            self._tmp.unlink(missing_ok=True)
+
+
+def _write(path: Path, fmt: str, records: Iterator[dict]) -> int:
+    with RecordWriter(path, fmt) as w:
+        for record in records:
+            w.write(record)
+    return w.count
+
+
+def generate_snapshot(cfg: GeneratorConfig, out: Path, as_of: date, streams: tuple[str, ...]) -> dict[str, int]:
+    """Zapisuje jeden snapshot (erp/ i/lub mes/ dla daty as_of). Zwraca { "stream/plik": liczba_rekordów }."""
+    ext = ".json" if cfg.fmt == "json" else ".jsonl"
+    date_str = as_of.isoformat()
+    erp_dir = out / "erp" / date_str
+    mes_dir = out / "mes" / date_str
+    moment = _snapshot_moment(as_of)
+    counts: dict[str, int] = {}
+
+    # zlecenia (ERP), partie i kontrole jakości (MES) w jednym przejściu po planach zleceń –
+    # plan liczony raz, a nie osobno dla każdego pliku
+    with ExitStack() as stack:
+        orders_w = batches_w = checks_w = None
+        if "erp" in streams:
+            orders_w = stack.enter_context(RecordWriter(erp_dir / f"work_orders{ext}", cfg.fmt))
+        if "mes" in streams:
+            batches_w = stack.enter_context(RecordWriter(mes_dir / f"production_batches{ext}", cfg.fmt))
+            checks_w = stack.enter_context(RecordWriter(mes_dir / f"quality_checks{ext}", cfg.fmt))
+
+        for plan in _iter_order_plans(cfg, as_of):
+            if orders_w is not None:
+                orders_w.write(_work_order_record(plan, moment))
+            if batches_w is None:
+                continue
+            for i, batch in enumerate(plan["batches"]):
+                if batch["start"] > moment:
+                    continue
+                batches_w.write(_batch_record(plan, batch, moment))
+                if batch["end"] <= moment:
+                    for check in _quality_checks(cfg, plan, i, batch):
+                        checks_w.write(check)
+
+    if orders_w is not None:
+        counts["erp/work_orders"] = orders_w.count
+        sources: dict[str, Callable[[GeneratorConfig, date], Iterator[dict]]] = {
+            "bom": iter_bom,
+            "routing": iter_routing,
+            "machines": iter_machines,
+            "maintenance_plans": iter_maintenance_plans,
+        }
+        for name, source in sources.items():
+            counts[f"erp/{name}"] = _write(erp_dir / f"{name}{ext}", cfg.fmt, source(cfg, as_of))
+
+    if batches_w is not None:
+        counts["mes/production_batches"] = batches_w.count
+        counts["mes/quality_checks"] = checks_w.count
+        counts["mes/downtime_log"] = _write(mes_dir / f"downtime_log{ext}", cfg.fmt, iter_downtime(cfg, as_of))
+        counts["mes/shift_log"] = _write(mes_dir / f"shift_log{ext}", cfg.fmt, iter_shift_log(cfg, as_of))
+
+    return counts
+
+
+def update_manifest(out: Path, streams: tuple[str, ...], dates: list[date]) -> dict[str, Any]:
+    """Dopisuje daty do manifest.json (zachowując istniejące wersje), latest = najnowsza."""
+    path = out / "manifest.json"
+    manifest: dict[str, Any] = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+    for stream in streams:
+        node = manifest.get(stream) if isinstance(manifest.get(stream), dict) else {}
+        versions = sorted(set(node.get("versions") or []) | {d.isoformat() for d in dates})
+        manifest[stream] = {**node, "latest": versions[-1] if versions else None, "versions": versions}
+
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+    return manifest
+
+
+def _generate_one(args: tuple[GeneratorConfig, Path, date, tuple[str, ...]]) -> tuple[str, dict[str, int]]:
+    cfg, out, as_of, streams = args
+    return as_of.isoformat(), generate_snapshot(cfg, out, as_of, streams)
+
+
+def generate(
+    cfg: GeneratorConfig,
+    out: Path,
+    streams: tuple[str, ...] = ("erp", "mes"),
+    workers: int = 1,
+    progress: Callable[[str, dict[str, int]], None] | None = None,
+) -> dict[str, Any]:
+    """
+    Generuje wszystkie snapshoty (równolegle po datach przy workers > 1) i aktualizuje manifest.
+    Zwraca { dates, records, bytes, seconds }.
+    """
+    started = time.perf_counter()
+    dates = cfg.snapshot_dates()
+    jobs = [(cfg, out, d, streams) for d in dates]
+    records = 0
+
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            results = pool.map(_generate_one, jobs)
+            for date_str, counts in results:
+                records += sum(counts.values())
+                if progress:
+                    progress(date_str, counts)
+    else:
+        for job in jobs:
+            date_str, counts = _generate_one(job)
+            records += sum(counts.values())
+            if progress:
+                progress(date_str, counts)
+
+    update_manifest(out, streams, dates)
+    size = sum(
+        f.stat().st_size
+        for stream in streams
+        for d in dates
+        for f in (out / stream / d.isoformat()).iterdir()
+        if f.is_file()
+    )
+    return {
+        "dates": len(dates),
+        "records": records,
+        "bytes": size,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
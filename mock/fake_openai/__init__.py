@@ -0,0 +1,15 @@
+"""
+Lokalna atrapa API OpenAI (zgodna z klientem `openai`) do testów obciążeniowych agentów.
+
+  - POST /v1/embeddings       -> deterministyczne wektory z hasha tekstu (float i base64),
+  - POST /v1/chat/completions -> deterministyczna odpowiedź, także stream=True (SSE),
+  - GET  /stats               -> liczniki żądań i odrzuceń.
+
+Opóźnienia (rozkład), limit RPM i wstrzykiwane 429/500 ustawia się zmiennymi FAKE_OPENAI_* (patrz config.py).
+
+Uruchomienie (z katalogu mock/):
+    uvicorn fake_openai.main:app --port 8002
+    FAKE_OPENAI_RPM=600 FAKE_OPENAI_429_RATE=0.05 uvicorn fake_openai.main:app --port 8002
+
+Backend kieruje się na atrapę przez OPENAI_BASE_URL=http://localhost:8002/v1.
+"""
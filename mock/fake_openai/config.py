@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import math
+import os
+import random
+from dataclasses import dataclass
+from typing import Callable
+
+
+def parse_latency(spec: str | None) -> Callable[[random.Random], float]:
+    """
+    Rozkład opóźnienia (w sekundach) z opisu w ms:
+      "0" / "" – brak opóźnienia,
+      "fixed:200",
+      "uniform:100,400",
+      "normal:300,50"     (średnia, odchylenie; ucinane do >= 0),
+      "lognormal:300,0.5" (mediana w ms, sigma – długi ogon jak w prawdziwym API).
+    """
+    spec = (spec or "").strip()
+    if not spec or spec == "0":
+        return lambda rng: 0.0
+
+    kind, _, raw = spec.partition(":")
+    if not raw:
+        kind, raw = "fixed", kind
+    try:
+        args = [float(x) for x in raw.split(",") if x.strip()]
+    except ValueError as exc:
+        raise ValueError(f"Invalid latency spec: {spec!r}") from exc
+
+    if kind == "fixed" and len(args) == 1:
+        return lambda rng: args[0] / 1000
+    if kind == "uniform" and len(args) == 2:
+        return lambda rng: rng.uniform(args[0], args[1]) / 1000
+    if kind == "normal" and len(args) == 2:
+        return lambda rng: max(0.0, rng.gauss(args[0], args[1])) / 1000
+    if kind == "lognormal" and len(args) == 2:
+        mu = math.log(max(args[0], 1e-3))
+        return lambda rng: rng.lognormvariate(mu, args[1]) / 1000
+    raise ValueError(f"Invalid latency spec: {spec!r}")
+
+
+def _float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+@dataclass
+class FakeOpenAIConfig:
+    # opóźnienie do pierwszego tokena / odpowiedzi (chat) i całej odpowiedzi (embeddings)
+    chat_latency: str = os.getenv("FAKE_OPENAI_CHAT_LATENCY", "lognormal:400,0.5")
+    embed_latency: str = os.getenv("FAKE_OPENAI_EMBED_LATENCY", "lognormal:80,0.4")
+    # opóźnienie między kawałkami odpowiedzi przy stream=True
+    stream_token_ms: float = _float("FAKE_OPENAI_STREAM_TOKEN_MS", 15)
+    # limit zapytań na minutę (0 = bez limitu) – po przekroczeniu 429 jak w prawdziwym API
+    rpm: int = int(os.getenv("FAKE_OPENAI_RPM", "0"))
+    # losowe 429 / 500 (prawdopodobieństwo 0..1) – test retry i backpressure
+    error_429_rate: float = _float("FAKE_OPENAI_429_RATE", 0.0)
+    error_500_rate: float = _float("FAKE_OPENAI_500_RATE", 0.0)
+    # długość odpowiedzi chat (w "tokenach" ~ słowach)
+    completion_tokens: int = int(os.getenv("FAKE_OPENAI_COMPLETION_TOKENS", "120"))
+    embedding_dimensions: int = int(os.getenv("FAKE_OPENAI_EMBEDDING_DIMENSIONS", "1536"))
+    seed: int = int(os.getenv("FAKE_OPENAI_SEED", "0"))
+
+    def __post_init__(self) -> None:
+        # walidacja przy starcie, a nie przy pierwszym żądaniu
+        self.chat_sampler = parse_latency(self.chat_latency)
+        self.embed_sampler = parse_latency(self.embed_latency)
+
+
+config = FakeOpenAIConfig()
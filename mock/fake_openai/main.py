@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import math
+import random
+import sys
+import time
+import uuid
+from array import array
+from collections import Counter
+from typing import Any, AsyncIterator
+
+import orjson
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.utils.responses import ORJSONResponse
+
+from .config import config
+
+app = FastAPI(title="Fake OpenAI", version="0.1.0", default_response_class=ORJSONResponse)
+
+# jeden generator dla opóźnień i wstrzykiwanych błędów – powtarzalny przebieg przy tym samym seedzie
+_rng = random.Random(config.seed)
+stats: Counter[str] = Counter()
+
+
+class RateLimiter:
+    """Token bucket na RPM – po wyczerpaniu 429 z nagłówkami jak w prawdziwym API."""
+
+    def __init__(self, rpm: int) -> None:
+        self.rpm = rpm
+        self.tokens = float(rpm)
+        self.updated = time.monotonic()
+
+    def acquire(self) -> float | None:
+        """None gdy wolno, inaczej sekundy do zwolnienia miejsca (Retry-After)."""
+        if self.rpm <= 0:
+            return None
+        now = time.monotonic()
+        self.tokens = min(self.rpm, self.tokens + (now - self.updated) * self.rpm / 60)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return None
+        return (1 - self.tokens) * 60 / self.rpm
+
+    def headers(self) -> dict[str, str]:
+        if self.rpm <= 0:
+            return {}
+        return {
+            "x-ratelimit-limit-requests": str(self.rpm),
+            "x-ratelimit-remaining-requests": str(int(self.tokens)),
+        }
+
+
+limiter = RateLimiter(config.rpm)
+
+
+def _error(status: int, message: str, type_: str, code: str | None, headers: dict | None = None) -> ORJSONResponse:
+    stats[f"status_{status}"] += 1
+    return ORJSONResponse(
+        {"error": {"message": message, "type": type_, "param": None, "code": code}},
+        status_code=status,
+        headers=headers,
+    )
+
+
+def _admit() -> ORJSONResponse | None:
+    """Limit RPM i losowe błędy; None = obsłuż żądanie normalnie."""
+    retry_after = limiter.acquire()
+    if retry_after is not None:
+        return _error(
+            429, "Rate limit reached for requests (fake).", "requests", "rate_limit_exceeded",
+            {"retry-after": f"{retry_after:.3f}", **limiter.headers()},
+        )
+    roll = _rng.random()
+    if roll < config.error_429_rate:
+        return _error(429, "Injected rate limit (fake).", "requests", "rate_limit_exceeded",
+                      {"retry-after": "0.1", **limiter.headers()})
+    if roll < config.error_429_rate + config.error_500_rate:
+        return _error(500, "Injected server error (fake).", "server_error", None)
+    return None
+
+
+def _tokens(text: str) -> int:
+    # ~4 znaki na token – do pola usage wystarczy
+    return max(1, len(text) // 4) if text else 0
+
+
+def embed(text: str, dimensions: int) -> array:
+    """Wektor jednostkowy (float32) wyliczony z hasha tekstu – ten sam tekst = ten sam wektor."""
+    raw = array("h", hashlib.shake_256(text.encode("utf-8")).digest(dimensions * 2))
+    if sys.byteorder == "big":
+        raw.byteswap()
+    norm = math.sqrt(sum(x * x for x in raw)) or 1.0
+    return array("f", (x / norm for x in raw))
+
+
+def _embedding_data(texts: list[str], dimensions: int, as_base64: bool) -> list[dict[str, Any]]:
+    """Pole "data" odpowiedzi /v1/embeddings (liczone na CPU – wołane z puli wątków, nie w pętli zdarzeń)."""
+    data = []
+    for i, text in enumerate(texts):
+        vec = embed(text, dimensions)
+        # klient openai domyślnie prosi o base64 (float32 little-endian)
+        if as_base64:
+            if sys.byteorder == "big":
+                vec.byteswap()
+            embedding = base64.b64encode(vec.tobytes()).decode("ascii")
+        else:
+            embedding = vec.tolist()
+        data.append({"object": "embedding", "index": i, "embedding": embedding})
+    return data
+
+
+def _reply_words(prompt: str, model: str) -> list[str]:
+    """Deterministyczna odpowiedź: te same wiadomości = ta sama treść."""
+    rng = random.Random(hashlib.sha1(prompt.encode("utf-8")).digest())
+    vocabulary = prompt.split() or ["brak", "danych"]
+    words = [f"- Odpowiedź testowa ({model}):"]
+    words += [rng.choice(vocabulary) for _ in range(max(0, config.completion_tokens - 1))]
+    return words
+
+
+def _message_text(messages: list[dict[str, Any]]) -> str:
+    parts = []
+    for m in messages:
+        content = m.get("content") or ""
+        if isinstance(content, list):  # format z częściami (text / image_url)
+            content = " ".join(p.get("text", "") for p in content if isinstance(p, dict))
+        parts.append(content)
+    return "\n".join(parts)
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+
+@app.get("/stats")
+def get_stats():
+    return {"requests": dict(stats), "config": {k: v for k, v in vars(config).items() if not callable(v)}}
+
+
+@app.get("/v1/models")
+def list_models():
+    return {"object": "list", "data": [{"id": "fake", "object": "model", "created": 0, "owned_by": "proscientia"}]}
+
+
+@app.post("/v1/embeddings")
+async def create_embeddings(request: Request):
+    stats["embeddings"] += 1
+    body = await request.json()
+    if (rejected := _admit()) is not None:
+        return rejected
+
+    inputs = body.get("input")
+    texts = [inputs] if isinstance(inputs, str) else list(inputs or [])
+    if not texts or not all(isinstance(t, str) for t in texts):
+        return _error(400, "'input' must be a string or a list of strings (fake).", "invalid_request_error", None)
+    dimensions = int(body.get("dimensions") or config.embedding_dimensions)
+    as_base64 = body.get("encoding_format") == "base64"
+
+    await asyncio.sleep(config.embed_sampler(_rng))
+
+    # batch po kilkaset tekstów × 1536 wymiarów to dziesiątki ms CPU – poza pętlą zdarzeń,
+    # żeby nie blokować opóźnień (sleep) i streamingu pozostałych żądań
+    data = await run_in_threadpool(_embedding_data, texts, dimensions, as_base64)
+    prompt_tokens = sum(_tokens(t) for t in texts)
+    return ORJSONResponse(
+        {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "fake"),
+            "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+        },
+        headers=limiter.headers(),
+    )
+
+
+@app.post("/v1/chat/completions")
+async def create_chat_completion(request: Request):
+    stats["chat"] += 1
+    body = await request.json()
+    if (rejected := _admit()) is not None:
+        return rejected
+
+    model = body.get("model", "fake")
+    prompt = _message_text(body.get("messages") or [])
+    words = _reply_words(prompt, model)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+    created = int(time.time())
+    usage = {
+        "prompt_tokens": _tokens(prompt),
+        "completion_tokens": len(words),
+        "total_tokens": _tokens(prompt) + len(words),
+    }
+
+    # opóźnienie do pierwszego tokena (przy stream) albo do całej odpowiedzi
+    await asyncio.sleep(config.chat_sampler(_rng))
+
+    if body.get("stream"):
+        stats["chat_stream"] += 1
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+        return StreamingResponse(
+            _stream_chunks(completion_id, created, model, words, usage if include_usage else None),
+            media_type="text/event-stream",
+            headers=limiter.headers(),
+        )
+
+    return ORJSONResponse(
+        {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": " ".join(words)},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": usage,
+        },
+        headers=limiter.headers(),
+    )
+
+
+async def _stream_chunks(
+    completion_id: str, created: int, model: str, words: list[str], usage: dict | None
+) -> AsyncIterator[bytes]:
+    def event(delta: dict, finish_reason: str | None = None, **extra) -> bytes:
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            **extra,
+        }
+        return b"data: " + orjson.dumps(chunk) + b"\n\n"
+
+    yield event({"role": "assistant", "content": ""})
+    delay = config.stream_token_ms / 1000
+    for i, word in enumerate(words):
+        if delay:
+            await asyncio.sleep(delay)
+        yield event({"content": word if i == 0 else " " + word})
+    yield event({}, "stop")
+    if usage is not None:
+        yield b"data: " + orjson.dumps({
+            "id": completion_id, "object": "chat.completion.chunk", "created": created,
+            "model": model, "choices": [], "usage": usage,
+        }) + b"\n\n"
+    yield b"data: [DONE]\n\n"
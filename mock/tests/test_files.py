@@ -0,0 +1,98 @@
+import gzip
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils import compression
+from app.utils.compression import MIN_COMPRESS_SIZE, is_sidecar
+
+
+class FilesRangeAndCompressionTests(unittest.TestCase):
+    """GET /files: Range (206/416) i kompresja wg Accept-Encoding z plikami pomocniczymi na dysku."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        self.folder = self.root / "mes" / "2026-01-05"
+        self.folder.mkdir(parents=True)
+        self.content = b'[' + b",".join(b'{"id": %d, "status": "done"}' % i for i in range(200)) + b']'
+        self.path = self.folder / "work_orders.json"
+        self.path.write_bytes(self.content)
+
+        patcher = mock.patch("app.routers.files.MOCK_DATA_ROOT", self.root)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = TestClient(app)
+        self.params = {"stream": "mes", "date": "2026-01-05", "name": "work_orders.json"}
+
+    def get(self, **headers):
+        return self.client.get("/files", params=self.params, headers=headers)
+
+    def test_range_returns_original_bytes_without_encoding(self):
+        resp = self.get(**{"Range": "bytes=0-99", "Accept-Encoding": "gzip"})
+        self.assertEqual(resp.status_code, 206)
+        self.assertEqual(resp.content, self.content[:100])
+        self.assertNotIn("content-encoding", resp.headers)
+        self.assertEqual(resp.headers["content-range"], f"bytes 0-99/{len(self.content)}")
+
+    def test_range_outside_file_is_416(self):
+        resp = self.get(Range=f"bytes={len(self.content) + 10}-")
+        self.assertEqual(resp.status_code, 416)
+
+    def test_gzip_writes_sidecar_and_reuses_it(self):
+        resp = self.get(**{"Accept-Encoding": "gzip"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.headers["content-encoding"], "gzip")
+        self.assertIn("Accept-Encoding", resp.headers["vary"])
+        self.assertEqual(resp.content, self.content)
+
+        sidecar = self.folder / "work_orders.json.gz"
+        self.assertEqual(gzip.decompress(sidecar.read_bytes()), self.content)
+        self.assertEqual([p.name for p in self.folder.iterdir() if p.name.endswith(".tmp")], [])
+
+        with mock.patch.object(compression, "compress_bytes", side_effect=AssertionError("recompressed")):
+            resp = self.get(**{"Accept-Encoding": "gzip"})
+        self.assertEqual(resp.content, self.content)
+
+    def test_stale_sidecar_is_rewritten(self):
+        sidecar = self.folder / "work_orders.json.gz"
+        sidecar.write_bytes(gzip.compress(b"[]"))
+        st = self.path.stat()
+        os.utime(sidecar, ns=(st.st_atime_ns, st.st_mtime_ns - 10**9))
+
+        resp = self.get(**{"Accept-Encoding": "gzip"})
+        self.assertEqual(resp.content, self.content)
+        self.assertEqual(gzip.decompress(sidecar.read_bytes()), self.content)
+
+    def test_read_only_data_compresses_per_request(self):
+        with mock.patch.object(compression, "write_sidecar", side_effect=PermissionError("read-only")):
+            resp = self.get(**{"Accept-Encoding": "gzip"})
+        self.assertEqual(resp.headers["content-encoding"], "gzip")
+        self.assertEqual(resp.content, self.content)
+        self.assertFalse((self.folder / "work_orders.json.gz").exists())
+
+    def test_identity_and_small_files_are_not_compressed(self):
+        resp = self.get(**{"Accept-Encoding": "identity"})
+        self.assertNotIn("content-encoding", resp.headers)
+        self.assertEqual(resp.content, self.content)
+
+        self.path.write_bytes(b"[]" + b" " * (MIN_COMPRESS_SIZE - 10))
+        resp = self.get(**{"Accept-Encoding": "gzip"})
+        self.assertNotIn("content-encoding", resp.headers)
+        self.assertFalse((self.folder / "work_orders.json.gz").exists())
+
+    def test_sidecars_and_temp_files_are_hidden(self):
+        self.assertTrue(is_sidecar("work_orders.json.gz"))
+        self.assertTrue(is_sidecar(".work_orders.json.gz.abc123.tmp"))
+        self.assertFalse(is_sidecar("work_orders.json"))
+        self.assertFalse(is_sidecar("manual.pdf.gz"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from app.utils.index import MockIndex
+
+
+class MockIndexInvalidationTests(unittest.TestCase):
+    """Listingi w pamięci widzą nadpisanie pliku w miejscu bez watchera."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        root = Path(tmp.name)
+        self.folder = root / "erp" / "2026-01-05"
+        self.folder.mkdir(parents=True)
+        self.docs = root / "docs" / "manuals"
+        self.docs.mkdir(parents=True)
+        self.index = MockIndex(root, root / "manifest.json", root / "docs")
+
+    def _overwrite_keeping_dir_mtime(self, path: Path, content: bytes) -> None:
+        st = path.parent.stat()
+        path.write_bytes(content)
+        os.utime(path.parent, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    def test_snapshot_listing_detects_in_place_overwrite(self):
+        path = self.folder / "orders.json"
+        path.write_bytes(b"[]")
+        self.assertEqual(self.index.snapshot_listing("erp", "2026-01-05"), [{"name": "orders.json", "size": 2}])
+
+        self._overwrite_keeping_dir_mtime(path, b'[{"id": 1}]')
+        self.assertEqual(self.index.snapshot_listing("erp", "2026-01-05"), [{"name": "orders.json", "size": 11}])
+
+    def test_docs_tree_detects_in_place_overwrite(self):
+        path = self.docs / "manual.txt"
+        path.write_bytes(b"v1")
+        self.assertEqual(self.index.docs_tree(), [{"name": "manuals/manual.txt", "size": 2}])
+
+        self._overwrite_keeping_dir_mtime(path, b"version 2")
+        self.assertEqual(self.index.docs_tree(), [{"name": "manuals/manual.txt", "size": 9}])
+
+    def test_sidecars_are_not_listed(self):
+        (self.folder / "orders.json").write_bytes(b"[]")
+        (self.folder / "orders.json.gz").write_bytes(b"x")
+        self.assertEqual(
+            [f["name"] for f in self.index.snapshot_listing("erp", "2026-01-05")], ["orders.json"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()